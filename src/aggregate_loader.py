@@ -6,6 +6,7 @@ import os
 import multiprocessing
 import time
 import argparse
+from multiprocessing.connection import wait
 import coloredlogs
 
 from etl import ETL, MIETL, DOETL, BGIETL, ConstructETL, ExpressionAtlasETL, GenericOntologyETL, \
@@ -13,12 +14,13 @@ from etl import ETL, MIETL, DOETL, BGIETL, ConstructETL, ExpressionAtlasETL, Gen
                 AffectedGenomicModelETL, TranscriptETL, GOETL, ExpressionETL, ExpressionRibbonETL, \
                 ExpressionRibbonOtherETL, DiseaseETL, PhenoTypeETL, OrthologyETL, ClosureETL, \
                 GOAnnotETL, GeoXrefETL, GeneDiseaseOrthoETL, MolecularInteractionETL, \
-                GeneDescriptionsETL, VEPETL, VEPTranscriptETL, Neo4jHelper, NodeCountETL, SpeciesETL
+                GeneDescriptionsETL, VEPETL, VEPTranscriptETL, Neo4jHelper, NodeCountETL, SpeciesETL, \
+                OntologyCache
 
-from transactors import Neo4jTransactor, FileTransactor
+from transactors import Neo4jTransactor, FileTransactor, BulkImportTransactor, QueryMetrics
 from data_manager import DataFileManager
 from loader_common import ContextInfo  # Must be the last timeport othersize program fails
-from files import Download
+from files import Download, FileCache
 
 def main():
     """ Entry point to ETL program"""
@@ -101,9 +103,9 @@ class AggregateLoader():
     }
 
     # This is the order in which data types are loaded.
-    # After each list, the loader will "pause" and wait for that item to finish.
-    # i.e. After Ontology, there will be a pause.
-    # After GO, DO, MI, there will be a pause, etc.
+    # An ETL only waits for earlier ETLs whose read_labels / write_labels
+    # overlap its own (see get_etl_dependencies), so independent ETLs overlap.
+    # ETLs that do not declare their labels wait for everything before them.
     etl_groups = [
         ['SPECIES'],
         ['DOID', 'MI'],
@@ -145,52 +147,163 @@ class AggregateLoader():
         if self.schema_branch != 'master':
             self.logger.warning("*******WARNING: Using branch {} for schema.".format(self.schema_branch))
 
-        # Lets delete the old files and down load new ones. They are small.
-        for name in ['tmp/species.yaml', 'tmp/resourceDescriptors.yaml']:
-            if os.path.exists(name):
-                self.logger.warning("*********WARNING: removing old {} file.".format(name))
-                os.remove(name)
+        # These are small, but only download them again if they changed upstream.
         self.logger.info("Getting files initially")
-        url = 'https://raw.githubusercontent.com/alliance-genome/agr_schemas/SCHEMA_BRANCH/resourceDescriptors.yaml'
-        url = url.replace('SCHEMA_BRANCH', self.schema_branch)
-        Download('tmp', url, 'resourceDescriptors.yaml').get_downloaded_data()
-        url = 'https://raw.githubusercontent.com/alliance-genome/agr_schemas/SCHEMA_BRANCH/ingest/species/species.yaml'
-        url = url.replace('SCHEMA_BRANCH', self.schema_branch)
-        Download('tmp', url, 'species.yaml').get_downloaded_data()
+        file_cache = FileCache()
+        for (name, schema_path) in [('resourceDescriptors.yaml', 'resourceDescriptors.yaml'),
+                                    ('species.yaml', 'ingest/species/species.yaml')]:
+            url = 'https://raw.githubusercontent.com/alliance-genome/agr_schemas/SCHEMA_BRANCH/' + schema_path
+            url = url.replace('SCHEMA_BRANCH', self.schema_branch)
+            version = FileCache.get_version(url)
+            if not file_cache.is_current(url, version, [os.path.join('tmp', name)]):
+                Download('tmp', url, name).get_downloaded_data()
+                file_cache.record(url, version, [os.path.join('tmp', name)])
+        file_cache.save()
         self.logger.info("Finished getting files initially")
 
+    @staticmethod
+    def _labels_overlap(first_labels, second_labels):
+        """True if two label declarations can touch the same nodes.
+           None stands for every label, and "Ontology" covers every *Term label."""
+
+        if first_labels is None:
+            return second_labels is None or len(second_labels) > 0
+        if second_labels is None:
+            return len(first_labels) > 0
+
+        for first in first_labels:
+            for second in second_labels:
+                if first == second \
+                        or (first == 'Ontology' and second.endswith('Term')) \
+                        or (second == 'Ontology' and first.endswith('Term')):
+                    return True
+
+        return False
+
     @classmethod
-    def run_etl_groups(cls, logger, data_manager, neo_transactor):
-        """This function runs each of the ETL in parallel"""
-        etl_time_tracker_list = []
+    def get_etl_dependencies(cls, etl_names):
+        """Map each ETL to the earlier ETLs (in etl_groups order) it has to wait for.
+           An ETL waits for an earlier one only if one of them writes a label the other
+           reads or writes; everything else is free to overlap."""
+
+        dependencies = {}
+        for (index, etl_name) in enumerate(etl_names):
+            etl_class = cls.etl_dispatch[etl_name]
+            dependencies[etl_name] = set()
+            for earlier_name in etl_names[:index]:
+                earlier_class = cls.etl_dispatch[earlier_name]
+                if cls._labels_overlap(earlier_class.write_labels, etl_class.read_labels) \
+                        or cls._labels_overlap(earlier_class.write_labels, etl_class.write_labels) \
+                        or cls._labels_overlap(earlier_class.read_labels, etl_class.write_labels):
+                    dependencies[etl_name].add(earlier_name)
+
+        return dependencies
+
+    @staticmethod
+    def _run_etl(etl_name, etl):
+        # Tag every query batch queued from this process (and its children).
+        Neo4jTransactor.batch_owner = etl_name
+        etl.run_etl()
+
+    @classmethod
+    def run_etl_groups(cls, logger, data_manager, neo_transactor, bulk_import_stage=None):
+        """This function runs each ETL as soon as the ETLs it depends on have finished.
+           In a bulk load the export stage runs the ETLs that do not read the graph
+           and the replay stage runs the ones that do."""
+
+        etl_names = []
         for etl_group in cls.etl_groups:
-            etl_group_start_time = time.time()
-            logger.info("Starting ETL group: %s" % etl_group)
-            thread_pool = []
             for etl_name in etl_group:
-                logger.info("ETL Name: %s" % etl_name)
-                config = data_manager.get_config(etl_name)
-                if config is not None:
-                    etl = cls.etl_dispatch[etl_name](config)
-                    process = multiprocessing.Process(target=etl.run_etl)
-                    process.start()
-                    thread_pool.append(process)
-                else:
+                if data_manager.get_config(etl_name) is None:
                     logger.info("No Config found for: %s" % etl_name)
-            ETL.wait_for_threads(thread_pool)
-
-            logger.info("Waiting for Queues to sync up")
-            neo_transactor.check_for_thread_errors()
-            neo_transactor.wait_for_queues()
-            etl_elapsed_time = time.time() - etl_group_start_time
-            etl_time_message = ("Finished ETL group: %s, Elapsed time: %s"
-                                % (etl_group,
-                                   time.strftime("%H:%M:%S", time.gmtime(etl_elapsed_time))))
-            logger.info(etl_time_message)
-            etl_time_tracker_list.append(etl_time_message)
+                elif bulk_import_stage is None \
+                        or cls.etl_dispatch[etl_name].reads_graph == (bulk_import_stage == "replay"):
+                    etl_names.append(etl_name)
+
+        dependencies = cls.get_etl_dependencies(etl_names)
+        for etl_name in etl_names:
+            logger.debug("ETL %s waits for: %s", etl_name, sorted(dependencies[etl_name]))
+
+        etl_time_tracker_list = []
+        start_times = {}
+        running = {}
+        writing = set()  # Processes finished, queries still in the Neo4jTransactor queue.
+        finished = set()
+
+        while len(finished) < len(etl_names):
+            for etl_name in etl_names:
+                if etl_name not in start_times and dependencies[etl_name] <= finished:
+                    logger.info("Starting ETL: %s" % etl_name)
+                    etl = cls.etl_dispatch[etl_name](data_manager.get_config(etl_name))
+                    process = multiprocessing.Process(target=cls._run_etl,
+                                                      args=(etl_name, etl),
+                                                      name=etl_name)
+                    process.start()
+                    start_times[etl_name] = time.time()
+                    running[etl_name] = process
+
+            # Wake up when an ETL exits, a transactor thread dies
+            # or an ETL's last query batch finishes.
+            sentinels = {process.sentinel: process for process in running.values()}
+            for thread in neo_transactor.thread_pool:
+                sentinels[thread.sentinel] = thread
+            batch_done = Neo4jTransactor.batch_done_receiver
+            for ready in wait(list(sentinels) + [batch_done]):
+                if ready is batch_done:
+                    while batch_done.poll():
+                        batch_done.recv()
+                    continue
+                process = sentinels[ready]
+                if process in neo_transactor.thread_pool or process.exitcode != 0:
+                    ETL.fail_threads(list(running.values()) + neo_transactor.thread_pool)
+                process.join()
+                del running[process.name]
+                writing.add(process.name)
+
+            for etl_name in sorted(writing):
+                if not Neo4jTransactor.has_pending_batches(etl_name):
+                    writing.remove(etl_name)
+                    finished.add(etl_name)
+                    etl_elapsed_time = time.time() - start_times[etl_name]
+                    etl_time_message = ("Finished ETL: %s, Elapsed time: %s"
+                                        % (etl_name,
+                                           time.strftime("%H:%M:%S", time.gmtime(etl_elapsed_time))))
+                    logger.info(etl_time_message)
+                    etl_time_tracker_list.append(etl_time_message)
 
         return etl_time_tracker_list
 
+    @staticmethod
+    def replay_bulk_import_queries(logger, neo_transactor):
+        """Run the queries the bulk export left to Cypher, one ETL at a time in the order
+           the ETLs originally finished their writes. The queries an ETL ran directly,
+           such as deleting empty nodes, run once its LOAD CSV batches have drained."""
+
+        replay_batches = BulkImportTransactor.get_replay_batches()
+        owners = []
+        for (owner, batch, query_batch) in replay_batches:
+            if owner not in owners:
+                owners.append(owner)
+
+        for owner in owners:
+            logger.info("Replaying queries for ETL: %s", owner)
+            Neo4jTransactor.batch_owner = owner
+            for direct in (False, True):
+                for (batch_owner, batch, query_batch) in replay_batches:
+                    if batch_owner == owner and (batch is None) == direct:
+                        Neo4jTransactor.execute_query_batch(query_batch)
+
+                sentinels = [thread.sentinel for thread in neo_transactor.thread_pool]
+                batch_done = Neo4jTransactor.batch_done_receiver
+                while Neo4jTransactor.has_pending_batches(owner):
+                    for ready in wait(sentinels + [batch_done]):
+                        if ready is not batch_done:
+                            ETL.fail_threads(neo_transactor.thread_pool)
+                        while batch_done.poll():
+                            batch_done.recv()
+
+        Neo4jTransactor.batch_owner = None
+
     def run_loader(self):
         """Main function for running loader"""
 
@@ -198,6 +311,12 @@ class AggregateLoader():
             self.logger.warn('DEBUG mode enabled!')
             time.sleep(3)
 
+        # Ontology terms and edges saved by an earlier run must not stand in for this one's.
+        # The replay stage of a bulk load uses the ones its export stage saved.
+        if self.context_info.env["NEO4J_WRITE_MODE"] != "bulk" \
+                or self.context_info.env["BULK_IMPORT_STAGE"] != "replay":
+            OntologyCache.clear_loaded()
+
         data_manager = DataFileManager(self.context_info.config_file_location)
         file_transactor = FileTransactor()
 
@@ -213,24 +332,45 @@ class AggregateLoader():
         self.logger.debug("finished queues waiting for shutdown")
         file_transactor.shutdown()
 
+        data_manager.update_file_cache()
+
+        bulk_import_stage = None
+        if self.context_info.env["NEO4J_WRITE_MODE"] == "bulk":
+            bulk_import_stage = self.context_info.env["BULK_IMPORT_STAGE"]
+            self.logger.info("Bulk import stage: %s", bulk_import_stage)
+            if BulkImportTransactor.is_exporting():
+                BulkImportTransactor.start_export()
+
         neo_transactor = Neo4jTransactor()
         neo_transactor.start_threads(data_manager.get_neo_transactor_thread_settings())
 
         self.logger.debug("finished starting neo threads ")
 
-        if not self.context_info.env["USING_PICKLE"]:
+        if not self.context_info.env["USING_PICKLE"] and not BulkImportTransactor.is_exporting():
             self.logger.info("Creating indices.")
             Neo4jHelper.create_indices()
 
-        etl_time_tracker_list = self.run_etl_groups(self.logger, data_manager, neo_transactor)
+        if bulk_import_stage == "replay":
+            self.replay_bulk_import_queries(self.logger, neo_transactor)
+
+        etl_time_tracker_list = self.run_etl_groups(self.logger, data_manager, neo_transactor,
+                                                    bulk_import_stage)
 
         neo_transactor.shutdown()
 
+        if BulkImportTransactor.is_exporting():
+            BulkImportTransactor.export()
+
         elapsed_time = time.time() - self.start_time
 
         for time_item in etl_time_tracker_list:
             self.logger.info(time_item)
 
+        QueryMetrics.log_summary()
+
+        self.logger.info("Neo4j connection stats (loader process): %s",
+                         Neo4jHelper.connection_stats())
+
         self.logger.info('Loader finished. Elapsed time: %s'
                          % time.strftime("%H:%M:%S", time.gmtime(elapsed_time)))
 
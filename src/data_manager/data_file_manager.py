@@ -9,7 +9,7 @@ import urllib3
 
 from cerberus import Validator
 
-from files import JSONFile
+from files import JSONFile, FileCache
 from loader_common import Singleton, ContextInfo
 from .data_type_config import DataTypeConfig
 
@@ -64,6 +64,9 @@ class DataFileManager(metaclass=Singleton):
 
         self.logger.debug(self.submission_system_data)
 
+        # Manifest of the files downloaded by earlier runs.
+        self.file_cache = FileCache()
+
         # List used for MOD and data type objects.
         self.master_data_dictionary = {}
 
@@ -107,7 +110,8 @@ class DataFileManager(metaclass=Singleton):
             # e.g. Create BGI DataTypeConfig object and file it under BGI in the dictionary.
             self.master_data_dictionary[config_entry] = DataTypeConfig( \
                     config_entry,
-                    self.transformed_submission_system_data[config_entry])
+                    self.transformed_submission_system_data[config_entry],
+                    self.config_data.get('BatchSizes'))
 
     def download_and_validate(self):
         """download an vlidatae config file"""
@@ -117,9 +121,20 @@ class DataFileManager(metaclass=Singleton):
             self.logger.debug('Downloading %s data.', entry)
             if isinstance(self.master_data_dictionary[entry], DataTypeConfig):
                 # If we're dealing with an object.
-                self.master_data_dictionary[entry].get_data()
+                self.master_data_dictionary[entry].get_data(self.file_cache)
                 self.logger.debug('done with %s data.', entry)
 
+    def update_file_cache(self):
+        """Record the downloaded files in the file cache manifest and evict old files.
+           Run once the FileTransactor has finished."""
+
+        for entry in self.master_data_dictionary:
+            if isinstance(self.master_data_dictionary[entry], DataTypeConfig):
+                self.master_data_dictionary[entry].add_to_file_cache(self.file_cache)
+
+        self.file_cache.evict()
+        self.file_cache.save()
+
     def process_config(self):
         """ This checks for the validity of the YAML file.
              See src/config/validation.yml for the layout of the schema."""
@@ -177,7 +192,8 @@ class DataFileManager(metaclass=Singleton):
         config_values_to_ignore = [
             'releaseVersion',  # Manually assigned above.
             'FileTransactorThreads',
-            'Neo4jTransactorThreads']
+            'Neo4jTransactorThreads',
+            'BatchSizes']
 
         for entry in self.config_data.keys():  # Iterate through our config file.
             self.logger.debug("Entry: %s", entry)
@@ -192,16 +208,18 @@ class DataFileManager(metaclass=Singleton):
                     self.logger.debug(temp_extracted_file)
                     if temp_extracted_file is None or temp_extracted_file == '':
                         temp_extracted_file = submission_system_dict.get('s3Path')
+                    file_metadata = {'md5Sum': submission_system_dict.get('md5Sum'),
+                                     'uploadDate': submission_system_dict.get('uploadDate')}
 
                     # Special case for storing ontologies with non-generic loaders.
                     if sub_entry in ontologies_to_transform and entry == 'ONTOLOGY':
                         self.logger.info(sub_entry)
                         self.transformed_submission_system_data[sub_entry] = []
                         self.transformed_submission_system_data[sub_entry]\
-                                .append([sub_entry, path, temp_extracted_file])
+                                .append([sub_entry, path, temp_extracted_file, file_metadata])
                     else:
                         self.transformed_submission_system_data[entry]\
-                                .append([sub_entry, path, temp_extracted_file])
+                                .append([sub_entry, path, temp_extracted_file, file_metadata])
             else:
                 self.logger.debug("Ignoring entry: %s", entry)
 
@@ -13,18 +13,24 @@ class DataTypeConfig():
 
     logger = logging.getLogger(__name__)
 
-    def __init__(self, data_type, submission_system_data):
+    def __init__(self, data_type, submission_system_data, batch_size_config=None):
         self.data_type = data_type
         self.submission_system_data = submission_system_data
 
-        # TODO These will be set by the config YAML.
-        self.neo4j_commit_size = 25000
-        self.generator_batch_size = 10000
+        # Sizes from the BatchSizes section of the config YAML. Anything set for this
+        # data type (or one of its queries) wins over a default passed in by the ETL,
+        # which wins over the "default" entry.
+        if batch_size_config is None:
+            batch_size_config = {}
+        self.default_batch_sizes = batch_size_config.get('default') or {}
+        self.batch_sizes = batch_size_config.get(data_type) or {}
+        self.neo4j_commit_size = self.default_batch_sizes.get('neo4j_commit_size', 25000)
+        self.generator_batch_size = self.default_batch_sizes.get('generator_batch_size', 10000)
 
         self.list_of_subtype_objects = []
 
-    def get_data(self):
-        """Download data and put in tmp folder"""
+    def get_data(self, file_cache=None):
+        """Download data and put in tmp folder, unless file_cache has a current copy"""
 
         download_dir = 'tmp'
 
@@ -40,21 +46,44 @@ class DataTypeConfig():
                 self.data_type,
                 downloadable_item[0],
                 downloadable_item[1],
-                full_path_to_send)
+                full_path_to_send,
+                downloadable_item[3])
 
             self.list_of_subtype_objects.append(sub_type)
 
+            if file_cache is not None and sub_type.is_cached(file_cache):
+                continue
+
             # Send it off to be queued and executed.
             FileTransactor.execute_transaction(sub_type)
 
-    def get_neo4j_commit_size(self):
-        """Returns NEO4J commit size"""
+    def add_to_file_cache(self, file_cache):
+        """Record the files of every sub type in file_cache"""
+
+        for sub_type in self.list_of_subtype_objects:
+            sub_type.add_to_file_cache(file_cache)
+
+    def get_neo4j_commit_size(self, query_name=None, default=None):
+        """Returns NEO4J commit size, for a query template if query_name is given"""
+
+        query_commit_sizes = self.batch_sizes.get('queries') or {}
+        if query_name in query_commit_sizes:
+            return query_commit_sizes[query_name]
+        if 'neo4j_commit_size' in self.batch_sizes:
+            return self.batch_sizes['neo4j_commit_size']
+        if default is not None:
+            return default
 
         return self.neo4j_commit_size
 
-    def get_generator_batch_size(self):
+    def get_generator_batch_size(self, default=None):
         """Returns generator Batch size"""
 
+        if 'generator_batch_size' in self.batch_sizes:
+            return self.batch_sizes['generator_batch_size']
+        if default is not None:
+            return default
+
         return self.generator_batch_size
 
     def check_for_single(self):
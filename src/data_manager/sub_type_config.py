@@ -10,7 +10,8 @@ from urllib.parse import urljoin
 import jsonref
 import jsonschema
 
-from files import S3File, TARFile, Download
+from files import S3File, TARFile, Download, FileCache
+from loader_common import ContextInfo
 
 
 class SubTypeConfig():
@@ -18,11 +19,14 @@ class SubTypeConfig():
 
     logger = logging.getLogger(__name__)
 
-    def __init__(self, data_type, sub_data_type, file_to_download, filepath):
+    def __init__(self, data_type, sub_data_type, file_to_download, filepath, file_metadata=None):
         self.data_type = data_type
         self.sub_data_type = sub_data_type
         self.filepath = filepath
         self.file_to_download = file_to_download
+        # Submission system details of the file (md5Sum, uploadDate), where known.
+        self.file_metadata = file_metadata if file_metadata is not None else {}
+        self.file_version = None
 
         self.already_downloaded = False
 
@@ -41,6 +45,44 @@ class SubTypeConfig():
 
         return self.file_to_download
 
+    def get_download_url(self):
+        """Get the URL the file is downloaded from"""
+
+        if self.file_to_download.startswith('http'):
+            return self.file_to_download
+
+        return "https://" + ContextInfo().env["DOWNLOAD_HOST"] + "/" + self.file_to_download
+
+    def get_download_path(self):
+        """Get the local path the file is downloaded to, before any extraction"""
+
+        if self.file_to_download.startswith('http'):
+            return os.path.join('tmp', os.path.basename(self.filepath))
+
+        return os.path.join('tmp', self.file_to_download)
+
+    def get_cache_paths(self):
+        """Get the local files that make up this sub type in the file cache"""
+
+        return sorted({self.get_download_path(), self.filepath})
+
+    def is_cached(self, file_cache):
+        """Check the file cache for a current copy of the file, removing a stale one"""
+
+        if self.filepath is None or self.file_to_download is None:
+            return False
+
+        self.file_version = FileCache.get_version(self.get_download_url(), self.file_metadata)
+        return file_cache.is_current(self.file_to_download, self.file_version, self.get_cache_paths())
+
+    def add_to_file_cache(self, file_cache):
+        """Record the downloaded file in the file cache"""
+
+        if self.filepath is None or self.file_to_download is None:
+            return
+
+        file_cache.record(self.file_to_download, self.file_version, self.get_cache_paths())
+
     def get_data_provider(self):
         """Get data provider"""
 
@@ -66,13 +108,21 @@ class SubTypeConfig():
                     self.already_downloaded = download_object.is_data_downloaded()
                 else:
                     self.logger.debug("Downloading JSON File: %s", self.file_to_download)
-                    self.already_downloaded = S3File(self.file_to_download,
-                                                     download_dir).download_new()
-                    self.logger.debug("File already downloaded: %s", self.already_downloaded)
-                    if self.file_to_download.endswith('tar.gz'):
-                        self.logger.debug("Extracting all files: %s", self.file_to_download)
-                        tar_object = TARFile(download_dir, self.file_to_download)
-                        tar_object.extract_all()
+                    s3_file = S3File(self.file_to_download,
+                                     download_dir,
+                                     self.file_metadata.get('md5Sum'))
+                    tar_object = TARFile(download_dir, self.file_to_download)
+                    if self.file_to_download.endswith('tar.gz') \
+                            and ContextInfo().env["EXTRACT_WHILE_DOWNLOADING"] \
+                            and not os.path.exists(self.get_download_path()):
+                        self.logger.debug("Extracting all files while downloading: %s", self.file_to_download)
+                        tar_object.extract_while_downloading(self._download_teed(s3_file))
+                    else:
+                        self.already_downloaded = s3_file.download_new()
+                        self.logger.debug("File already downloaded: %s", self.already_downloaded)
+                        if self.file_to_download.endswith('tar.gz'):
+                            self.logger.debug("Extracting all files: %s", self.file_to_download)
+                            tar_object.extract_all()
                         # Check whether the file exists locally.
                 if self.filepath is not None:
                     try:
@@ -91,6 +141,15 @@ class SubTypeConfig():
         else:
             self.logger.debug("File Path is None not downloading")
 
+    def _download_teed(self, s3_file):
+        """A download function for TARFile.extract_while_downloading"""
+
+        def download(tee):
+            self.already_downloaded = s3_file.download_new(tee)
+            return s3_file.streamed
+
+        return download
+
     def validate(self):
         """validation of filepath"""
 
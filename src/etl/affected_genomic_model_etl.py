@@ -15,6 +15,10 @@ class AffectedGenomicModelETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = []
+    write_labels = ['AffectedGenomicModel', 'Allele', 'SequenceTargetingReagent', 'Species',
+                    'SecondaryId', 'Synonym']
+
     # Query templates which take params and will be processed later
 
     agm_query_template = """
@@ -119,7 +123,7 @@ class AffectedGenomicModelETL(ETL):
                          sub_type.get_data_provider())
         filepath = sub_type.get_filepath()
         self.logger.info(filepath)
-        data = JSONFile().get_data(filepath)
+        data = JSONFile().get_stream(filepath)
         self.logger.info("Finished Loading Sequence Targeting Reagent Data: %s",
                          sub_type.get_data_provider())
 
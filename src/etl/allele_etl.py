@@ -12,6 +12,10 @@ logger = logging.getLogger(__name__)
 
 
 class AlleleETL(ETL):
+    read_labels = []
+    write_labels = ['Allele', 'Gene', 'Construct', 'Species', 'SecondaryId', 'Synonym',
+                    'CrossReference']
+
     allele_construct_no_gene_query_template = """
         USING PERIODIC COMMIT %s
         LOAD CSV WITH HEADERS FROM \'file:///%s\' AS row
@@ -149,7 +153,7 @@ class AlleleETL(ETL):
         logger.info("Loading Allele Data: %s" % sub_type.get_data_provider())
         filepath = sub_type.get_filepath()
         logger.info(filepath)
-        data = JSONFile().get_data(filepath)
+        data = JSONFile().get_stream(filepath)
         logger.info("Finished Loading Allele Data: %s" % sub_type.get_data_provider())
 
         if data is None:
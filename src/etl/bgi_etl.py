@@ -15,6 +15,11 @@ class BGIETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = []
+    write_labels = ['Gene', 'Load', 'Species', 'SOTerm', 'Chromosome', 'Assembly',
+                    'GenomicLocation', 'GenomicLocationBin', 'SecondaryId', 'Synonym',
+                    'CrossReference']
+
     # Query templates which take params and will be processed later
 
     so_terms_query_template = """
@@ -114,6 +119,13 @@ class BGIETL(ETL):
                               o.symbolWithSpecies = row.symbolWithSpecies
     """
 
+    gene_query_fields = ['loadKey', 'primaryId', 'symbol', 'taxonId', 'name', 'description',
+                         'geneSynopsisUrl', 'geneSynopsis', 'geneLiteratureUrl',
+                         'geneticEntityExternalUrl', 'dateProduced', 'modGlobalCrossRefId',
+                         'modCrossRefCompleteUrl', 'localId', 'modGlobalId', 'uuid',
+                         'dataProvider', 'symbolWithSpecies']
+    gene_query_shard_key = 'primaryId'
+
     basic_gene_load_relations_query_template = """
     USING PERIODIC COMMIT %s
         LOAD CSV WITH HEADERS FROM \'file:///%s\' AS row
@@ -124,6 +136,9 @@ class BGIETL(ETL):
     
     """
 
+    # The gene rows are written to all three gene files
+    basic_gene_load_relations_query_fields = gene_query_fields
+
     basic_gene_species_relations_query_template = """
     USING PERIODIC COMMIT %s
         LOAD CSV WITH HEADERS FROM \'file:///%s\' AS row
@@ -135,6 +150,8 @@ class BGIETL(ETL):
 
     """
 
+    basic_gene_species_relations_query_fields = gene_query_fields
+
     xrefs_query_template = """
 
         USING PERIODIC COMMIT %s
@@ -201,7 +218,7 @@ class BGIETL(ETL):
             self.logger.error("Can't find input file for %s", sub_type)
             sys.exit()
 
-        data = JSONFile().get_data(filepath)
+        data = JSONFile().get_stream(filepath)
 
         # This order is the same as the lists yielded from the get_generators function.
         # A list of tuples.
@@ -232,7 +249,8 @@ class BGIETL(ETL):
              "gene_cross_references_" + sub_type.get_data_provider() + ".csv"],
             [self.xrefs_relationships_query_template, commit_size,
              "gene_cross_references_relationships_" + sub_type.get_data_provider() + ".csv"],
-            [self.gene_synonyms_query_template, 600000,
+            [self.gene_synonyms_query_template,
+             self.data_type_config.get_neo4j_commit_size("gene_synonyms_query_template", 600000),
              "gene_synonyms_" + sub_type.get_data_provider() + ".csv"]
         ]
 
@@ -466,29 +484,27 @@ class BGIETL(ETL):
                 "primaryKey": primary_id,
                 "soTermId": gene_record['soTermId']})
 
-            gene = {
-                "symbol": gene_record.get('symbol'),
-                # globallyUniqueSymbolWithSpecies requested by search group
-                "symbolWithSpecies": gene_record.get('symbol') + " (" + short_species_abbreviation + ")",
-                "name": gene_record.get('name'),
-                "geneticEntityExternalUrl": genetic_entity_external_url,
-                "description": gene_record.get('description'),
-                "geneSynopsis": gene_record.get('geneSynopsis'),
-                "geneSynopsisUrl": gene_record.get('geneSynopsisUrl'),
-                "taxonId": basic_genetic_entity.get('taxonId'),
-                "geneLiteratureUrl": gene_literature_url,
-                "name_key": gene_record.get('symbol'),
-                "primaryId": primary_id,
-                "category": "gene",
-                "href": None,
-                "uuid": str(uuid.uuid4()),
-                "modCrossRefCompleteUrl": mod_cross_reference_complete_url,
-                "localId": local_id,
-                "modGlobalCrossRefId": global_id,
-                "modGlobalId": global_id,
-                "loadKey" : load_key,
-                "dataProvider" : data_provider,
-                "dateProduced": date_produced}
+            symbol = gene_record.get('symbol')
+            # In the order of gene_query_fields
+            gene = (load_key,
+                    primary_id,
+                    symbol,
+                    basic_genetic_entity.get('taxonId'),
+                    gene_record.get('name'),
+                    gene_record.get('description'),
+                    gene_record.get('geneSynopsisUrl'),
+                    gene_record.get('geneSynopsis'),
+                    gene_literature_url,
+                    genetic_entity_external_url,
+                    date_produced,
+                    global_id,
+                    mod_cross_reference_complete_url,
+                    local_id,
+                    global_id,
+                    str(uuid.uuid4()),
+                    data_provider,
+                    # globallyUniqueSymbolWithSpecies requested by search group
+                    symbol + " (" + short_species_abbreviation + ")")
 
             gene_dataset.append(gene)
 
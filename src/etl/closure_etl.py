@@ -6,7 +6,7 @@ import multiprocessing
 from etl import ETL
 from transactors import CSVTransactor
 from transactors import Neo4jTransactor
-from .helpers import Neo4jHelper
+from .helpers import Neo4jHelper, OBOHelper, OntologyCache
 
 
 class ClosureETL(ETL):
@@ -14,6 +14,10 @@ class ClosureETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = ['Ontology']
+    write_labels = ['Ontology']
+    reads_graph = True
+
     insert_isa_partof_closure_query_template = """
         USING PERIODIC COMMIT %s
         LOAD CSV WITH HEADERS FROM \'file:///%s\' AS row
@@ -21,6 +25,8 @@ class ClosureETL(ETL):
             MATCH (termParent:%sTerm {primaryKey:row.parent_id})
             CREATE (termChild)-[closure:IS_A_PART_OF_CLOSURE]->(termParent) """
 
+    insert_isa_partof_closure_query_fields = ['child_id', 'parent_id']
+
     retrieve_isa_partof_closure_query_template = """
         MATCH (childTerm:%sTerm)-[:PART_OF|IS_A*]->(parentTerm:%sTerm) 
             RETURN DISTINCT childTerm.primaryKey, parentTerm.primaryKey """
@@ -48,12 +54,14 @@ class ClosureETL(ETL):
         self.logger.debug("Starting isa_partof_ Closure for: %s", data_provider)
 
         query_list = [
-            [self.insert_isa_partof_closure_query_template, "100000",
+            [self.insert_isa_partof_closure_query_template,
+             self.data_type_config.get_neo4j_commit_size("insert_isa_partof_closure_query_template", 100000),
              "isa_partof_closure_" + data_provider + ".csv",
              data_provider, data_provider],
         ]
 
-        generators = self.get_closure_terms(data_provider)
+        batch_size = self.data_type_config.get_generator_batch_size()
+        generators = self.get_closure_terms(data_provider, batch_size)
 
         query_and_file_list = self.process_query_params(query_list)
         CSVTransactor.save_file_static(generators, query_and_file_list)
@@ -61,18 +69,39 @@ class ClosureETL(ETL):
 
         self.logger.debug("Finished isa_partof Closure for: %s", data_provider)
 
-    def get_closure_terms(self, data_provider):
-        """Get Closure Terms"""
-
-        query = self.retrieve_isa_partof_closure_query_template % (data_provider, data_provider)
-        self.logger.debug("Query to Run: %s", query)
-
-        return_set = Neo4jHelper().run_single_query(query)
+    def get_closure_terms(self, data_provider, batch_size):
+        """Get Closure Terms, computed from the IS_A and PART_OF edges the ontology ETL
+           saved in the OntologyCache or, if it saved none (e.g. it did not run), read from Neo4j"""
+
+        loaded = OntologyCache.get_loaded(data_provider)
+        if loaded is not None:
+            self.logger.debug("Computing the %s closure from %s edges",
+                              data_provider,
+                              len(loaded['edges']))
+            closure = OBOHelper.get_closure([(child, parent)
+                                             for (child, parent, relationship) in loaded['edges']])
+        else:
+            self.logger.info("No IS_A/PART_OF edges saved for %s, reading its closure from Neo4j",
+                             data_provider)
+            closure = self.get_closure_from_neo4j(data_provider)
 
         closure_data = []
-        for record in return_set:
-            row = dict(child_id=record["childTerm.primaryKey"],
-                       parent_id=record["parentTerm.primaryKey"])
+        for row in closure:
+            # A row of insert_isa_partof_closure_query_fields.
             closure_data.append(row)
 
-        yield [closure_data]
+            if len(closure_data) == batch_size:
+                yield [closure_data]
+                closure_data = []
+
+        if len(closure_data) > 0:
+            yield [closure_data]
+
+    def get_closure_from_neo4j(self, data_provider):
+        """The (child, parent) pairs of the closure of the graph"""
+
+        query = self.retrieve_isa_partof_closure_query_template % (data_provider, data_provider)
+        self.logger.debug("Query to Run: %s", query)
+
+        for record in Neo4jHelper.run_streaming_query(query):
+            yield (record["childTerm.primaryKey"], record["parentTerm.primaryKey"])
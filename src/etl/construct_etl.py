@@ -16,6 +16,10 @@ class ConstructETL(ETL):
     """Construct ETL"""
 
     logger = logging.getLogger(__name__)
+
+    read_labels = []
+    write_labels = ['Construct', 'NonBGIConstructComponent', 'Gene', 'SecondaryId', 'Synonym',
+                    'CrossReference']
     xref_url_map = ResourceDescriptorHelper().get_data()
 
     # Query templates which take params and will be processed later
@@ -108,7 +112,7 @@ class ConstructETL(ETL):
 
         self.logger.info("Loading Construct Data: %s", sub_type.get_data_provider())
         filepath = sub_type.get_filepath()
-        data = JSONFile().get_data(filepath)
+        data = JSONFile().get_stream(filepath)
         self.logger.info("Finished Loading Construct Data: %s", sub_type.get_data_provider())
 
         if data is None:
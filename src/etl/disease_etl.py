@@ -11,6 +11,7 @@ from etl.helpers import Neo4jHelper
 from files import JSONFile
 from transactors import CSVTransactor
 from transactors import Neo4jTransactor
+from transactors import BulkImportTransactor
 
 
 class DiseaseETL(ETL):
@@ -19,6 +20,10 @@ class DiseaseETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = []
+    write_labels = ['DiseaseEntityJoin', 'PublicationJoin', 'Publication', 'CrossReference',
+                    'DOTerm', 'ECOTerm', 'Gene', 'Allele', 'AffectedGenomicModel']
+
     # Query templates which take params and will be processed later
 
     execute_annotation_xrefs_query_template = """
@@ -213,13 +218,17 @@ class DiseaseETL(ETL):
                       AND size(keys(dd)) = 1
                 DETACH DELETE (dd)"""
 
-        Neo4jHelper.run_single_query(delete_empty_do_nodes_query)
+        if BulkImportTransactor.is_exporting():
+            BulkImportTransactor.record_query(Neo4jTransactor.batch_owner, None,
+                                              delete_empty_do_nodes_query, None)
+        else:
+            Neo4jHelper.run_single_query(delete_empty_do_nodes_query)
 
     def _process_sub_type(self, sub_type):
 
         self.logger.info("Loading Disease Data: %s", sub_type.get_data_provider())
         filepath = sub_type.get_filepath()
-        data = JSONFile().get_data(filepath)
+        data = JSONFile().get_stream(filepath)
         self.logger.info("Finished Loading Disease Data: %s", sub_type.get_data_provider())
 
         if data is None:
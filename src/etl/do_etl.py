@@ -2,10 +2,9 @@
 
 import logging
 import re
-from ontobio import OntologyFactory
 
 from etl import ETL
-from etl.helpers import ETLHelper
+from etl.helpers import ETLHelper, OBOHelper, OntologyCache
 from transactors import CSVTransactor
 from transactors import Neo4jTransactor
 
@@ -16,6 +15,9 @@ class DOETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = []
+    write_labels = ['DOTerm', 'Synonym', 'SecondaryId', 'CrossReference']
+
     # Query templates which take params and will be processed later
 
     do_query_template = """
@@ -112,27 +114,24 @@ class DOETL(ETL):
     def get_generators(self, filepath, batch_size):
         """Get Generators"""
 
-        ont = OntologyFactory().create(filepath)
-        parsed_line = ont.graph.copy().node
+        ont = OntologyCache.get_ontobio_ontology(filepath)
+        parents = OBOHelper.get_parents_by_relation(ont, ['subClassOf'])
 
         do_term_list = []
         do_isas_list = []
         do_synonyms_list = []
         do_alt_ids_list = []
         xrefs = []
+        loaded_terms = {}
+        loaded_edges = []
         counter = 0
 
         # Convert parsed obo term into a schema-friendly AGR dictionary.
-        for key, line in parsed_line.items():
-            counter = counter + 1
-            node = ont.graph.node[key]
+        # The graph is only read, nothing is copied or changed.
+        for key, node in ont.get_graph().nodes(data=True):
             if len(node) == 0:
                 continue
-
-            # Switching id to curie form and saving URI in "uri"
-            # - might wildly break things later on???
-            node["uri"] = node["id"]
-            node["id"] = key
+            counter = counter + 1
 
             syns = []
 
@@ -203,7 +202,7 @@ class DOETL(ETL):
                     is_obsolete = "true"
                 if "definition" in node["meta"]:
                     definition = node["meta"]["definition"]["val"]
-                    def_links_unprocessed = node["meta"]["definition"]["xrefs"]
+                    def_links_unprocessed = list(node["meta"]["definition"]["xrefs"])
                 if "subsets" in node["meta"]:
                     new_subset = node['meta'].get('subsets')
                     if isinstance(new_subset, (list, tuple)):
@@ -219,12 +218,7 @@ class DOETL(ETL):
                         converted_subsets.append(subset_str)
                     subset = converted_subsets
 
-            all_parents = ont.parents(key)
-            all_parents.append(key)
-
-            # Improves performance when traversing relations
-            all_parents_subont = ont.subontology(all_parents)
-            isas_without_names = all_parents_subont.parents(key, relations=['subClassOf'])
+            isas_without_names = parents['subClassOf'].get(key, [])
 
             for item in isas_without_names:
                 dictionary = {
@@ -233,6 +227,7 @@ class DOETL(ETL):
                 }
 
                 do_isas_list.append(dictionary)
+                loaded_edges.append((key, item, 'IS_A'))
 
             def_links_processed = []
             def_links = ""
@@ -281,31 +276,33 @@ class DOETL(ETL):
                 alt_ids = []
 
             dict_to_append = {
-                'oid': node['id'],
+                'oid': key,
                 'name': node.get('label'),
                 'name_key': node.get('label'),
                 'definition': definition,
                 'defLinksProcessed': def_links_processed,
                 'is_obsolete': is_obsolete,
                 'subset': subset,
-                'oUrl': "http://www.disease-ontology.org/?id=" + node['id'],
+                'oUrl': "http://www.disease-ontology.org/?id=" + key,
                 'rgd_link': 'http://rgd.mcw.edu'
                             + '/rgdweb/ontology/annot.html?species=All&x=1&acc_id='
-                            + node['id'] + '#annot',
+                            + key + '#annot',
                 'rat_only_rgd_link': 'http://rgd.mcw.edu'
                                      + '/rgdweb/ontology/annot.html?species=Rat&x=1&acc_id='
-                                     + node['id'] + '#annot',
+                                     + key + '#annot',
                 'human_only_rgd_link': 'http://rgd.mcw.edu'
                                        + '/rgdweb/ontology/annot.html?species=Human&x=1&acc_id='
-                                       + node['id'] + '#annot',
-                'mgi_link': 'http://www.informatics.jax.org/disease/' + node['id'],
-                'zfin_link': 'https://zfin.org/' + node['id'],
-                'flybase_link': 'http://flybase.org/cgi-bin/cvreport.html?id=' + node['id'],
-                'wormbase_link': 'http://www.wormbase.org/resources/disease/' + node['id'],
-                'sgd_link': 'https://yeastgenome.org/disease/' + node['id']
+                                       + key + '#annot',
+                'mgi_link': 'http://www.informatics.jax.org/disease/' + key,
+                'zfin_link': 'https://zfin.org/' + key,
+                'flybase_link': 'http://flybase.org/cgi-bin/cvreport.html?id=' + key,
+                'wormbase_link': 'http://www.wormbase.org/resources/disease/' + key,
+                'sgd_link': 'https://yeastgenome.org/disease/' + key
             }
 
             do_term_list.append(dict_to_append)
+            # The term query SETs the properties, DO terms have no type.
+            loaded_terms[key] = (node.get('label') or None, None, is_obsolete)
 
             if counter == batch_size:
                 yield [do_term_list, do_isas_list, do_synonyms_list, xrefs, do_alt_ids_list]
@@ -318,3 +315,8 @@ class DOETL(ETL):
 
         if counter > 0:
             yield [do_term_list, do_isas_list, do_synonyms_list, xrefs, do_alt_ids_list]
+
+        # The IS_A query matches both ends, edges to terms that were skipped are not loaded.
+        OntologyCache.save_loaded('DO', loaded_terms, [(child, parent, relationship)
+                                                       for (child, parent, relationship) in loaded_edges
+                                                       if parent in loaded_terms])
@@ -15,6 +15,9 @@ class ECOMAPETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = []
+    write_labels = ['ECOTerm']
+
     # Query templates which take params and will be processed later
 
     eco_query_template = """
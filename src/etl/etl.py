@@ -1,8 +1,13 @@
 """ETL"""
 
 import logging
+import multiprocessing
+import re
+import signal
 import sys
+import threading
 import time
+from multiprocessing.connection import wait
 
 from test import TestObject
 from etl.helpers import ResourceDescriptorHelper
@@ -16,6 +21,29 @@ class ETL():
     xref_url_map = ResourceDescriptorHelper().get_data()
     logger = logging.getLogger(__name__)
 
+    # Node labels this ETL reads, and node labels it writes or locks (creating a
+    # relationship locks both end nodes). The AggregateLoader scheduler uses these
+    # to decide which ETLs can overlap. None means "every label", so an ETL that
+    # declares nothing behaves as a full barrier.
+    read_labels = None
+    write_labels = None
+
+    # ETLs that query the graph for their input. In a bulk load they run in the
+    # replay stage, after neo4j-admin has imported everything else.
+    reads_graph = False
+
+    # The columns of the CSV files written by this process, by file name, for the
+    # query templates that declare them: a "<name>_fields" list next to
+    # "<name>_template". Generators may then yield tuples in that order instead of
+    # dicts. Read by the CSVTransactor.
+    csv_fields = {}
+
+    # Templates that only MERGE nodes by a key can declare that column as
+    # "<name>_shard_key". With CSV_SHARDS > 1 their rows are then split over that
+    # many files by a hash of the key, and the Neo4jTransactor loads the files
+    # concurrently. Queries are matched to these templates in any process.
+    shard_key_patterns = None
+
 
     def __init__(self):
 
@@ -37,36 +65,119 @@ class ETL():
 
     @staticmethod
     def wait_for_threads(thread_pool, queue=None):
-        """Wait for Threads"""
+        """Wait for every process in thread_pool to exit or, when a queue is given,
+           for the queue to be fully processed. Wakes up as soon as a process exits;
+           if any exits non-zero the rest are terminated and the program exits."""
 
         ETL.logger.debug("Waiting for Threads to finish: %s", len(thread_pool))
 
-        while len(thread_pool) > 0:
-            ETL.logger.debug("Checking Threads: %s", len(thread_pool))
-            for (index, thread) in enumerate(thread_pool):
-                ETL.logger.debug("Thread Alive: %s Exitcode: %s",
-                                 thread.is_alive(),
-                                 thread.exitcode)
-                if (thread.exitcode is None or thread.exitcode == 0) and not thread.is_alive():
-                    ETL.logger.debug("Thread Finished Removing from pool: ")
-                    thread.join()
-                    del thread_pool[index]
-                elif thread.exitcode is not None and thread.exitcode != 0:
-                    ETL.logger.debug("Thread has Problems Killing Children: ")
-                    for thread1 in thread_pool:
-                        thread1.terminate()
-                    sys.exit(-1)
-                else:
-                    pass
-
-            if queue is not None:
-                ETL.logger.debug("Queue Size: %s", queue.qsize())
-                if queue.empty():
-                    queue.join()
+        waiting_on = {thread.sentinel: thread for thread in thread_pool}
+
+        queue_done = None
+        if queue is not None:
+            (queue_done, queue_done_sender) = multiprocessing.Pipe(duplex=False)
+            threading.Thread(target=ETL._join_queue,
+                             args=(queue, queue_done_sender),
+                             daemon=True).start()
+
+        while len(waiting_on) > 0 or queue_done is not None:
+            ready = wait(list(waiting_on) + ([queue_done] if queue_done is not None else []))
+            for sentinel in ready:
+                if sentinel is queue_done:
+                    ETL.logger.debug("Queue processed")
                     return
 
-            time.sleep(5)
+                thread = waiting_on.pop(sentinel)
+                thread.join()
+                ETL.logger.debug("Thread %s exited with exitcode: %s", thread.name, thread.exitcode)
+                if thread.exitcode != 0:
+                    ETL.fail_threads(thread_pool)
+
+    @staticmethod
+    def _join_queue(queue, queue_done_sender):
+        queue.join()
+        queue_done_sender.send(True)
 
+    @staticmethod
+    def fail_threads(thread_pool):
+        """Terminate every process still running in thread_pool, report how each one
+           ended and exit"""
+
+        for thread in thread_pool:
+            if thread.exitcode is None:
+                thread.terminate()
+        for thread in thread_pool:
+            thread.join()
+
+        ETL.logger.critical("A child process failed. Exit status of each child:")
+        for thread in thread_pool:
+            if thread.exitcode is not None and thread.exitcode < 0:
+                status = "killed by %s" % signal.Signals(-thread.exitcode).name
+            else:
+                status = "exitcode %s" % thread.exitcode
+            ETL.logger.critical("  %s (pid %s): %s", thread.name, thread.pid, status)
+
+        sys.exit(-1)
+
+    @classmethod
+    def get_template_declarations(cls, suffix):
+        """{query template: what is declared next to it as "<name>_<suffix>"} for the
+           "<name>_template" attributes of this ETL class"""
+
+        declarations = {}
+        for name in dir(cls):
+            if name.endswith('_template'):
+                template = getattr(cls, name)
+                declaration = getattr(cls, name[:-len('_template')] + '_' + suffix, None)
+                if isinstance(template, str) and declaration is not None:
+                    declarations[template] = declaration
+
+        return declarations
+
+    @staticmethod
+    def get_shard_count():
+        """Number of files the rows of a shardable template are split over"""
+
+        context_info = ContextInfo()
+        if context_info.env["NEO4J_WRITE_MODE"] == "bulk" or context_info.env["USING_PICKLE"] is True:
+            return 1
+
+        return max(int(context_info.env["CSV_SHARDS"]), 1)
+
+    @staticmethod
+    def get_query_shard_key(neo4j_query):
+        """The shard key of the template a query was formatted from, None if its
+           file is not sharded"""
+
+        if ETL.get_shard_count() <= 1:
+            return None
+
+        if ETL.shard_key_patterns is None:
+            ETL.shard_key_patterns = []
+            etl_classes = list(ETL.__subclasses__())
+            while len(etl_classes) > 0:
+                etl_class = etl_classes.pop()
+                etl_classes.extend(etl_class.__subclasses__())
+                for (template, shard_key) in etl_class.get_template_declarations('shard_key').items():
+                    pattern = '(.*?)'.join(re.escape(part) for part in template.split('%s'))
+                    ETL.shard_key_patterns.append((re.compile(pattern, re.DOTALL), shard_key))
+
+        for (pattern, shard_key) in ETL.shard_key_patterns:
+            if pattern.fullmatch(neo4j_query) is not None:
+                return shard_key
+
+        return None
+
+    def check_declared_fields(self, query, file_name, fields):
+        """Exit if the declared columns of a file repeat or miss a row.<column> the query uses"""
+
+        missing = set(re.findall(r"\brow\.(\w+)", query)) - set(fields)
+        if len(set(fields)) != len(fields) or len(missing) > 0:
+            self.logger.critical("Columns declared for %s do not fit its query. Declared: %s, missing: %s",
+                                 file_name,
+                                 fields,
+                                 sorted(missing))
+            sys.exit(-1)
 
     def process_query_params(self, query_list_with_params):
         """Process Query Params"""
@@ -74,6 +185,7 @@ class ETL():
         # generators = list of yielded lists from parser
         # query_list_with_parms = list of queries, each with batch size and CSV file name.
         query_and_file_names = []
+        declared_fields = self.get_template_declarations('fields')
 
         for query_params in query_list_with_params:
             # Remove the first query + batch size + CSV file name
@@ -89,4 +201,9 @@ class ETL():
             file_name = query_params.pop()
             query_and_file_names.append([query_to_run, file_name])
 
+            fields = declared_fields.get(cypher_query_template)
+            if fields is not None:
+                self.check_declared_fields(query_to_run, file_name, fields)
+                ETL.csv_fields[file_name] = fields
+
         return query_and_file_names
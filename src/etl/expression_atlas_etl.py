@@ -14,6 +14,10 @@ class ExpressionAtlasETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = ['Gene', 'CrossReference']
+    write_labels = ['Gene', 'CrossReference']
+    reads_graph = True
+
     # Querys which do not take params and can be used as is
 
     get_all_gene_primary_to_ensmbl_ids_query = """
@@ -1,14 +1,13 @@
 """Expression ETL"""
 
 import logging
-import codecs
 import uuid
 import multiprocessing
-import ijson
 
 from etl import ETL
 from etl.helpers import ETLHelper, Neo4jHelper
-from transactors import CSVTransactor, Neo4jTransactor
+from transactors import CSVTransactor, Neo4jTransactor, BulkImportTransactor
+from files import JSONFile, CompressedFile
 
 
 class ExpressionETL(ETL):
@@ -17,6 +16,10 @@ class ExpressionETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = []
+    write_labels = ['ExpressionBioEntity', 'BioEntityGeneExpressionJoin', 'Stage', 'Publication',
+                    'CrossReference', 'Gene', 'Ontology']
+
     # Query templates which take params and will be processed later
 
     xrefs_query_template = """
@@ -34,6 +37,9 @@ class ExpressionETL(ETL):
     MERGE (e:ExpressionBioEntity {primaryKey:row.ebe_uuid})
          ON CREATE SET e.whereExpressedStatement = row.whereExpressedStatement"""
 
+    bio_entity_expression_query_fields = ['ebe_uuid', 'whereExpressedStatement']
+    bio_entity_expression_query_shard_key = 'ebe_uuid'
+
 
     bio_entity_gene_expression_join_query_template = """
     
@@ -387,7 +393,10 @@ class ExpressionETL(ETL):
                 ON CREATE SET othergo.type = 'other'
                 ON CREATE SET othergo.subset = 'goslim_agr' """
 
-        Neo4jHelper.run_single_query(add_other_query)
+        if BulkImportTransactor.is_exporting():
+            BulkImportTransactor.record_query(Neo4jTransactor.batch_owner, None, add_other_query, None)
+        else:
+            Neo4jHelper.run_single_query(add_other_query)
 
 
     def get_generators(self, expression_file, batch_size):
@@ -416,8 +425,8 @@ class ExpressionETL(ETL):
         uberon_stage_other_data = []
 
         self.logger.debug("streaming json data from %s ...", expression_file)
-        with codecs.open(expression_file, 'r', 'utf-8') as file_handle:
-            for xpat in ijson.items(file_handle, 'data.item'):
+        with CompressedFile.open(expression_file, 'rb') as file_handle:
+            for xpat in JSONFile.items(file_handle, 'data.item'):
                 counter = counter + 1
 
                 pub_med_url = None
@@ -617,10 +626,7 @@ class ExpressionETL(ETL):
                                     xref['ei_uuid'] = expression_unique_key
                                     cross_references.append(xref)
 
-                    bio_entity = {
-                        "ebe_uuid": expression_entity_unique_key,
-                        "whereExpressedStatement": where_expressed_statement}
-                    bio_entities.append(bio_entity)
+                    bio_entities.append((expression_entity_unique_key, where_expressed_statement))
 
                     bio_join_entity = {
                         "ei_uuid": expression_unique_key,
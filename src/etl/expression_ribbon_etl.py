@@ -13,6 +13,10 @@ class ExpressionRibbonETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = ['GOTerm']
+    write_labels = ['ExpressionBioEntity', 'GOTerm']
+    reads_graph = True
+
     # Query templates which take params and will be processed later
 
     insert_gocc_self_ribbon_terms_query_template = """
@@ -55,13 +59,16 @@ class ExpressionRibbonETL(ETL):
 
         self.logger.info("Starting Expression Ribbon Data")
         query_template_list = [
-            [self.insert_gocc_ribbon_terms_query_template, "30000",
+            [self.insert_gocc_ribbon_terms_query_template,
+             self.data_type_config.get_neo4j_commit_size("insert_gocc_ribbon_terms_query_template", 30000),
              "expression_gocc_ribbon_terms.csv"],
-            [self.insert_gocc_self_ribbon_terms_query_template, "30000",
+            [self.insert_gocc_self_ribbon_terms_query_template,
+             self.data_type_config.get_neo4j_commit_size("insert_gocc_self_ribbon_terms_query_template", 30000),
              "expression_gocc_self_ribbon_terms" + ".csv"]
         ]
 
-        generators = self.get_ribbon_terms()
+        batch_size = self.data_type_config.get_generator_batch_size()
+        generators = self.get_ribbon_terms(batch_size)
 
 
         query_and_file_list = self.process_query_params(query_template_list)
@@ -71,24 +78,34 @@ class ExpressionRibbonETL(ETL):
         self.logger.info("Finished Expression Ribbon Data")
 
 
-    def get_ribbon_terms(self):
+    def get_ribbon_terms(self, batch_size):
         """get ribbon terms"""
 
         self.logger.debug("made it to the gocc ribbon retrieve")
 
-        return_set_rt = Neo4jHelper().run_single_query(self.expression_gocc_ribbon_retrieve_query)
+        # Each batch only fills one of the two output files; empty lists are skipped.
         gocc_ribbon_data = []
-        for record in return_set_rt:
+        for record in Neo4jHelper.run_streaming_query(self.expression_gocc_ribbon_retrieve_query):
             row = {"ebe_id": record["ebe.primaryKey"],
                    "go_id": record["slimTerm.primaryKey"]}
             gocc_ribbon_data.append(row)
 
-        gocc_self_ribbon_data = []
+            if len(gocc_ribbon_data) == batch_size:
+                yield [gocc_ribbon_data, []]
+                gocc_ribbon_data = []
+
+        if len(gocc_ribbon_data) > 0:
+            yield [gocc_ribbon_data, []]
 
-        return_set_srt = Neo4jHelper().run_single_query(self.gocc_self_ribbon_ebes_query)
-        for record in return_set_srt:
+        gocc_self_ribbon_data = []
+        for record in Neo4jHelper.run_streaming_query(self.gocc_self_ribbon_ebes_query):
             row = {"ebe_id": record["ebe.primaryKey"],
                    "go_id": record["got.primaryKey"]}
             gocc_self_ribbon_data.append(row)
 
-        yield [gocc_ribbon_data, gocc_self_ribbon_data]
+            if len(gocc_self_ribbon_data) == batch_size:
+                yield [[], gocc_self_ribbon_data]
+                gocc_self_ribbon_data = []
+
+        if len(gocc_self_ribbon_data) > 0:
+            yield [[], gocc_self_ribbon_data]
@@ -12,6 +12,10 @@ class ExpressionRibbonOtherETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = ['GOTerm']
+    write_labels = ['ExpressionBioEntity', 'GOTerm']
+    reads_graph = True
+
     # Querys which do not take params and can be used as is
 
     ribbonless_ebes_query = """
@@ -38,7 +42,9 @@ class ExpressionRibbonOtherETL(ETL):
         self.logger.info("Starting Expression Ribbon Data")
 
         query_template_list = [
-            [self.insert_ribonless_ebes_query_template, "30000", "expression_ribbonless_ebes" + ".csv"]
+            [self.insert_ribonless_ebes_query_template,
+             self.data_type_config.get_neo4j_commit_size("insert_ribonless_ebes_query_template", 30000),
+             "expression_ribbonless_ebes" + ".csv"]
         ]
 
         generators = self.get_ribbon_terms()
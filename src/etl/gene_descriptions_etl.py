@@ -9,7 +9,7 @@ import requests
 
 from collections import defaultdict
 from etl import ETL
-from etl.helpers import Neo4jHelper, ETLHelper
+from etl.helpers import Neo4jHelper, ETLHelper, OntologyCache
 from genedescriptions.config_parser import GenedescConfigParser
 from genedescriptions.descriptions_writer import DescriptionsWriter
 from genedescriptions.gene_description import GeneDescription
@@ -33,6 +33,11 @@ class GeneDescriptionsETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = ['Gene', 'Allele', 'Ontology', 'DiseaseEntityJoin', 'PublicationJoin',
+                   'OrthologyGeneJoin', 'OrthoAlgorithm', 'ExpressionBioEntity']
+    write_labels = ['Gene']
+    reads_graph = True
+
     # Query templates which take params and will be processed later
 
     gene_descriptions_query_template = """
@@ -267,19 +272,12 @@ class GeneDescriptionsETL(ETL):
         ontology = Ontology()
         terms_pairs = []
         if data_type == DataType.GO:
-            terms_pairs = Neo4jHelper.run_single_parameter_query(
-                self.get_ontology_pairs_query.format("GO", "GO"),
-                None)
+            terms_pairs = self.get_ontology_pairs("GO")
         elif data_type == DataType.DO:
-            terms_pairs = Neo4jHelper.run_single_parameter_query(
-                self.get_ontology_pairs_query.format("DO", "DO"),
-                None)
+            terms_pairs = self.get_ontology_pairs("DO")
         elif data_type == DataType.EXPR:
             if provider in EXPRESSION_PRVD_SUBTYPE_MAP:
-                terms_pairs = Neo4jHelper.run_single_parameter_query(
-                    self.get_ontology_pairs_query.format(EXPRESSION_PRVD_SUBTYPE_MAP[provider],
-                                                         EXPRESSION_PRVD_SUBTYPE_MAP[provider]),
-                    None)
+                terms_pairs = self.get_ontology_pairs(EXPRESSION_PRVD_SUBTYPE_MAP[provider])
         for terms_pair in terms_pairs:
             self.add_neo_term_to_ontobio_ontology_if_not_exists(
                 terms_pair["term1.primaryKey"], terms_pair["term1.name"], terms_pair["term1.type"],
@@ -323,6 +321,34 @@ class GeneDescriptionsETL(ETL):
         return ontology
 
 
+    def get_ontology_pairs(self, label):
+        """The IS_A and PART_OF pairs of an ontology as get_ontology_pairs_query returns
+           them, from the OntologyCache if the ontology ETL saved what it loaded"""
+
+        loaded = OntologyCache.get_loaded(label)
+        if loaded is None:
+            self.logger.info("No loaded %s ontology saved, reading it from Neo4j", label)
+            return Neo4jHelper.run_single_parameter_query(
+                self.get_ontology_pairs_query.format(label, label),
+                None)
+
+        terms = loaded['terms']
+        terms_pairs = []
+        for (child, parent, relationship) in loaded['edges']:
+            (child_name, child_type, child_is_obsolete) = terms.get(child, (None, None, None))
+            (parent_name, parent_type, parent_is_obsolete) = terms.get(parent, (None, None, None))
+            terms_pairs.append({"term1.primaryKey": child,
+                                "term1.name": child_name,
+                                "term1.type": child_type,
+                                "term1.isObsolete": child_is_obsolete,
+                                "term2.primaryKey": parent,
+                                "term2.name": parent_name,
+                                "term2.type": parent_type,
+                                "term2.isObsolete": parent_is_obsolete,
+                                "rel_type": relationship})
+
+        return terms_pairs
+
     @staticmethod
     def add_neo_term_to_ontobio_ontology_if_not_exists(term_id, term_label,
                                                        term_type, is_obsolete, ontology):
@@ -16,6 +16,11 @@ class GeneDiseaseOrthoETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = ['DiseaseEntityJoin', 'PublicationJoin', 'ECOTerm']
+    write_labels = ['Gene', 'DOTerm', 'ECOTerm', 'DiseaseEntityJoin', 'PublicationJoin',
+                    'Publication', 'Synonym']
+    reads_graph = True
+
     # Query templates which take params and will be processed later
 
     insert_gene_disease_ortho_query_template = """
@@ -77,7 +82,8 @@ class GeneDiseaseOrthoETL(ETL):
         self.logger.info("Starting Gene Disease Ortho Data: %s", subtype)
 
         query_template_list = [
-            [self.insert_gene_disease_ortho_query_template, "10000",
+            [self.insert_gene_disease_ortho_query_template,
+             self.data_type_config.get_neo4j_commit_size("insert_gene_disease_ortho_query_template", 10000),
              "gene_disease_by_orthology.csv"]
         ]
 
@@ -6,8 +6,7 @@ import multiprocessing
 import re
 
 from etl import ETL
-from etl.helpers import ETLHelper, OBOHelper
-from files import TXTFile
+from etl.helpers import ETLHelper, OntologyCache
 from transactors import CSVTransactor
 from transactors import Neo4jTransactor
 
@@ -17,6 +16,9 @@ class GenericOntologyETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = []
+    write_labels = ['Ontology', 'Synonym', 'SecondaryId']
+
     # Query templates which take params and will be processed later
 
     generic_ontology_term_query_template = """
@@ -104,20 +106,22 @@ class GenericOntologyETL(ETL):
 
         # This needs to be in this format (template, param1, params2) others will be ignored
         query_template_list = [
-            [self.generic_ontology_term_query_template, 600000,
+            [self.generic_ontology_term_query_template,
+             self.data_type_config.get_neo4j_commit_size("generic_ontology_term_query_template", 600000),
              "generic_ontology_term_" + ont_type + ".csv", ont_type],
             [self.generic_ontology_isas_query_template, commit_size,
              "generic_ontology_isas_" + ont_type + ".csv", ont_type, ont_type],
             [self.generic_ontology_partofs_query_template, commit_size,
              "generic_ontology_partofs_" + ont_type + ".csv", ont_type, ont_type],
-            [self.generic_ontology_synonyms_query_template, 400000,
+            [self.generic_ontology_synonyms_query_template,
+             self.data_type_config.get_neo4j_commit_size("generic_ontology_synonyms_query_template", 400000),
              "generic_ontology_synonyms_" + ont_type + ".csv", ont_type],
             [self.generic_ontology_altids_query_template, commit_size,
              "generic_ontology_altids_" + ont_type + ".csv", ont_type],
         ]
 
         # Obtain the generator
-        generators = self.get_generators(filepath, batch_size)
+        generators = self.get_generators(filepath, batch_size, ont_type)
 
         query_and_file_list = self.process_query_params(query_template_list)
         CSVTransactor.save_file_static(generators, query_and_file_list)
@@ -125,11 +129,10 @@ class GenericOntologyETL(ETL):
 
         self.logger.info("Finished Loading Generic Ontology Data: %s", sub_type.get_data_provider())
 
-    def get_generators(self, filepath, batch_size):
+    def get_generators(self, filepath, batch_size, ont_type):
         """Get Genrators"""
 
-        o_data = TXTFile(filepath).get_data()
-        parsed_line = OBOHelper.parse_obo(o_data)
+        parsed_line = OntologyCache.get_obo_terms(filepath)
 
         counter = 0
 
@@ -139,6 +142,8 @@ class GenericOntologyETL(ETL):
         partofs = []
         subsets = []
         altids = []
+        loaded_terms = {}
+        loaded_edges = []
 
         for line in parsed_line:  # Convert parsed obo term into a schema-friendly AGR dictionary.
 
@@ -201,12 +206,14 @@ class GenericOntologyETL(ETL):
                                 'oid' : ident,
                                 'isa' : isa_without_name}
                             isas.append(isas_dict_to_append)
+                            loaded_edges.append((ident, isa_without_name, 'IS_A'))
                 else:
                     if 'gci_filler=' not in o_is_as:
                         isa_without_name = o_is_as.split(' ')[0].strip()
                         isas_dict_to_append = {'oid' : ident,
                                                'isa' : isa_without_name}
                         isas.append(isas_dict_to_append)
+                        loaded_edges.append((ident, isa_without_name, 'IS_A'))
 
             # part_of processing
             relations = line.get('relationship')
@@ -222,6 +229,7 @@ class GenericOntologyETL(ETL):
                                     'partof': relationship_descriptors[1]
                                 }
                                 partofs.append(partof_dict_to_append)
+                                loaded_edges.append((ident, relationship_descriptors[1], 'PART_OF'))
                 else:
                     if 'gci_filler=' not in relations:
                         relationship_descriptors = relations.split(' ')
@@ -231,6 +239,7 @@ class GenericOntologyETL(ETL):
                                 'oid' : ident,
                                 'partof' : relationship_descriptors[1]}
                             partofs.append(partof_dict_to_append)
+                            loaded_edges.append((ident, relationship_descriptors[1], 'PART_OF'))
 
             definition = line.get('def')
             if definition is None:
@@ -264,6 +273,10 @@ class GenericOntologyETL(ETL):
                 }
 
                 terms.append(term_dict_to_append)
+                # The term query sets the properties ON CREATE, the first term wins.
+                loaded_terms.setdefault(ident, (line.get('name') or None,
+                                                line.get('namespace') or None,
+                                                is_obsolete))
 
             # Establishes the number of genes to yield (return) at a time.
             if counter == batch_size:
@@ -276,3 +289,10 @@ class GenericOntologyETL(ETL):
 
         if counter > 0:
             yield [terms, isas, partofs, syns, altids]
+
+        # The IS_A and PART_OF queries match both ends, so only edges between terms are loaded.
+        OntologyCache.save_loaded(ont_type,
+                                  loaded_terms,
+                                  [(child, parent, relationship)
+                                   for (child, parent, relationship) in loaded_edges
+                                   if child in loaded_terms and parent in loaded_terms])
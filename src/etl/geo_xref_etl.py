@@ -19,6 +19,10 @@ class GeoXrefETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = ['Gene', 'CrossReference']
+    write_labels = ['Gene', 'CrossReference']
+    reads_graph = True
+
     geo_xref_query_template = """
         USING PERIODIC COMMIT %s
         LOAD CSV WITH HEADERS FROM \'file:///%s\' AS row
@@ -44,8 +48,7 @@ class GeoXrefETL(ETL):
                     ETLHelper.species_lookup_by_data_provider(sub_type.get_data_provider()))
 
             commit_size = self.data_type_config.get_neo4j_commit_size()
-            #batch_size = self.data_type_config.get_generator_batch_size()
-            batch_size = 100000
+            batch_size = self.data_type_config.get_generator_batch_size(100000)
 
             generators = self.get_generators(sub_type, batch_size, species_encoded)
 
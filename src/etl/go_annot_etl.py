@@ -8,6 +8,7 @@ import multiprocessing
 from etl import ETL
 from etl.helpers import ETLHelper
 from transactors import CSVTransactor, Neo4jTransactor
+from files import CompressedFile
 
 
 class GOAnnotETL(ETL):
@@ -15,6 +16,9 @@ class GOAnnotETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = []
+    write_labels = ['Gene', 'GOTerm']
+
     # Query templates which take params and will be processed later
 
     main_query_template = """
@@ -24,6 +28,7 @@ class GOAnnotETL(ETL):
             MATCH (g:Gene {primaryKey:row.gene_id})
             MATCH (go:GOTerm:Ontology {primaryKey:row.go_id})
             CREATE (g)-[:ANNOTATED_TO]->(go) """
+    main_query_fields = ['gene_id', 'go_id']
 
     def __init__(self, config):
         super().__init__()
@@ -52,7 +57,7 @@ class GOAnnotETL(ETL):
         filepath = sub_type.get_file_to_download()
         filepath = os.path.join('tmp/', filepath)
         self.logger.info("goannot path: %s", filepath)
-        file = open(filepath, "r")
+        file = CompressedFile.open(filepath)
 
         self.logger.info("Finished Loading GOAnnot Data: %s", sub_type.get_data_provider())
 
@@ -95,13 +100,9 @@ class GOAnnotETL(ETL):
                 else:
                     gene = prefix + line[1]
 
-                go_id = line[4]
-                go_annot_dict = {
-                    'gene_id': gene,
-                    'go_id': go_id
-                }
+                # A row of main_query_fields.
                 counter = counter + 1
-                go_annot_list.append(go_annot_dict)
+                go_annot_list.append((gene, line[4]))
                 if counter == batch_size:
                     counter = 0
                     yield [go_annot_list]
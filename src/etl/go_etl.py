@@ -1,8 +1,8 @@
 """GO ETL"""
 
 import logging
-from ontobio import OntologyFactory
 from etl import ETL
+from etl.helpers import OBOHelper, OntologyCache
 from transactors import CSVTransactor, Neo4jTransactor
 
 
@@ -11,6 +11,9 @@ class GOETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = []
+    write_labels = ['GOTerm', 'Synonym', 'SecondaryId']
+
     # Query templates which take params and will be processed later
 
     main_query_template = """
@@ -124,8 +127,12 @@ class GOETL(ETL):
     def get_generators(self, filepath, batch_size):
         """Get Generators"""
 
-        ont = OntologyFactory().create(filepath)
-        parsed_line = ont.graph.copy().node
+        ont = OntologyCache.get_ontobio_ontology(filepath)
+        parents = OBOHelper.get_parents_by_relation(ont, ['subClassOf',
+                                                          'BFO:0000050',
+                                                          'RO:0002211',
+                                                          'RO:0002212',
+                                                          'RO:0002213'])
 
         go_term_list = []
         go_isas_list = []
@@ -135,21 +142,18 @@ class GOETL(ETL):
         go_negatively_regulates_list = []
         go_positively_regulates_list = []
         go_altids_list = []
+        loaded_terms = {}
+        loaded_edges = []
         counter = 0
 
         # Convert parsed obo term into a schema-friendly AGR dictionary.
-        for key, line in parsed_line.items():
-            counter = counter + 1
-            node = ont.graph.node[key]
+        # The graph is only read, nothing is copied or changed.
+        for key, node in ont.get_graph().nodes(data=True):
             if len(node) == 0:
                 continue
             if node.get('type') == 'PROPERTY':
                 continue
-
-            ### Switching id to curie form and saving URI in "uri"
-            ### might wildly break things later on???
-            node["uri"] = node["id"]
-            node["id"] = key
+            counter = counter + 1
 
             subset = []
             definition = ""
@@ -205,28 +209,25 @@ class GOETL(ETL):
                         converted_subsets.append(subset_str)
                     subset = converted_subsets
 
-            all_parents = ont.parents(key)
-            all_parents.append(key)
-
-            # Improves performance when traversing relations
-            all_parents_subont = ont.subontology(all_parents)
-            isas_without_names = all_parents_subont.parents(key, relations=['subClassOf'])
+            isas_without_names = parents['subClassOf'].get(key, [])
             for item in isas_without_names:
                 dictionary = {
                     "primary_id": key,
                     "primary_id2": item
                 }
                 go_isas_list.append(dictionary)
+                loaded_edges.append((key, item, 'IS_A'))
 
-            partofs_without_names = all_parents_subont.parents(key, relations=['BFO:0000050'])
+            partofs_without_names = parents['BFO:0000050'].get(key, [])
             for item in partofs_without_names:
                 dictionary = {
                     "primary_id": key,
                     "primary_id2": item
                 }
                 go_partofs_list.append(dictionary)
+                loaded_edges.append((key, item, 'PART_OF'))
 
-            regulates = all_parents_subont.parents(key, relations=['RO:0002211'])
+            regulates = parents['RO:0002211'].get(key, [])
 
             for item in regulates:
                 dictionary = {
@@ -235,7 +236,7 @@ class GOETL(ETL):
                 }
                 go_regulates_list.append(dictionary)
 
-            negatively_regulates = all_parents_subont.parents(key, relations=['RO:0002212'])
+            negatively_regulates = parents['RO:0002212'].get(key, [])
             for item in negatively_regulates:
                 dictionary = {
                     "primary_id": key,
@@ -243,7 +244,7 @@ class GOETL(ETL):
                 }
                 go_negatively_regulates_list.append(dictionary)
 
-            positively_regulates = all_parents_subont.parents(key, relations=['RO:0002213'])
+            positively_regulates = parents['RO:0002213'].get(key, [])
             for item in positively_regulates:
                 dictionary = {
                     "primary_id": key,
@@ -260,10 +261,12 @@ class GOETL(ETL):
                 'subset': subset,
                 'name_key': node.get('label'),
                 'is_obsolete': is_obsolete,
-                'href': 'http://amigo.geneontology.org/amigo/term/' + node['id'],
+                'href': 'http://amigo.geneontology.org/amigo/term/' + key,
             }
 
             go_term_list.append(dict_to_append)
+            # Empty CSV fields are loaded as nulls.
+            loaded_terms.setdefault(key, (node.get('label') or None, term_type or None, is_obsolete))
 
             if counter == batch_size:
                 yield [go_term_list,
@@ -294,3 +297,6 @@ class GOETL(ETL):
                    go_negatively_regulates_list,
                    go_positively_regulates_list,
                    go_altids_list]
+
+        # The IS_A and PART_OF queries MERGE the parent, so every edge is loaded.
+        OntologyCache.save_loaded('GO', loaded_terms, loaded_edges)
@@ -3,5 +3,6 @@ from .neo4j_helper import Neo4jHelper
 from .assembly_sequence_helper import AssemblySequenceHelper
 from .resource_descriptor_helper import ResourceDescriptorHelper
 from .obo_helper import OBOHelper
+from .ontology_cache import OntologyCache
 from .resource_descriptor_helper_2 import ResourceDescriptorHelper2
 from .text_processing_helper import TextProcessingHelper
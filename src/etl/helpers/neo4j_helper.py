@@ -1,6 +1,8 @@
 """Neo4j Helper"""
 
 import logging
+import os
+from multiprocessing.util import Finalize
 
 from neo4j import GraphDatabase
 from loader_common import ContextInfo
@@ -12,19 +14,167 @@ class Neo4jHelper():
     logger = logging.getLogger(__name__)
     context_info = ContextInfo()
 
+    # Schema applied by create_indices. Labels listed in unique_constraints are
+    # only ever created through MERGE on primaryKey, so the constraint (and the
+    # index Neo4j builds for it) backs those MERGEs. Labels that can legitimately
+    # share a primaryKey across nodes (Identifier, Ontology, CrossReference, ...)
+    # only get a plain index.
+    unique_constraints = [("Gene", "primaryKey"),
+                          ("Allele", "primaryKey"),
+                          ("Construct", "primaryKey"),
+                          ("Variant", "primaryKey"),
+                          ("Species", "primaryKey"),
+                          ("Transcript", "primaryKey"),
+                          ("Exon", "primaryKey"),
+                          ("AffectedGenomicModel", "primaryKey"),
+                          ("SequenceTargetingReagent", "primaryKey"),
+                          ("Publication", "primaryKey"),
+                          ("Phenotype", "primaryKey"),
+                          ("PhenotypeEntityJoin", "primaryKey"),
+                          ("DiseaseEntityJoin", "primaryKey"),
+                          ("ExpressionBioEntity", "primaryKey"),
+                          ("BioEntityGeneExpressionJoin", "primaryKey"),
+                          ("Stage", "primaryKey"),
+                          ("Synonym", "primaryKey"),
+                          ("SecondaryId", "primaryKey"),
+                          ("Chromosome", "primaryKey"),
+                          ("Assembly", "primaryKey"),
+                          ("GeneLevelConsequence", "primaryKey"),
+                          ("GenomicLocationBin", "primaryKey"),
+                          ("GOTerm", "primaryKey"),
+                          ("SOTerm", "primaryKey"),
+                          ("DOTerm", "primaryKey"),
+                          ("MITerm", "primaryKey"),
+                          ("ECOTerm", "primaryKey"),
+                          ("ZFATerm", "primaryKey"),
+                          ("ZFSTerm", "primaryKey"),
+                          ("CLTerm", "primaryKey"),
+                          ("WBBTTerm", "primaryKey"),
+                          ("FBCVTerm", "primaryKey"),
+                          ("FBBTTerm", "primaryKey"),
+                          ("MATerm", "primaryKey"),
+                          ("EMAPATerm", "primaryKey"),
+                          ("UBERONTerm", "primaryKey"),
+                          ("PATOTerm", "primaryKey"),
+                          ("APOTerm", "primaryKey"),
+                          ("DPOTerm", "primaryKey"),
+                          ("FYPOTerm", "primaryKey"),
+                          ("WBPhenotypeTerm", "primaryKey"),
+                          ("MPTerm", "primaryKey"),
+                          ("HPTerm", "primaryKey"),
+                          ("OBITerm", "primaryKey"),
+                          ("BTOTerm", "primaryKey"),
+                          ("CHEBITerm", "primaryKey"),
+                          ("MMUSDVTerm", "primaryKey"),
+                          ("BSPOTerm", "primaryKey"),
+                          ("MMOTerm", "primaryKey"),
+                          ("WBLSTerm", "primaryKey")]
+
+    indices = [("Gene", "modLocalId"),
+               ("Gene", "symbol"),
+               ("Gene", "gff3ID"),
+               ("Gene", "taxonId"),
+               ("TranscriptLevelConsequence", "primaryKey"),
+               ("Transcript", "gff3ID"),
+               ("Genotype", "primaryKey"),
+               ("SOTerm", "name"),
+               ("Ontology", "primaryKey"),
+               ("Ontology", "name"),
+               ("DOTerm", "oid"),
+               ("GOTerm", "oid"),
+               ("GenomicLocation", "primaryKey"),
+               ("Transgene", "primaryKey"),
+               ("Entity", "primaryKey"),
+               ("Identifier", "primaryKey"),
+               ("Association", "primaryKey"),
+               ("InteractionGeneJoin", "primaryKey"),
+               ("InteractionGeneJoin", "uuid"),
+               ("CrossReference", "primaryKey"),
+               ("CrossReference", "globalCrossRefId"),
+               ("CrossReference", "localId"),
+               ("CrossReference", "crossRefType"),
+               ("OrthologyGeneJoin", "primaryKey"),
+               ("GOTerm", "isObsolete"),
+               ("DOTerm", "isObsolete"),
+               ("UBERONTerm", "isObsolete"),
+               ("Ontology", "isObsolete"),
+               ("OrthoAlgorithm", "name"),
+               ("Gene", "modGlobalId"),
+               ("Gene", "localId"),
+               ("Load", "primaryKey"),
+               ("Feature", "primaryKey"),
+               ("PublicationJoin", "primaryKey"),
+               ("PhenotypePublicationJoin", "primaryKey"),
+               ("Variant", "hgvsNomenclature")]
+
+    composite_indices = [("CrossReference", ("primaryKey", "crossRefType"))]
+
+    # Seconds to wait for new indexes to come online before loading starts.
+    index_online_timeout = 3600
+
+    # One long-lived driver per process. The owning pid is recorded so a forked
+    # child opens its own connections instead of sharing its parent's sockets.
+    driver = None
+    driver_pid = None
+    session_count = 0
+
+    @staticmethod
+    def get_driver():
+        """Get the driver for this process, creating it on first use"""
+
+        if Neo4jHelper.driver_pid != os.getpid():
+            uri = "bolt://" + Neo4jHelper.context_info.env["NEO4J_HOST"] \
+                    + ":" + str(Neo4jHelper.context_info.env["NEO4J_PORT"])
+            pool_size = int(Neo4jHelper.context_info.env["NEO4J_MAX_CONNECTION_POOL_SIZE"])
+            Neo4jHelper.logger.debug("Creating Neo4j driver for process %s (pool size %s)",
+                                     os.getpid(),
+                                     pool_size)
+            Neo4jHelper.driver = GraphDatabase.driver(uri,
+                                                      auth=("neo4j", "neo4j"),
+                                                      max_connection_pool_size=pool_size)
+            Neo4jHelper.driver_pid = os.getpid()
+            Neo4jHelper.session_count = 0
+            # Finalizers also run when multiprocessing children exit, unlike atexit.
+            Finalize(None, Neo4jHelper.close_driver, exitpriority=10)
+
+        return Neo4jHelper.driver
+
+    @staticmethod
+    def session(**config):
+        """Open a session on this process's driver"""
+
+        Neo4jHelper.session_count += 1
+        return Neo4jHelper.get_driver().session(**config)
+
+    @staticmethod
+    def connection_stats():
+        """Connection reuse statistics for this process"""
+
+        return {"pid": os.getpid(),
+                "driver_open": Neo4jHelper.driver_pid == os.getpid(),
+                "sessions": Neo4jHelper.session_count}
+
+    @staticmethod
+    def close_driver():
+        """Close this process's driver, if it has one"""
+
+        if Neo4jHelper.driver_pid != os.getpid():
+            return
+
+        Neo4jHelper.logger.debug("Closing Neo4j driver for process %s: %s sessions shared one driver",
+                                 os.getpid(),
+                                 Neo4jHelper.session_count)
+        Neo4jHelper.driver.close()
+        Neo4jHelper.driver = None
+        Neo4jHelper.driver_pid = None
+
     @staticmethod
     def run_single_parameter_query(query, parameter):
         """Run single parameter query"""
 
-        uri = "bolt://" + Neo4jHelper.context_info.env["NEO4J_HOST"] \
-                + ":" + str(Neo4jHelper.context_info.env["NEO4J_PORT"])
-        graph = GraphDatabase.driver(uri,
-                                     auth=("neo4j", "neo4j"),
-                                     max_connection_pool_size=-1)
-
         Neo4jHelper.logger.debug("Running run_single_parameter_query. Please wait...")
         Neo4jHelper.logger.debug("Query: %s", query)
-        with graph.session() as session:
+        with Neo4jHelper.session() as session:
             with session.begin_transaction() as transaction:
                 return_set = transaction.run(query, parameter=parameter)
         return return_set
@@ -33,17 +183,24 @@ class Neo4jHelper():
     def run_single_query(query):
         """Run Single Query"""
 
-        uri = "bolt://" + Neo4jHelper.context_info.env["NEO4J_HOST"] \
-                + ":" + str(Neo4jHelper.context_info.env["NEO4J_PORT"])
-        graph = GraphDatabase.driver(uri,
-                                     auth=("neo4j", "neo4j"),
-                                     max_connection_pool_size=-1)
-
-        with graph.session() as session:
+        with Neo4jHelper.session() as session:
             with session.begin_transaction() as transaction:
                 return_set = transaction.run(query)
         return return_set
 
+    @staticmethod
+    def run_streaming_query(query, parameter=None, fetch_size=None):
+        """Run a read query and yield its records while the session is still open,
+           so the full result set is never buffered in memory"""
+
+        if fetch_size is None:
+            fetch_size = int(Neo4jHelper.context_info.env["NEO4J_FETCH_SIZE"])
+
+        Neo4jHelper.logger.debug("Streaming query (fetch size %s): %s", fetch_size, query)
+        with Neo4jHelper.session(fetch_size=fetch_size) as session:
+            for record in session.run(query, parameter=parameter):
+                yield record
+
     #def execute_transaction_batch(self, query, data, batch_size):
     #    logger.info("Executing batch query. Please wait...")
     #    logger.debug("Query: " + query)
@@ -54,103 +211,58 @@ class Neo4jHelper():
     #def split_into_chunks(self, data, batch_size):
     #    return (data[pos:pos + batch_size] for pos in range(0, len(data), batch_size))
 
+    @staticmethod
+    def _schema_definitions(session):
+        """Return ({(label, properties)}, {(label, properties)}) of the indexes and
+           unique constraints that already exist"""
+
+        existing_indices = set()
+        existing_constraints = set()
+        for record in session.run("CALL db.indexes()"):
+            index = record.data()
+            # Neo4j 3.5 reports tokenNames, 4.x reports labelsOrTypes.
+            labels = index.get("tokenNames") or index.get("labelsOrTypes") or []
+            key = (labels[0], tuple(index["properties"]))
+            if index.get("uniqueness") == "UNIQUE" or "unique" in str(index.get("type")):
+                existing_constraints.add(key)
+            else:
+                existing_indices.add(key)
+
+        return (existing_indices, existing_constraints)
+
     @staticmethod
     def create_indices():
-        """Create Indicies"""
-
-        uri = "bolt://" + Neo4jHelper.context_info.env["NEO4J_HOST"] \
-                + ":" + str(Neo4jHelper.context_info.env["NEO4J_PORT"])
-        driver = GraphDatabase.driver(uri,
-                                      auth=("neo4j", "neo4j"),
-                                      max_connection_pool_size=-1)
-
-        with driver.session() as session:
-            indicies = [":Gene(primaryKey)",
-                        ":Gene(modLocalId)",
-                        ":Gene(symbol)",
-                        ":Gene(gff3ID)",
-                        ":Gene(taxonId)",
-                        ":Construct(primaryKey)",
-                        ":Transcript(primaryKey)",
-                        ":TranscriptLevelConsequence(primaryKey)",
-                        ":GeneLevelConsequence(primaryKey)",
-                        ":Transcript(gff3ID)",
-                        ":GOTerm(primaryKey)",
-                        ":Genotype(primaryKey)",
-                        ":AffectedGenomicModel(primaryKey)",
-                        ":SOTerm(primaryKey)",
-                        ":SOTerm(name)",
-                        ":Ontology(primaryKey)",
-                        ":Ontology(name)",
-                        ":DOTerm(primaryKey)",
-                        ":DOTerm(oid)",
-                        ":GOTerm(oid)",
-                        ":GenomicLocation(primaryKey)",
-                        ":Assembly(primaryKey)",
-                        ":Publication(primaryKey)",
-                        ":Transgene(primaryKey)",
-                        ":DiseaseEntityJoin(primaryKey)",
-                        ":Species(primaryKey)",
-                        ":Entity(primaryKey)",
-                        ":Exon(primaryKey)",
-                        ":Synonym(primaryKey)",
-                        ":Identifier(primaryKey)",
-                        ":Association(primaryKey)",
-                        ":InteractionGeneJoin(primaryKey)",
-                        ":InteractionGeneJoin(uuid)",
-                        ":CrossReference(primaryKey)",
-                        ":CrossReference(globalCrossRefId)",
-                        ":CrossReference(localId)",
-                        ":CrossReference(crossRefType)",
-                        ":OrthologyGeneJoin(primaryKey)",
-                        ":GOTerm(isObsolete)",
-                        ":DOTerm(isObsolete)",
-                        ":UBERONTerm(isObsolete)",
-                        ":Ontology(isObsolete)",
-                        ":SecondaryId(primaryKey)",
-                        ":Chromosome(primaryKey)",
-                        ":OrthoAlgorithm(name)",
-                        ":Gene(modGlobalId)",
-                        ":Gene(localId)",
-                        ":Load(primaryKey)",
-                        ":Feature(primaryKey)",
-                        ":Allele(primaryKey)",
-                        ":MITerm(primaryKey)",
-                        ":Phenotype(primaryKey)",
-                        ":PhenotypeEntityJoin(primaryKey)",
-                        ":ExpressionBioEntity(primaryKey)",
-                        ":Stage(primaryKey)",
-                        ":PublicationJoin(primaryKey)",
-                        ":PhenotypePublicationJoin(primaryKey)",
-                        ":Variant(primaryKey)",
-                        ":Variant(hgvsNomenclature)",
-                        ":SequenceTargetingReagent(primaryKey)",
-                        ":ECOTerm(primaryKey)",
-                        ":ZFATerm(primaryKey)",
-                        ":ZFSTerm(primaryKey)",
-                        ":CLTerm(primaryKey)",
-                        ":WBBTTerm(primaryKey)",
-                        ":FBCVTerm(primaryKey)",
-                        ":FBBTTerm(primaryKey)",
-                        ":MATerm(primaryKey)",
-                        ":EMAPATerm(primaryKey)",
-                        ":UBERONTerm(primaryKey)",
-                        ":PATOTerm(primaryKey)",
-                        ":APOTerm(primaryKey)",
-                        ":DPOTerm(primaryKey)",
-                        ":FYPOTerm(primaryKey)",
-                        ":WBPhenotypeTerm(primaryKey)",
-                        ":MPTerm(primaryKey)",
-                        ":HPTerm(primaryKey)",
-                        ":OBITerm(primaryKey)",
-                        ":BTOTerm(primaryKey)",
-                        ":CHEBITerm(primaryKey)",
-                        ":MMUSDVTerm(primaryKey)",
-                        ":BSPOTerm(primaryKey)",
-                        ":MMOTerm(primaryKey)",
-                        ":WBLSTerm(primaryKey)",
-                        ":BioEntityGeneExpressionJoin(primaryKey)",
-                        ":Stage(primaryKey)"]
-
-            for index in indicies:
-                session.run("CREATE INDEX ON " + index)
+        """Create any missing constraints and indexes from the schema registry,
+           then wait for all of them to come online"""
+
+        wanted_constraints = [(label, (prop,)) for (label, prop) in Neo4jHelper.unique_constraints]
+        wanted_indices = [(label, (prop,)) for (label, prop) in Neo4jHelper.indices] \
+                         + list(Neo4jHelper.composite_indices)
+
+        with Neo4jHelper.session() as session:
+            (existing_indices, existing_constraints) = Neo4jHelper._schema_definitions(session)
+
+            statements = []
+            for (label, properties) in wanted_constraints:
+                if (label, properties) in existing_constraints:
+                    continue
+                # A plain index would block the constraint's own index.
+                if (label, properties) in existing_indices:
+                    statements.append("DROP INDEX ON :%s(%s)" % (label, properties[0]))
+                statements.append("CREATE CONSTRAINT ON (n:%s) ASSERT n.%s IS UNIQUE"
+                                  % (label, properties[0]))
+            for (label, properties) in wanted_indices:
+                if (label, properties) in existing_indices \
+                        or (label, properties) in existing_constraints:
+                    continue
+                statements.append("CREATE INDEX ON :%s(%s)" % (label, ", ".join(properties)))
+
+            Neo4jHelper.logger.info("Creating %s schema items (%s already present)",
+                                    len(statements),
+                                    len(existing_indices) + len(existing_constraints))
+            for statement in statements:
+                Neo4jHelper.logger.debug(statement)
+                session.run(statement).consume()
+
+            Neo4jHelper.logger.info("Waiting for indexes to come online")
+            session.run("CALL db.awaitIndexes(%s)" % Neo4jHelper.index_online_timeout).consume()
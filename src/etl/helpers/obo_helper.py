@@ -1,6 +1,7 @@
 """OBO Helper"""
 
 import logging
+from array import array
 
 from ontobio import OntologyFactory
 from .etl_helper import ETLHelper
@@ -11,10 +12,91 @@ class OBOHelper():
 
     logger = logging.getLogger(__name__)
 
+    @staticmethod
+    def get_closure(edges):
+        """Every (term, ancestor) pair connected by one or more of the (child, parent)
+           edges, as the Cypher pattern (term)-[*]->(ancestor) with DISTINCT finds them.
+
+           Terms are numbered and visited parents first, so the ancestors of a term are
+           its parents plus their (already known) ancestors, kept as sorted int arrays.
+           Terms on or below a cycle never become ready and are walked one by one."""
+
+        numbers = {}
+        for edge in edges:
+            for term in edge:
+                numbers.setdefault(term, len(numbers))
+        terms = list(numbers)
+
+        parents = [set() for term in terms]
+        children = [[] for term in terms]
+        for (child, parent) in edges:
+            if numbers[parent] not in parents[numbers[child]]:
+                parents[numbers[child]].add(numbers[parent])
+                children[numbers[parent]].append(numbers[child])
+
+        waiting = [len(term_parents) for term_parents in parents]
+        order = [number for number in range(len(terms)) if waiting[number] == 0]
+        for number in order:
+            for child in children[number]:
+                waiting[child] = waiting[child] - 1
+                if waiting[child] == 0:
+                    order.append(child)
+
+        ancestors = [None] * len(terms)
+        for number in order:
+            term_ancestors = set(parents[number])
+            for parent in parents[number]:
+                term_ancestors.update(ancestors[parent])
+            ancestors[number] = array('i', sorted(term_ancestors))
+
+        if len(order) < len(terms):
+            OBOHelper.logger.warning("%s terms are on or below an IS_A/PART_OF cycle",
+                                     len(terms) - len(order))
+        for number in range(len(terms)):
+            if ancestors[number] is not None:
+                continue
+            term_ancestors = set()
+            stack = list(parents[number])
+            while len(stack) > 0:
+                ancestor = stack.pop()
+                if ancestor in term_ancestors:
+                    continue
+                term_ancestors.add(ancestor)
+                if ancestors[ancestor] is not None:
+                    term_ancestors.update(ancestors[ancestor])
+                else:
+                    stack.extend(parents[ancestor])
+            ancestors[number] = array('i', sorted(term_ancestors))
+
+        for (number, term) in enumerate(terms):
+            for ancestor in ancestors[number]:
+                yield (term, terms[ancestor])
+
+    @staticmethod
+    def get_parents_by_relation(ont, relations):
+        """The direct parents of every term over each of relations, found in one pass
+           over the edges instead of a subontology per term: {relation: {term: [parent]}}.
+           A term's parents are the ones ont.parents(term, relations=[relation]) returns,
+           in the same order."""
+
+        parents = {relation: {} for relation in relations}
+        for (term, term_parents) in ont.get_graph().pred.items():
+            for (parent, edges) in term_parents.items():
+                for relation in {edge['pred'] for edge in edges.values()}:
+                    if relation in parents:
+                        parents[relation].setdefault(term, []).append(parent)
+
+        return parents
+
     def get_data(self, filepath):
         """Get Data"""
 
         ont = OntologyFactory().create(filepath)
+        parents = self.get_parents_by_relation(ont, ['subClassOf',
+                                                     'BFO:0000050',
+                                                     'RO:0002211',
+                                                     'RO:0002212',
+                                                     'RO:0002213'])
 
         parsed_line = ont.graph.copy().node
 
@@ -114,17 +196,11 @@ class OBOHelper():
             if xrefs is None:
                 xrefs = []
 
-            all_parents = ont.parents(key)
-            all_parents.append(key)
-
-            # Improves performance when traversing relations
-            all_parents_subont = ont.subontology(all_parents)
-
-            isas_without_names = all_parents_subont.parents(key, relations=['subClassOf'])
-            partofs_without_names = all_parents_subont.parents(key, relations=['BFO:0000050'])
-            regulates = all_parents_subont.parents(key, relations=['RO:0002211'])
-            negatively_regulates = all_parents_subont.parents(key, relations=['RO:0002212'])
-            positively_regulates = all_parents_subont.parents(key, relations=['RO:0002213'])
+            isas_without_names = parents['subClassOf'].get(key, [])
+            partofs_without_names = parents['BFO:0000050'].get(key, [])
+            regulates = parents['RO:0002211'].get(key, [])
+            negatively_regulates = parents['RO:0002212'].get(key, [])
+            positively_regulates = parents['RO:0002213'].get(key, [])
 
             def_links_unprocessed = []
             def_links = ""
@@ -234,66 +310,69 @@ class OBOHelper():
         return ont
 
     @staticmethod
-    def process_line(line, o_dict, within_term):
-        """Process Line"""
-
-        if len(line.strip()) == 0: # If the line is blank, reset withinTerm and kick it back.
-            within_term = False
-            return o_dict, within_term # The o_dict should be fully populated at this point.
-
-        if ":" in line:
-            # Split the lines on the first ':'
-            key, value = line.strip().split(':', 1)
-
-            # Remove erroneous first character from the split.
-            # TODO Typical whitespace removal doesn't work? Why?
-            value = value[1:]
-            if key in o_dict:
-                # If it's an entry with a single string, turn it into a list.
-                if isinstance(o_dict[key], str):
-                    temp_value = o_dict[key]
-                    o_dict[key] = [temp_value, value]
-                # If it's already a list, append to it.
-                elif isinstance(o_dict[key], list):
-                    o_dict[key].append(value)
-            # If it's the first time we're seeing this key-value, make a new entry.
-            else:
-                o_dict[key] = value
-        else:
-            OBOHelper.logger.info(line)
-            OBOHelper.logger.info(o_dict)
-
-        return o_dict, within_term
+    def strip_comment(value):
+        """value without its trailing "! comment". A "!" that is escaped or inside
+           a quoted string is part of the value."""
+
+        position = 0
+        while True:
+            bang = value.find('!', position)
+            if bang == -1:
+                return value
+            quote = value.find('"', position, bang)
+            escape = value.find('\\', position, bang)
+            if quote == -1 and escape == -1:
+                return value[:bang].rstrip()
+
+            if escape != -1 and (quote == -1 or escape < quote):
+                position = escape + 2
+                continue
 
+            # Skip to the end of the quoted string, past any escaped quotes.
+            position = quote + 1
+            while True:
+                position = value.find('"', position) + 1
+                if position == 0:
+                    return value
+                escapes = len(value[:position - 1]) - len(value[:position - 1].rstrip('\\'))
+                if escapes % 2 == 0:
+                    break
 
     @staticmethod
-    def parse_obo(data):
-        """Parse OBO"""
-
-        ontology_data = []
-        o_dict = {}
-        within_term = False
-        within_typedef = False
-
-        # Ignores withinTypedef entries.
-        for line in data:
-            if '[Term]' in line:
-                within_term = True
-
-                # If o_dict has data (from pervious [Term]) add it to the list first.
-                if o_dict:
-                    ontology_data.append(o_dict)
-                    o_dict = {}
-                else:
-                    continue
-            elif '[Typedef]' in line:
-                within_typedef = True # Used for skipping data.
+    def parse_obo(lines):
+        """Parse OBO lines (e.g. an open file), yielding a dict per [Term] stanza as it
+           ends. Each tag maps to its value or, if the tag is repeated, to the list of
+           its values. Values keep their quotes, escapes and {qualifiers}, trailing
+           comments are dropped. Other stanzas and the header are skipped."""
+
+        term = None
+        for line in lines:
+            (tag, separator, value) = line.partition(':')
+            if len(separator) == 0:
+                line = line.strip()
+                if len(line) > 0 and line[0] == '[' and line[-1] == ']':
+                    if term:
+                        yield term
+                    term = {} if line == '[Term]' else None
+                continue
+            if term is None:
+                continue
+
+            tag = tag.strip()
+            if len(tag) == 0 or tag[0] == '!':
+                continue
+            value = value.strip()
+            if '!' in value:
+                value = OBOHelper.strip_comment(value)
+
+            # A value only becomes a list when its tag repeats.
+            values = term.get(tag)
+            if values is None:
+                term[tag] = value
+            elif isinstance(values, list):
+                values.append(value)
             else:
-                if within_term is True:
-                    o_dict, within_term = OBOHelper.process_line(line, o_dict, within_term)
-                elif within_typedef is True: # Skip Typedefs, look for empty line.
-                    if len(line.strip()) == 0:
-                        within_typedef = False # Reset withinTypedef
-        ontology_data.append(o_dict)
-
-        return ontology_data
+                term[tag] = [values, value]
+
+        if term:
+            yield term
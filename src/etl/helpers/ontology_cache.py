@@ -0,0 +1,222 @@
+"""Ontology Cache"""
+
+import glob
+import hashlib
+import logging
+import os
+import pickle
+from array import array
+
+import networkx
+from ontobio import OntologyFactory, Ontology
+
+from files import CompressedFile
+from .obo_helper import OBOHelper
+
+
+class OntologyCache():
+    """Parsed ontologies, pickled in tmp/ontology_cache so every ETL and process that
+       needs one reads compact tables instead of parsing the file again.
+
+       A parse is keyed by the checksum of the file it came from and reused by later
+       runs until the file changes. The ontology ETLs also save the terms and IS_A /
+       PART_OF edges they load under the label of their terms, so ClosureETL and
+       GeneDescriptionsETL get them without reading them back from Neo4j. Those are
+       cleared when the loader starts, only what this run loaded is used."""
+
+    logger = logging.getLogger(__name__)
+
+    cache_path = 'tmp/ontology_cache'
+
+    # Bumped when the layout of a cached parse changes.
+    format_version = 3
+
+    # Terms per pickle in a streamed parse.
+    chunk_size = 10000
+
+    @staticmethod
+    def get_checksum(filepath):
+        """md5 of the contents of filepath"""
+
+        checksum = hashlib.md5()
+        with open(filepath, 'rb') as file_handle:
+            for block in iter(lambda: file_handle.read(1024 * 1024), b''):
+                checksum.update(block)
+
+        return checksum.hexdigest()
+
+    @staticmethod
+    def _get_parse_path(filepath, parser_name, checksum):
+        return os.path.join(OntologyCache.cache_path,
+                            '%s_%s_%s_v%s.pickle' % (parser_name,
+                                                     os.path.basename(filepath),
+                                                     checksum,
+                                                     OntologyCache.format_version))
+
+    @staticmethod
+    def _dump(file_path, data):
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path + '.tmp', 'wb') as cache_file:
+            pickle.dump(data, cache_file, pickle.HIGHEST_PROTOCOL)
+        os.replace(file_path + '.tmp', file_path)
+
+    @staticmethod
+    def get_parse(filepath, parser_name, parse):
+        """parse(filepath), or what it returned the last time this file was parsed by
+           parser_name. Parses of earlier versions of the file are deleted."""
+
+        checksum = OntologyCache.get_checksum(filepath)
+        parse_path = OntologyCache._get_parse_path(filepath, parser_name, checksum)
+        if os.path.exists(parse_path):
+            OntologyCache.logger.info("Using the cached %s parse of %s", parser_name, filepath)
+            with open(parse_path, 'rb') as cache_file:
+                return pickle.load(cache_file)
+
+        parsed = parse(filepath)
+        OntologyCache._remove_stale_parses(filepath, parser_name)
+        OntologyCache._dump(parse_path, parsed)
+
+        return parsed
+
+    @staticmethod
+    def _remove_stale_parses(filepath, parser_name):
+        for stale_path in glob.glob(OntologyCache._get_parse_path(filepath, parser_name, '*')):
+            os.remove(stale_path)
+
+    @staticmethod
+    def get_obo_terms(filepath):
+        """Yield the term dicts OBOHelper.parse_obo parses from an OBO file. They are
+           streamed from the file, or from the cached parse if the file is unchanged,
+           so only a chunk of them is held at a time. The cached parse is a sequence
+           of pickled chunks, written as the terms are parsed."""
+
+        parse_path = OntologyCache._get_parse_path(filepath,
+                                                   'obo',
+                                                   OntologyCache.get_checksum(filepath))
+        if os.path.exists(parse_path):
+            OntologyCache.logger.info("Using the cached obo parse of %s", filepath)
+            with open(parse_path, 'rb') as cache_file:
+                while True:
+                    try:
+                        chunk = pickle.load(cache_file)
+                    except EOFError:
+                        return
+                    yield from chunk
+
+        os.makedirs(OntologyCache.cache_path, exist_ok=True)
+        complete = False
+        try:
+            with CompressedFile.open(filepath) as file_handle, \
+                    open(parse_path + '.tmp', 'wb') as cache_file:
+                chunk = []
+                for term in OBOHelper.parse_obo(file_handle):
+                    chunk.append(term)
+                    if len(chunk) == OntologyCache.chunk_size:
+                        pickle.dump(chunk, cache_file, pickle.HIGHEST_PROTOCOL)
+                        yield from chunk
+                        chunk = []
+                pickle.dump(chunk, cache_file, pickle.HIGHEST_PROTOCOL)
+                yield from chunk
+            complete = True
+        finally:
+            # A parse that was not read to the end is not cached.
+            if complete:
+                OntologyCache._remove_stale_parses(filepath, 'obo')
+                os.replace(parse_path + '.tmp', parse_path)
+            elif os.path.exists(parse_path + '.tmp'):
+                os.remove(parse_path + '.tmp')
+
+    @staticmethod
+    def get_ontobio_tables(ont):
+        """The nodes and edges of an ontobio graph as a term table and edge arrays:
+           {'terms': [(id, attributes)], 'parents', 'children', 'preds': array of
+           indices, 'pred_names': [pred], 'edge_attributes': {edge: other attributes}}"""
+
+        graph = ont.get_graph()
+        terms = list(graph.nodes(data=True))
+        numbers = {term_id: number for (number, (term_id, attributes)) in enumerate(terms)}
+        pred_numbers = {}
+        tables = {'terms': terms,
+                  'parents': array('i'),
+                  'children': array('i'),
+                  'preds': array('i'),
+                  'pred_names': [],
+                  'edge_attributes': {}}
+
+        # Edges are listed by child so a rebuilt graph lists the parents in the same order.
+        for (child, parents) in graph.pred.items():
+            for (parent, edges) in parents.items():
+                for attributes in edges.values():
+                    pred = attributes.get('pred')
+                    if pred not in pred_numbers:
+                        pred_numbers[pred] = len(tables['pred_names'])
+                        tables['pred_names'].append(pred)
+                    other_attributes = {key: value for (key, value) in attributes.items()
+                                        if key != 'pred'}
+                    if len(other_attributes) > 0:
+                        tables['edge_attributes'][len(tables['preds'])] = other_attributes
+                    tables['parents'].append(numbers[parent])
+                    tables['children'].append(numbers[child])
+                    tables['preds'].append(pred_numbers[pred])
+
+        return tables
+
+    @staticmethod
+    def get_ontobio_ontology(filepath):
+        """The ontobio Ontology of an OBO graph file, rebuilt from the cached tables of
+           an earlier parse of the same file if there is one"""
+
+        parsed = []
+
+        def parse(path):
+            parsed.append(OntologyFactory().create(path))
+            return OntologyCache.get_ontobio_tables(parsed[0])
+
+        tables = OntologyCache.get_parse(filepath, 'ontobio', parse)
+        if len(parsed) > 0:
+            return parsed[0]
+
+        graph = networkx.MultiDiGraph()
+        graph.add_nodes_from(tables['terms'])
+        term_ids = [term_id for (term_id, attributes) in tables['terms']]
+        for (edge, (parent, child, pred)) in enumerate(zip(tables['parents'],
+                                                           tables['children'],
+                                                           tables['preds'])):
+            graph.add_edge(term_ids[parent],
+                           term_ids[child],
+                           pred=tables['pred_names'][pred],
+                           **tables['edge_attributes'].get(edge, {}))
+
+        return Ontology(handle=filepath, graph=graph)
+
+    @staticmethod
+    def _get_loaded_path(label):
+        return os.path.join(OntologyCache.cache_path, 'loaded_%s.pickle' % label)
+
+    @staticmethod
+    def clear_loaded():
+        """Delete the terms and edges saved by earlier runs"""
+
+        for loaded_path in glob.glob(OntologyCache._get_loaded_path('*')):
+            OntologyCache.logger.debug("Deleting %s from an earlier run", loaded_path)
+            os.remove(loaded_path)
+
+    @staticmethod
+    def save_loaded(label, terms, edges):
+        """Save what an ETL loaded as <label>Term nodes: terms {id: (name, type,
+           is_obsolete)} as the nodes hold them and edges [(child, parent, relationship
+           type)], the IS_A and PART_OF relationships the load queries create"""
+
+        OntologyCache._dump(OntologyCache._get_loaded_path(label),
+                            {'terms': terms, 'edges': edges})
+
+    @staticmethod
+    def get_loaded(label):
+        """The terms and edges saved for label, None if no ETL of this run saved them"""
+
+        loaded_path = OntologyCache._get_loaded_path(label)
+        if not os.path.exists(loaded_path):
+            return None
+
+        with open(loaded_path, 'rb') as cache_file:
+            return pickle.load(cache_file)
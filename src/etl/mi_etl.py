@@ -3,8 +3,7 @@
 import logging
 
 from etl import ETL
-from etl.helpers import OBOHelper
-from files import TXTFile
+from etl.helpers import OntologyCache
 from transactors import CSVTransactor, Neo4jTransactor
 
 
@@ -13,6 +12,9 @@ class MIETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = []
+    write_labels = ['MITerm']
+
     # Query templates which take params and will be processed later
 
     main_query_template = """
@@ -35,7 +37,8 @@ class MIETL(ETL):
         filepath = self.data_type_config.get_single_filepath()
         generators = self.get_generators(filepath)
 
-        query_template_list = [[self.main_query_template, 10000, "mi_term_data.csv"]]
+        commit_size = self.data_type_config.get_neo4j_commit_size("main_query_template", 10000)
+        query_template_list = [[self.main_query_template, commit_size, "mi_term_data.csv"]]
 
         query_and_file_list = self.process_query_params(query_template_list)
         CSVTransactor.save_file_static(generators, query_and_file_list)
@@ -106,8 +109,7 @@ class MIETL(ETL):
     def get_generators(self, filepath):
         """Create Genrators"""
 
-        o_data = TXTFile(filepath).get_data()
-        parsed_line = OBOHelper.parse_obo(o_data)
+        parsed_line = OntologyCache.get_obo_terms(filepath)
 
         processed_mi_list = []
 
@@ -148,3 +150,8 @@ class MIETL(ETL):
                 processed_mi_list.append(dict_to_append)
 
         yield [processed_mi_list]
+
+        # MI terms have no name, type or isObsolete and no IS_A or PART_OF edges.
+        OntologyCache.save_loaded('MI',
+                                  {row['oid']: (None, None, None) for row in processed_mi_list},
+                                  [])
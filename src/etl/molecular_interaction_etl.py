@@ -18,6 +18,10 @@ class MolecularInteractionETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = ['Gene', 'CrossReference']
+    write_labels = ['Gene', 'MITerm', 'InteractionGeneJoin', 'Publication', 'CrossReference']
+    reads_graph = True
+
     # Query templates which take params and will be processed later
 
     main_query_template = """
@@ -125,9 +129,7 @@ class MolecularInteractionETL(ETL):
 
         query = "MATCH (g:Gene) RETURN g.primaryKey"
 
-        result = Neo4jHelper().run_single_query(query)
-
-        for record in result:
+        for record in Neo4jHelper.run_streaming_query(query):
             master_gene_set.add(record['g.primaryKey'])
 
         return master_gene_set
@@ -139,7 +141,7 @@ class MolecularInteractionETL(ETL):
         query = """MATCH (g:Gene)-[C:CROSS_REFERENCE]-(cr:CrossReference)
                    WHERE cr.prefix = {parameter}
                    RETURN g.primaryKey, cr.globalCrossRefId"""
-        return Neo4jHelper().run_single_parameter_query(query, crossref_prefix)
+        return Neo4jHelper.run_streaming_query(query, crossref_prefix)
 
     def populate_crossreference_dictionary(self):
         """ We're populating a rather large dictionary to use for looking up Alliance genes by
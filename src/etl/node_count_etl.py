@@ -12,6 +12,10 @@ class NodeCountETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = None
+    write_labels = []
+    reads_graph = True
+
     def __init__(self, config):
         super().__init__()
         self.data_type_config = config
@@ -4,13 +4,11 @@ from itertools import permutations
 import logging
 import uuid
 import multiprocessing
-import codecs
 from random import shuffle
-import ijson
 
 from etl import ETL
 from etl.helpers import ETLHelper
-#from files import JSONFile
+from files import JSONFile, CompressedFile
 from transactors import CSVTransactor, Neo4jTransactor
 
 
@@ -20,6 +18,9 @@ class OrthologyETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = []
+    write_labels = ['Gene', 'OrthologyGeneJoin', 'OrthoAlgorithm']
+
     # Query templates which take params and will be processed later
 
     main_query_template = """
@@ -134,9 +135,10 @@ class OrthologyETL(ETL):
 
         query_template_list = []
 
+        main_commit_size = self.data_type_config.get_neo4j_commit_size("main_query_template", 100000)
         for mod_sub_type in sub_types:
             if mod_sub_type != sub_type.get_data_provider():
-                query_template_list.append([self.main_query_template, "100000",\
+                query_template_list.append([self.main_query_template, main_commit_size,\
                     "orthology_data_" + sub_type.get_data_provider() + "_" + mod_sub_type + ".csv"])
 
         query_template_list.append([self.matched_algorithm_query_template, commit_size,
@@ -207,9 +209,9 @@ class OrthologyETL(ETL):
                 list_of_mod_lists[mod_sub_type] = []
 
         self.logger.info("streaming json data from %s ...", datafile)
-        with codecs.open(datafile, 'r', 'utf-8') as file_handle:
+        with CompressedFile.open(datafile, 'rb') as file_handle:
 
-            for ortho_record in ijson.items(file_handle, 'data.item'):
+            for ortho_record in JSONFile.items(file_handle, 'data.item'):
                 # Sort out identifiers and prefixes.
                 gene_1 = ETLHelper.process_identifiers(ortho_record['gene1'])
                 # 'DRSC:'' removed, local ID, functions as display ID.
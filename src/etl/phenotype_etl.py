@@ -16,6 +16,10 @@ class PhenoTypeETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = []
+    write_labels = ['Phenotype', 'PhenotypeEntityJoin', 'PublicationJoin', 'Publication', 'Gene',
+                    'Allele', 'AffectedGenomicModel']
+
     # Query templates which take params and will be processed later
 
     execute_allele_query_template = """
@@ -166,7 +170,7 @@ class PhenoTypeETL(ETL):
 
         self.logger.info("Loading Phenotype Data: %s", sub_type.get_data_provider())
         filepath = sub_type.get_filepath()
-        data = JSONFile().get_data(filepath)
+        data = JSONFile().get_stream(filepath)
         self.logger.info("Finished Loading Phenotype Data: %s", sub_type.get_data_provider())
 
         if data is None:
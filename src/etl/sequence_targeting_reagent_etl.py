@@ -15,6 +15,9 @@ class SequenceTargetingReagentETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = []
+    write_labels = ['SequenceTargetingReagent', 'Gene', 'Species', 'SecondaryId', 'Synonym']
+
     # Query templates which take params and will be processed later
 
     sequence_targeting_reagent_query_template = """
@@ -92,7 +95,7 @@ class SequenceTargetingReagentETL(ETL):
                          sub_type.get_data_provider())
         filepath = sub_type.get_filepath()
         self.logger.info(filepath)
-        data = JSONFile().get_data(filepath)
+        data = JSONFile().get_stream(filepath)
         self.logger.info("Finished Loading Sequence Targeting Reagent Data: %s",
                          sub_type.get_data_provider())
 
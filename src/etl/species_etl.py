@@ -13,6 +13,9 @@ class SpeciesETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = []
+    write_labels = ['Species']
+
     # Query templates which take params and will be processed later
 
     main_query_template = """
@@ -40,7 +43,8 @@ class SpeciesETL(ETL):
         filepath = 'https://raw.githubusercontent.com/alliance-genome/agr_schemas/master/ingest/species/species.yaml'
         generators = self.get_generators(filepath)
 
-        query_template_list = [[self.main_query_template, 10000, "species_data.csv"]]
+        commit_size = self.data_type_config.get_neo4j_commit_size("main_query_template", 10000)
+        query_template_list = [[self.main_query_template, commit_size, "species_data.csv"]]
 
         query_and_file_list = self.process_query_params(query_template_list)
         CSVTransactor.save_file_static(generators, query_and_file_list)
@@ -8,6 +8,7 @@ import uuid
 from etl import ETL
 from transactors import CSVTransactor
 from transactors import Neo4jTransactor
+from files import CompressedFile
 
 
 class TranscriptETL(ETL):
@@ -16,6 +17,10 @@ class TranscriptETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = []
+    write_labels = ['Transcript', 'Exon', 'Gene', 'SOTerm', 'Chromosome', 'Assembly',
+                    'GenomicLocation']
+
     # Query templates which take params and will be processed later
 
 
@@ -159,7 +164,7 @@ class TranscriptETL(ETL):
     def get_generators(self, filepath, batch_size):
         """Get Generators"""
 
-        with open(filepath) as file_handle:
+        with CompressedFile.open(filepath) as file_handle:
             transcript_maps = []
             gene_maps = []
             exon_maps = []
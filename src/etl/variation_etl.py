@@ -17,6 +17,10 @@ class VariationETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = []
+    write_labels = ['Variant', 'Allele', 'Gene', 'SOTerm', 'Chromosome', 'Assembly',
+                    'GenomicLocation', 'Synonym', 'CrossReference']
+
     # Query templates which take params and will be processed later
 
     variation_query_template = """
@@ -108,7 +112,7 @@ class VariationETL(ETL):
 
         self.logger.info("Loading Variation Data: %s", sub_type.get_data_provider())
         filepath = sub_type.get_filepath()
-        data = JSONFile().get_data(filepath)
+        data = JSONFile().get_stream(filepath)
         self.logger.info("Finished Loading Variation Data: %s", sub_type.get_data_provider())
 
         if data is None:
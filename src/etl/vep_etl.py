@@ -15,6 +15,9 @@ class VEPETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = []
+    write_labels = ['GeneLevelConsequence', 'Gene', 'Variant']
+
     # Query templates which take params and will be processed later
 
     vep_gene_query_template = """
@@ -15,6 +15,9 @@ class VEPTranscriptETL(ETL):
 
     logger = logging.getLogger(__name__)
 
+    read_labels = []
+    write_labels = ['TranscriptLevelConsequence', 'Transcript', 'Variant', 'Synonym']
+
     # Query templates which take params and will be processed later
 
     vep_transcript_query_template = """
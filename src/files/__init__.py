@@ -1,6 +1,9 @@
+from .compressed_file import CompressedFile
 from .csv_file import CSVFile
 from .txt_file import TXTFile
 from .json_file import JSONFile
+from .file_downloader import FileDownloader
+from .file_cache import FileCache
 from .s3_file import S3File
 from .tar_file import TARFile
 from .download import Download
@@ -0,0 +1,73 @@
+"""Compressed File"""
+
+import bz2
+import codecs
+import gzip
+import io
+import logging
+import lzma
+
+# Faster gzip implementations, used when they are installed.
+try:
+    from isal import igzip as fast_gzip
+except ImportError:
+    try:
+        from zlib_ng import gzip_ng_threaded as fast_gzip
+    except ImportError:
+        fast_gzip = None
+
+
+class CompressedFile():
+    """Opens a file for reading whether or not it is compressed. gzip, bzip2 and xz
+       are recognised by their magic bytes rather than the file name, so a download
+       can be read straight from disk without expanding it in tmp first. A leading
+       UTF-8 byte order mark is skipped, the file itself is never modified."""
+
+    logger = logging.getLogger(__name__)
+
+    magic_bytes = [(b'\x1f\x8b', 'gzip'),
+                   (b'BZh', 'bzip2'),
+                   (b'\xfd7zXZ\x00', 'xz')]
+
+    @staticmethod
+    def get_compression(filename):
+        """gzip, bzip2, xz or None"""
+
+        with open(filename, 'rb') as file_handle:
+            start = file_handle.read(6)
+
+        for (magic, compression) in CompressedFile.magic_bytes:
+            if start.startswith(magic):
+                return compression
+
+        return None
+
+    @staticmethod
+    def open(filename, mode='rt', encoding='utf-8', errors=None, newline=None):
+        """Open filename for reading, decompressing on the fly. mode is 'rt' for
+           a text handle or 'rb' for a binary one."""
+
+        compression = CompressedFile.get_compression(filename)
+
+        if compression is None:
+            binary_handle = open(filename, 'rb')
+        elif compression == 'gzip' and fast_gzip is not None:
+            CompressedFile.logger.debug("Decompressing %s with %s", filename, fast_gzip.__name__)
+            binary_handle = fast_gzip.open(filename, 'rb')
+        elif compression == 'gzip':
+            binary_handle = gzip.open(filename, 'rb')
+        elif compression == 'bzip2':
+            binary_handle = bz2.open(filename, 'rb')
+        else:
+            binary_handle = lzma.open(filename, 'rb')
+
+        if not binary_handle.seekable():
+            binary_handle = io.BufferedReader(binary_handle)
+        if binary_handle.peek(len(codecs.BOM_UTF8)).startswith(codecs.BOM_UTF8):
+            CompressedFile.logger.debug("Skipping the byte order mark of %s", filename)
+            binary_handle.read(len(codecs.BOM_UTF8))
+
+        if mode == 'rb':
+            return binary_handle
+
+        return io.TextIOWrapper(binary_handle, encoding=encoding, errors=errors, newline=newline)
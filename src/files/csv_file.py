@@ -1,10 +1,10 @@
 """CSV file"""
 
 import logging
-import codecs
 import csv
 
 from .comment_file import CommentFile
+from .compressed_file import CompressedFile
 
 class CSVFile():
     """CSV file download"""
@@ -19,7 +19,7 @@ class CSVFile():
 
         self.logger.debug("Loading csv data from %s ...", (self.filename))
 
-        with codecs.open(self.filename, 'r', 'utf-8') as file_handle:
+        with CompressedFile.open(self.filename) as file_handle:
             reader = csv.reader(CommentFile(file_handle), delimiter='\t')
             rows = []
             for row in reader:
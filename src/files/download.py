@@ -4,9 +4,10 @@ import logging
 
 
 import os
-import urllib.request
 from urllib.error import HTTPError, URLError
 
+from .file_downloader import FileDownloader
+
 
 class Download():
     """Download"""
@@ -35,15 +36,10 @@ class Download():
             self.logger.info("File: %s already exists not downloading", full_filepath)
         else:
             self.logger.info("File: %s does NOT exists downloading", full_filepath)
-            count = 0
-            while count < 10:
-                count = count + 1
-                try:
-                    urllib.request.urlretrieve(self.url_to_retrieve, full_filepath)
-                except (HTTPError, URLError) as error:
-                    self.logger.error(error.reason)
-                    continue
-                break
+            try:
+                FileDownloader(self.url_to_retrieve, full_filepath).download()
+            except (HTTPError, URLError) as error:
+                self.logger.error(error.reason)
 
         with open(full_filepath) as file_handle:
             data = file_handle.read()
@@ -61,9 +57,8 @@ class Download():
             os.makedirs(self.savepath)
 
         if not os.path.exists(os.path.join(self.savepath, self.filename_to_save)):
-            urllib.request.urlretrieve(self.url_to_retrieve,
-                                       os.path.join(self.savepath,
-                                                    self.filename_to_save))
+            FileDownloader(self.url_to_retrieve,
+                           os.path.join(self.savepath, self.filename_to_save)).download()
             return False
 
         self.logger.info("File: %s/%s already exists",
@@ -85,9 +80,8 @@ class Download():
             self.logger.info("Downloading data file %s from: %s",
                              self.filename_to_save,
                              self.url_to_retrieve)
-            urllib.request.urlretrieve(self.url_to_retrieve,
-                                       os.path.join(self.savepath,
-                                                    self.filename_to_save))
+            FileDownloader(self.url_to_retrieve,
+                           os.path.join(self.savepath, self.filename_to_save)).download()
 
         else:
             self.logger.info("File: %s/%s already exists not downloading",
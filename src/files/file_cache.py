@@ -0,0 +1,139 @@
+"""File Cache"""
+
+import json
+import logging
+import os
+import time
+
+from loader_common import ContextInfo
+from .file_downloader import FileDownloader
+
+
+class FileCache():
+    """Manifest of the files downloaded into tmp, so they can be reused by later runs.
+
+       Every entry is keyed by the S3 path (or URL) a file came from and records the
+       version it was downloaded at: the submission system md5Sum, else its uploadDate,
+       else the ETag the server reports. A file whose version still matches is reused,
+       one whose version changed (or that was never recorded) is deleted so it gets
+       downloaded again, and files no run has used for a while are evicted once the
+       cache grows beyond FILE_CACHE_SIZE_GB."""
+
+    logger = logging.getLogger(__name__)
+
+    manifest_path = 'tmp/file_cache_manifest.json'
+
+    # Entries used since this time belong to the current run and are never evicted.
+    run_start_time = time.time()
+
+    def __init__(self):
+        self.entries = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as manifest_file:
+                self.entries = json.load(manifest_file)
+
+        # Result of the first check of each key this run, later sub types
+        # sharing the key must not delete what the first one scheduled.
+        self.checked = {}
+
+    @staticmethod
+    def get_version(url, file_metadata=None):
+        """The version of a file: its md5Sum or uploadDate from the submission system,
+           otherwise its current ETag. None if none of these are known."""
+
+        if file_metadata is None:
+            file_metadata = {}
+        if file_metadata.get('md5Sum'):
+            return "md5:%s" % file_metadata['md5Sum'].lower()
+        if file_metadata.get('uploadDate'):
+            return "uploaded:%s" % file_metadata['uploadDate']
+
+        etag = FileDownloader(url, '').get_etag()
+        if etag is not None:
+            return "etag:%s" % etag
+
+        return None
+
+    def is_current(self, key, version, paths):
+        """True if the files at paths hold the current version of key, so the download
+           can be skipped. Otherwise any stale copy is deleted (the first time key is
+           checked) and False is returned. Files of an unknown version are reused if
+           they exist, as before there was a cache."""
+
+        paths = [path for path in paths if path is not None]
+        exists = all(os.path.isfile(path) for path in paths)
+
+        if version is None:
+            return exists
+
+        if key in self.checked:
+            return self.checked[key] and exists
+
+        entry = self.entries.get(key)
+        current = entry is not None and entry['version'] == version and exists \
+            and all(os.path.isfile(path) for path in entry['paths'])
+        self.checked[key] = current
+
+        if current:
+            self.logger.info("Reusing cached %s (%s)", key, version)
+            entry['last_used'] = time.time()
+            return True
+
+        stale_paths = set(paths)
+        if entry is not None:
+            stale_paths.update(entry['paths'])
+            del self.entries[key]
+        for path in sorted(stale_paths):
+            if os.path.isfile(path):
+                self.logger.info("Removing stale copy of %s: %s", key, path)
+                os.remove(path)
+
+        return False
+
+    def record(self, key, version, paths):
+        """Record that the files at paths hold version of key"""
+
+        paths = [path for path in paths if path is not None and os.path.isfile(path)]
+        if version is None or len(paths) == 0:
+            return
+
+        entry = self.entries.get(key)
+        if entry is not None and entry['version'] == version:
+            paths = sorted(set(paths) | set(entry['paths']))
+
+        # A path belongs to one key only, evicting another key must not delete it.
+        for (other_key, other_entry) in list(self.entries.items()):
+            if other_key != key and set(other_entry['paths']) & set(paths):
+                del self.entries[other_key]
+
+        self.entries[key] = {'version': version,
+                             'paths': paths,
+                             'size': sum(os.path.getsize(path) for path in paths),
+                             'last_used': time.time()}
+
+    def evict(self):
+        """Delete the least recently used files not used by this run
+           until the cache fits in FILE_CACHE_SIZE_GB"""
+
+        budget = float(ContextInfo().env["FILE_CACHE_SIZE_GB"]) * 1024 ** 3
+        total_size = sum(entry['size'] for entry in self.entries.values())
+
+        for (key, entry) in sorted(self.entries.items(), key=lambda item: item[1]['last_used']):
+            if total_size <= budget:
+                break
+            if entry['last_used'] >= self.run_start_time:
+                continue
+            self.logger.info("Evicting %s from the file cache (%.1f MB)", key, entry['size'] / 1048576)
+            for path in entry['paths']:
+                if os.path.isfile(path):
+                    os.remove(path)
+            total_size = total_size - entry['size']
+            del self.entries[key]
+
+    def save(self):
+        """Write the manifest, atomically"""
+
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        with open(self.manifest_path + '.tmp', 'w') as manifest_file:
+            json.dump(self.entries, manifest_file, indent=1, sort_keys=True)
+        os.replace(self.manifest_path + '.tmp', self.manifest_path)
@@ -0,0 +1,230 @@
+"""File Downloader"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+
+
+class FileDownloader():
+    """Downloads a URL into filepath + '.part' and renames it into place only once its
+       size (and MD5, when one is known) check out, so a file at filepath is always
+       complete. An interrupted download is resumed with a Range request, and large
+       objects are fetched as parallel ranged chunks whose progress survives a restart.
+       If a tee is given, the first attempt also writes every block it receives to it,
+       and streamed tells whether the tee saw the whole of the file that was kept."""
+
+    logger = logging.getLogger(__name__)
+
+    block_size = 1024 * 1024
+    parallel_threshold = 256 * 1024 * 1024
+    chunk_size = 64 * 1024 * 1024
+    parallel_chunks = 4
+    attempts = 5
+    timeout = 60
+
+    md5_pattern = re.compile(r"[0-9a-f]{32}")
+
+    def __init__(self, url, filepath, expected_md5=None, expected_size=None, tee=None):
+        self.url = url
+        self.filepath = filepath
+        self.part_path = filepath + '.part'
+        self.chunks_path = filepath + '.part.chunks'
+        self.expected_md5 = expected_md5.lower() if expected_md5 else None
+        self.expected_size = expected_size
+        self.tee = tee
+        self.streamed = False
+
+    def download(self):
+        """Download the file, retrying and resuming on network errors.
+           Returns the ETag the server sent, if any."""
+
+        directory = os.path.dirname(self.filepath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        attempt = 1
+        while True:
+            try:
+                (size, accepts_ranges, etag) = self._head()
+                streamed = False
+                if accepts_ranges and size is not None and size >= self.parallel_threshold \
+                        and self.tee is None:
+                    self._download_chunks(size, etag)
+                else:
+                    streamed = self._download_stream(accepts_ranges, etag,
+                                                     self.tee if attempt == 1 else None)
+                self._verify(size, etag)
+                self.streamed = streamed
+                os.replace(self.part_path, self.filepath)
+                if os.path.exists(self.chunks_path):
+                    os.remove(self.chunks_path)
+                return etag
+            except HTTPError as error:
+                if error.code == 416:
+                    # The partial file doesn't fit the object any more; start over.
+                    self._discard_partial()
+                elif 400 <= error.code < 500 and error.code not in [408, 429]:
+                    raise
+                if attempt >= self.attempts:
+                    raise
+                self.logger.warning("Download of %s failed (%s), retrying", self.url, error)
+            except ValueError as error:
+                self._discard_partial()
+                if attempt >= self.attempts:
+                    raise
+                self.logger.warning("Download of %s failed verification (%s), retrying", self.url, error)
+            except OSError as error:
+                if attempt >= self.attempts:
+                    raise
+                self.logger.warning("Download of %s interrupted (%s), resuming", self.url, error)
+
+            time.sleep(2 ** attempt)
+            attempt = attempt + 1
+
+    def get_etag(self):
+        """The ETag the server currently has for the URL, or None if it can't tell"""
+
+        try:
+            return self._head()[2]
+        except OSError as error:
+            self.logger.warning("Could not get the ETag of %s: %s", self.url, error)
+            return None
+
+    def _discard_partial(self):
+        for path in [self.part_path, self.chunks_path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _head(self):
+        """Size, Range support and ETag of the object, as far as the server tells"""
+
+        request = urllib.request.Request(self.url, method='HEAD')
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                headers = response.headers
+        except HTTPError as error:
+            if error.code in [403, 405, 501]:
+                # Some servers don't answer HEAD; fall back to a plain GET.
+                return (None, False, None)
+            raise
+
+        size = headers.get('Content-Length')
+        etag = headers.get('ETag')
+        return (int(size) if size is not None else None,
+                headers.get('Accept-Ranges', '').lower() == 'bytes',
+                etag.strip('"') if etag else None)
+
+    def _request(self, headers, etag):
+        request = urllib.request.Request(self.url, headers=headers)
+        if etag is not None and 'Range' in headers:
+            # Only resume if the object hasn't changed, otherwise the server sends all of it.
+            request.add_header('If-Range', '"%s"' % etag)
+        return request
+
+    def _download_stream(self, accepts_ranges, etag, tee=None):
+        """Download in one request, resuming the .part file if possible.
+           Returns True if tee was given every block of the file."""
+
+        offset = 0
+        if accepts_ranges and os.path.exists(self.part_path) and not os.path.exists(self.chunks_path):
+            offset = os.path.getsize(self.part_path)
+
+        headers = {'Range': 'bytes=%s-' % offset} if offset > 0 else {}
+        with urllib.request.urlopen(self._request(headers, etag), timeout=self.timeout) as response:
+            if offset > 0 and response.status != 206:
+                offset = 0
+            if offset > 0:
+                self.logger.info("Resuming download of %s at byte %s", self.url, offset)
+            else:
+                self.logger.info("Downloading %s -> %s", self.url, self.filepath)
+            if offset > 0:
+                tee = None
+            with open(self.part_path, 'ab' if offset > 0 else 'wb') as part_file:
+                for block in iter(lambda: response.read(self.block_size), b''):
+                    part_file.write(block)
+                    if tee is not None:
+                        tee.write(block)
+        if os.path.exists(self.chunks_path):
+            os.remove(self.chunks_path)
+
+        return tee is not None
+
+    def _read_done_chunks(self, size, etag):
+        if not os.path.exists(self.chunks_path) or not os.path.exists(self.part_path):
+            return None
+        with open(self.chunks_path) as chunks_file:
+            state = json.load(chunks_file)
+        if state.get('size') != size or state.get('etag') != etag or state.get('chunk_size') != self.chunk_size:
+            return None
+        return set(state['done'])
+
+    def _write_done_chunks(self, size, etag, done):
+        with open(self.chunks_path + '.tmp', 'w') as chunks_file:
+            json.dump({'size': size, 'etag': etag, 'chunk_size': self.chunk_size, 'done': sorted(done)},
+                      chunks_file)
+        os.replace(self.chunks_path + '.tmp', self.chunks_path)
+
+    def _download_chunks(self, size, etag):
+        done = self._read_done_chunks(size, etag)
+        if done is None:
+            done = set()
+            with open(self.part_path, 'wb') as part_file:
+                part_file.truncate(size)
+            self._write_done_chunks(size, etag, done)
+
+        chunks = [(index, start, min(start + self.chunk_size, size) - 1)
+                  for (index, start) in enumerate(range(0, size, self.chunk_size))
+                  if index not in done]
+        self.logger.info("Downloading %s -> %s in %s ranged chunks (%s already done)",
+                         self.url, self.filepath, len(chunks), len(done))
+
+        done_lock = threading.Lock()
+
+        def fetch_chunk(chunk):
+            (index, start, end) = chunk
+            headers = {'Range': 'bytes=%s-%s' % (start, end)}
+            with urllib.request.urlopen(self._request(headers, etag), timeout=self.timeout) as response, \
+                    open(self.part_path, 'r+b') as part_file:
+                if response.status != 206:
+                    raise URLError("Range request not honoured for %s" % self.url)
+                part_file.seek(start)
+                shutil.copyfileobj(response, part_file, self.block_size)
+                if part_file.tell() != end + 1:
+                    raise URLError("Short read for bytes %s-%s of %s" % (start, end, self.url))
+            with done_lock:
+                done.add(index)
+                self._write_done_chunks(size, etag, done)
+
+        with ThreadPoolExecutor(max_workers=self.parallel_chunks) as executor:
+            for _ in executor.map(fetch_chunk, chunks):
+                pass
+
+    def _verify(self, size, etag):
+        """Raise ValueError if the downloaded file has the wrong size or MD5.
+           A plain S3 ETag is the object's MD5, so it is used when nothing else is known."""
+
+        actual_size = os.path.getsize(self.part_path)
+        expected_size = self.expected_size if self.expected_size is not None else size
+        if expected_size is not None and actual_size != expected_size:
+            raise ValueError("%s has %s bytes, expected %s" % (self.url, actual_size, expected_size))
+
+        expected_md5 = self.expected_md5
+        if expected_md5 is None and etag is not None and self.md5_pattern.fullmatch(etag.lower()):
+            expected_md5 = etag.lower()
+        if expected_md5 is None:
+            return
+
+        md5 = hashlib.md5()
+        with open(self.part_path, 'rb') as part_file:
+            for block in iter(lambda: part_file.read(self.block_size), b''):
+                md5.update(block)
+        if md5.hexdigest() != expected_md5:
+            raise ValueError("%s has MD5 %s, expected %s" % (self.url, md5.hexdigest(), expected_md5))
@@ -1,11 +1,18 @@
 """JSON File"""
 
 import logging
-import codecs
 import json
 import os
 import jsonschema as js
 
+from .compressed_file import CompressedFile
+
+# The C backend parses several times faster than the pure Python one.
+try:
+    import ijson.backends.yajl2_c as ijson
+except ImportError:
+    import ijson
+
 
 class JSONFile():
     """JSON File"""
@@ -17,10 +24,7 @@ class JSONFile():
 
         self.logger.debug("Loading JSON data from %s ...", filename)
 
-        if 'PHENOTYPE' in filename:
-            self.logger.info(filename)
-            self.remove_bom_inplace(filename)
-        with codecs.open(filename, 'r', 'utf-8') as file_handle:
+        with CompressedFile.open(filename) as file_handle:
             self.logger.debug("Opening JSON file: %s", filename)
             data = json.load(file_handle)
             self.logger.debug("JSON data extracted %s", filename)
@@ -28,6 +32,33 @@ class JSONFile():
         #self.validate_json(data, filename, jsonType)
         return data
 
+    def get_stream(self, filename):
+        """Get Data, streamed. Returns the same dictionary as get_data, but with
+           'data' being a generator of the data items, read one at a time from the
+           file, so a submission file is never held in memory as a whole."""
+
+        self.logger.debug("Streaming JSON data from %s ...", filename)
+
+        # metaData comes first in submission files, so this stops after a few lines.
+        with CompressedFile.open(filename, 'rb') as file_handle:
+            meta_data = next(self.items(file_handle, 'metaData'), None)
+
+        return {'metaData': meta_data,
+                'data': self._stream_items(filename, 'data.item')}
+
+    def _stream_items(self, filename, prefix):
+        with CompressedFile.open(filename, 'rb') as file_handle:
+            for item in self.items(file_handle, prefix):
+                yield item
+        self.logger.debug("JSON data streamed %s", filename)
+
+    @staticmethod
+    def items(file_handle, prefix):
+        """The objects at prefix (e.g. 'data.item') of a binary JSON file handle, one at a time.
+           Numbers are ints and floats as json.load returns them, not Decimals."""
+
+        return ijson.items(file_handle, prefix, use_float=True)
+
     def validate_json(self, data, filename, json_type):
         """Validate JSON"""
 
@@ -70,24 +101,3 @@ class JSONFile():
             self.logger.info(error.message)
             self.logger.info(error)
             raise SystemExit("FATAL ERROR in JSON validation.")
-
-    @staticmethod
-    def remove_bom_inplace(path):
-        """Removes BOM mark, if it exists, from a file and rewrites it in-place"""
-
-        buffer_size = 4096
-        bom_length = len(codecs.BOM_UTF8)
-
-        with codecs.open(path, "r+b") as file_handle:
-            chunk = file_handle.read(buffer_size)
-            if chunk.startswith(codecs.BOM_UTF8):
-                i = 0
-                chunk = chunk[bom_length:]
-                while chunk:
-                    file_handle.seek(i)
-                    file_handle.write(chunk)
-                    i += len(chunk)
-                    file_handle.seek(bom_length, os.SEEK_CUR)
-                    chunk = file_handle.read(buffer_size)
-                file_handle.seek(-bom_length, os.SEEK_CUR)
-                file_handle.truncate()
@@ -3,8 +3,8 @@
 import logging
 import os
 import time
-import urllib.request
 from loader_common import ContextInfo
+from .file_downloader import FileDownloader
 
 
 class S3File():
@@ -12,9 +12,13 @@ class S3File():
 
     logger = logging.getLogger(__name__)
 
-    def __init__(self, filename, savepath):
+    def __init__(self, filename, savepath, expected_md5=None):
         self.filename = filename
         self.savepath = savepath
+        self.expected_md5 = expected_md5
+
+        # Whether the tee given to download_new saw the whole file.
+        self.streamed = False
 
         self.context_info = ContextInfo()
         self.download_url = "https://" + self.context_info.env["DOWNLOAD_HOST"] \
@@ -35,15 +39,15 @@ class S3File():
                              self.filename,
                              self.savepath,
                              self.filename)
-            urllib.request.urlretrieve(url, os.path.join(self.savepath, self.filename))
+            FileDownloader(url, os.path.join(self.savepath, self.filename), self.expected_md5).download()
         else:
             self.logger.info("File: %s/%s already exists, not downloading",
                              self.savepath,
                              self.filename)
         return os.path.join(self.savepath, self.filename)
 
-    def download_new(self):
-        """Download New"""
+    def download_new(self, tee=None):
+        """Download New. Every block downloaded is also written to tee, if given."""
 
         if not os.path.exists(os.path.dirname(os.path.join(self.savepath, self.filename))):
             self.logger.debug("Making temp file storage: %s", os.path.dirname(os.path.join(self.savepath, self.filename)))
@@ -84,7 +88,9 @@ class S3File():
                           self.filename,
                           self.savepath,
                           self.filename)
-        urllib.request.urlretrieve(url, os.path.join(self.savepath, self.filename))
+        downloader = FileDownloader(url, os.path.join(self.savepath, self.filename), self.expected_md5, tee=tee)
+        downloader.download()
+        self.streamed = downloader.streamed
         return False
 
     def list_files(self):
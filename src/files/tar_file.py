@@ -2,54 +2,116 @@
 
 import logging
 import os
+import shutil
 import tarfile
-import time
+import threading
 
 
 class TARFile():
     """TAR File"""
 
     logger = logging.getLogger(__name__)
+
+    block_size = 1024 * 1024
+
     def __init__(self, path, tarfilename):
         self.path = path
         self.tarfilename = tarfilename
 
+    def _get_destination(self, member):
+        """Where member is extracted to, or None if it is skipped"""
+
+        if 'gff' in member.name.lower():
+            self.logger.info('Skipping GFF file extraction for %s', member.name)
+            return None
+
+        destination = os.path.join(self.path, member.name)
+        if os.path.isabs(member.name) \
+                or not os.path.abspath(destination).startswith(os.path.abspath(self.path) + os.sep):
+            self.logger.warning('Skipping %s, it would be extracted outside of %s', member.name, self.path)
+            return None
+        if os.path.exists(destination) and not member.isdir():
+            self.logger.info('%s already exists, not extracting.', destination)
+            return None
+
+        return destination
+
+    def _extract_stream(self, fileobj, extracted):
+        """Extract every member of the gzipped tar stream fileobj in a single pass,
+           appending the paths written to extracted. Each file is written to a .part
+           file first and renamed into place, so a file that exists is complete."""
+
+        with tarfile.open(fileobj=fileobj, mode='r|*') as tfile:
+            for member in tfile:
+                destination = self._get_destination(member)
+                if destination is None:
+                    continue
+                if member.isdir():
+                    os.makedirs(destination, exist_ok=True)
+                    continue
+                if not member.isfile():
+                    self.logger.info('Skipping %s, it is not a regular file', member.name)
+                    continue
+
+                self.logger.info("Extracting (%s->%s)", member.name, destination)
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                try:
+                    with tfile.extractfile(member) as member_file, \
+                            open(destination + '.part', 'wb') as part_file:
+                        shutil.copyfileobj(member_file, part_file, self.block_size)
+                except (tarfile.TarError, OSError, EOFError):
+                    os.remove(destination + '.part')
+                    raise
+                os.replace(destination + '.part', destination)
+                extracted.append(destination)
+
     def extract_all(self):
         """Extract All"""
 
-        self.logger.debug("Reading header from %s/%s ...", self.path, self.tarfilename)
-
-        members_to_extract = []
-        extract = False
-
-        attempts = 0
-        # Our little retry loop. Implemented due to speed-related writing errors.
-        # TODO Replace / update with "tenacity" module.
-        while attempts < 3:
-            try:
-                tfile = tarfile.open(os.path.join(self.path, self.tarfilename), 'r')
-                break
-            except tarfile.ReadError as error:
-                self.logger.warning('ReadError encountered when opening tar file.')
-                self.logger.warning('Sleeping for 2 seconds and trying again.')
-                self.logger.warning(error)
-                attempts += 1
-                time.sleep(2)
-        if attempts == 3:
-            raise tarfile.ReadError('Tar file could not be read after 3 attempts: %s + "/" + %s' \
-                                    % (self.path, self.tarfilename))
-
-        for member in tfile.getmembers():
-            lower_name = member.name.lower()
-            if 'gff' in lower_name:
-                self.logger.info('Skipping GFF file extraction for %s', member.name)
-                continue
-            if os.path.exists(os.path.join(self.path, member.name)):
-                self.logger.info('%s/%s already exists, not extracting.', self.path, member.name)
-            else:
-                self.logger.info("Extracting (%s->%s/%s)", member.name, self.path, member.name)
-                members_to_extract.append(member)
-                extract = True
-
-        if extract is True:
-            tfile.extractall(self.path, members_to_extract)
+        self.logger.debug("Extracting %s/%s ...", self.path, self.tarfilename)
+
+        with open(os.path.join(self.path, self.tarfilename), 'rb') as tar_stream:
+            self._extract_stream(tar_stream, [])
+
+    def extract_while_downloading(self, download):
+        """Extract the archive while it downloads. download(tee) has to download it,
+           writing every block it receives to tee as well and returning whether tee
+           saw the whole (verified) file. If it didn't, e.g. because the download was
+           resumed or retried, whatever was extracted from the stream is thrown away
+           and the archive is extracted again from the downloaded file."""
+
+        (read_fd, write_fd) = os.pipe()
+        extracted = []
+        errors = []
+
+        def extract(reader):
+            with reader:
+                try:
+                    self._extract_stream(reader, extracted)
+                except (tarfile.TarError, OSError, EOFError) as error:
+                    errors.append(error)
+                # Keep reading to the end so the download never blocks on a full pipe.
+                while reader.read(self.block_size):
+                    pass
+
+        extract_thread = threading.Thread(target=extract, args=(os.fdopen(read_fd, 'rb'),))
+        extract_thread.start()
+        teed = False
+        try:
+            with os.fdopen(write_fd, 'wb') as tee:
+                teed = download(tee)
+        finally:
+            extract_thread.join()
+            if not teed or len(errors) > 0:
+                for path in extracted:
+                    if os.path.exists(path):
+                        os.remove(path)
+
+        if teed and len(errors) == 0:
+            return
+
+        self.logger.info("Extracting %s/%s again from the downloaded file (%s)",
+                         self.path,
+                         self.tarfilename,
+                         errors[0] if len(errors) > 0 else "the download did not stream in one piece")
+        self.extract_all()
@@ -1,7 +1,8 @@
 """Text File"""
 
 import logging
-import codecs
+
+from .compressed_file import CompressedFile
 
 class TXTFile():
     """Text File"""
@@ -17,7 +18,7 @@ class TXTFile():
         self.logger.info("Loading txt data from %s...", self.filename)
 
         lines = []
-        with codecs.open(self.filename, 'r', 'utf-8') as file_handle:
+        with CompressedFile.open(self.filename) as file_handle:
             for line in file_handle:
                 lines.append(line)
 
@@ -6,6 +6,8 @@ import logging
 
 import xml.etree.ElementTree as ElementTree
 
+from .compressed_file import CompressedFile
+
 
 class XMLFile():
     """XML File"""
@@ -19,7 +21,8 @@ class XMLFile():
         """Get Data"""
 
         self.logger.debug("Parsing XML data from %s...", self.filename)
-        tree = ElementTree.parse(self.filename)
+        with CompressedFile.open(self.filename, 'rb') as file_handle:
+            tree = ElementTree.parse(file_handle)
         root = tree.getroot()
 
         return root
@@ -0,0 +1,50 @@
+"""Aggregate Loader Tests"""
+
+from aggregate_loader import AggregateLoader
+
+
+def fake_etl(read_labels, write_labels):
+    """An ETL class declaring only the labels it reads and writes"""
+
+    return type('FakeETL', (), {'read_labels': read_labels, 'write_labels': write_labels})
+
+
+def test_etl_without_labels_is_a_full_barrier(monkeypatch):
+    """Test an ETL that declares no labels waits for every earlier ETL, and every later one waits for it"""
+
+    monkeypatch.setattr(AggregateLoader, 'etl_dispatch', {'A': fake_etl([], ['Gene']),
+                                                          'B': fake_etl([], ['Allele']),
+                                                          'BARRIER': fake_etl(None, None),
+                                                          'C': fake_etl([], ['Variant'])})
+
+    dependencies = AggregateLoader.get_etl_dependencies(['A', 'B', 'BARRIER', 'C'])
+
+    assert dependencies == {'A': set(),
+                            'B': set(),
+                            'BARRIER': {'A', 'B'},
+                            'C': {'BARRIER'}}
+
+
+def test_ontology_covers_every_term_label():
+    """Test the GO ETL (GOTerm) waits for the generic ontology ETL (Ontology), as Ontology covers every *Term"""
+
+    dependencies = AggregateLoader.get_etl_dependencies(['ONTOLOGY', 'GO'])
+
+    assert dependencies == {'ONTOLOGY': set(), 'GO': {'ONTOLOGY'}}
+    assert AggregateLoader._labels_overlap(['GOTerm'], ['Ontology'])  # pylint: disable=protected-access
+
+
+def test_disjoint_etls_do_not_wait(monkeypatch):
+    """Test ETLs that share no label run side by side, and one reading a written label waits"""
+
+    monkeypatch.setattr(AggregateLoader, 'etl_dispatch', {'GENES': fake_etl([], ['Gene']),
+                                                          'TERMS': fake_etl([], ['DOTerm']),
+                                                          'SPECIES': fake_etl([], ['Species']),
+                                                          'ANNOTATIONS': fake_etl(['Gene'], ['Association'])})
+
+    dependencies = AggregateLoader.get_etl_dependencies(['GENES', 'TERMS', 'SPECIES', 'ANNOTATIONS'])
+
+    assert dependencies == {'GENES': set(),
+                            'TERMS': set(),
+                            'SPECIES': set(),
+                            'ANNOTATIONS': {'GENES'}}
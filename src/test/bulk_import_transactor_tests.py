@@ -0,0 +1,50 @@
+"""Bulk Import Transactor Tests"""
+
+from transactors.bulk_import_transactor import BulkImportTransactor
+
+
+HEADER = """
+        USING PERIODIC COMMIT 10000
+        LOAD CSV WITH HEADERS FROM 'file:///genes.csv' AS row
+"""
+
+
+def test_node_merge_after_load_match_is_imported():
+    """Test a MERGE of a node after a MATCH of a node it does not use, like BGI's Gene load"""
+
+    spec = BulkImportTransactor.translate_query(HEADER + """
+            MATCH (l:Load {primaryKey:row.loadKey})
+
+            //Create the Gene node and set properties. primaryKey is required.
+            MERGE (o:Gene {primaryKey:row.primaryId})
+                ON CREATE SET o.symbol = row.symbol,
+                              o.taxonId = row.taxonId""")
+
+    assert spec == {'kind': 'node',
+                    'labels': ['Gene'],
+                    'id': 'primaryId',
+                    'properties': [('symbol', 'symbol', None), ('taxonId', 'taxonId', None)]}
+
+
+def test_node_merge_using_matched_node_is_replayed():
+    """Test a MATCHed node that the rest of the query uses keeps the query in Cypher"""
+
+    assert BulkImportTransactor.translate_query(HEADER + """
+            MATCH (s:Species {primaryKey:row.taxonId})
+            MERGE (o:Gene {primaryKey:row.primaryId})
+            MERGE (o)-[:FROM_SPECIES]->(s)""") is None
+
+
+def test_relationship_merge_is_imported():
+    """Test a MERGE of a relationship between two nodes MATCHed by primaryKey"""
+
+    spec = BulkImportTransactor.translate_query(HEADER + """
+            MATCH (g:Gene {primaryKey:row.primaryId})
+            MATCH (spec:Species {primaryKey:row.taxonId})
+            MERGE (g)<-[:HAS_GENE]-(spec)""")
+
+    assert spec == {'kind': 'relationship',
+                    'type': 'HAS_GENE',
+                    'start': ('Species', 'taxonId'),
+                    'end': ('Gene', 'primaryId'),
+                    'properties': []}
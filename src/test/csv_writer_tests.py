@@ -0,0 +1,53 @@
+"""CSV Writer Tests"""
+
+import csv
+import os
+import tempfile
+
+import pytest
+
+from files import CompressedFile
+from transactors.csv_writer import CSVWriter
+
+
+def test_missing_keys_are_written_empty():
+    """Test rows without some of the columns are written with those fields empty"""
+
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, 'rows.csv')
+        with CSVWriter(file_path) as writer:
+            writer.write_rows([{'a': 1, 'b': 'x'}, {'a': 2}])
+            writer.write_rows([{'b': 'y'}])
+
+        with open(file_path, newline='') as csv_file:
+            assert list(csv.reader(csv_file)) == [['a', 'b'], ['1', 'x'], ['2', ''], ['', 'y']]
+
+
+def test_key_first_seen_in_a_later_batch_is_an_error():
+    """Test a key the header lacks raises, whichever row of a later batch it is in"""
+
+    with tempfile.TemporaryDirectory() as directory:
+        with CSVWriter(os.path.join(directory, 'rows.csv')) as writer:
+            writer.write_rows([{'a': 1}, {'a': 2, 'b': 'x'}])
+
+            with pytest.raises(ValueError):
+                writer.write_rows([{'a': 3}, {'a': 4, 'c': 'y'}])
+            with pytest.raises(ValueError):
+                writer.write_rows([{'a': 5}, {'c': 'z'}])
+            with pytest.raises(ValueError):
+                writer.write_rows([{'c': 'z'}])
+
+
+def test_stats_count_rows_and_uncompressed_bytes():
+    """Test the saved stats count a quoted newline as part of its row, gzipped or not"""
+
+    with tempfile.TemporaryDirectory() as directory:
+        for compression in [None, 'gzip']:
+            file_path = os.path.join(directory, 'rows.csv')
+            with CSVWriter(file_path, compression) as writer:
+                writer.write_rows([{'a': 'two\nlines', 'b': 1}])
+                writer.write_rows([{'a': 'café', 'b': 2}])
+
+            with CompressedFile.open(file_path, 'rb') as csv_file:
+                content = csv_file.read()
+            assert CSVWriter.get_stats(file_path) == (2, len(content))
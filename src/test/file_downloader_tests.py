@@ -0,0 +1,114 @@
+"""File Downloader Tests, against a local HTTP server that honours Range requests"""
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from files import FileDownloader
+
+
+CONTENT = os.urandom(3 * 1024 * 1024 + 123)
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves CONTENT, honouring single byte ranges"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body_too):
+        (start, end) = (0, len(CONTENT) - 1)
+        range_match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get('Range', ''))
+        if range_match is not None:
+            start = int(range_match.group(1))
+            if range_match.group(2):
+                end = min(int(range_match.group(2)), end)
+            if start > end:
+                self.send_response(416)
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %s-%s/%s' % (start, end, len(CONTENT)))
+        else:
+            self.send_response(200)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        if body_too:
+            self.wfile.write(CONTENT[start:end + 1])
+
+    def do_HEAD(self):
+        self._send(False)
+
+    def do_GET(self):
+        self._send(True)
+
+
+def serve():
+    """Start the server, returns it and its URL"""
+
+    server = HTTPServer(('127.0.0.1', 0), RangeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return (server, "http://127.0.0.1:%s/data.bin" % server.server_port)
+
+
+def test_download_verifies_md5():
+    """Test a plain download is renamed into place after its MD5 checks out"""
+
+    (server, url) = serve()
+    with tempfile.TemporaryDirectory() as directory:
+        filepath = os.path.join(directory, 'data.bin')
+        FileDownloader(url, filepath, hashlib.md5(CONTENT).hexdigest()).download()
+        with open(filepath, 'rb') as data_file:
+            assert data_file.read() == CONTENT
+        assert not os.path.exists(filepath + '.part')
+    server.shutdown()
+
+
+def test_download_resumes_partial_file():
+    """Test a left over .part file is resumed rather than downloaded again"""
+
+    (server, url) = serve()
+    with tempfile.TemporaryDirectory() as directory:
+        filepath = os.path.join(directory, 'data.bin')
+        with open(filepath + '.part', 'wb') as part_file:
+            part_file.write(CONTENT[:1000000])
+        FileDownloader(url, filepath).download()
+        with open(filepath, 'rb') as data_file:
+            assert data_file.read() == CONTENT
+    server.shutdown()
+
+
+def test_download_in_ranged_chunks():
+    """Test a large object is fetched in parallel ranged chunks"""
+
+    (server, url) = serve()
+    with tempfile.TemporaryDirectory() as directory:
+        filepath = os.path.join(directory, 'data.bin')
+        downloader = FileDownloader(url, filepath)
+        downloader.parallel_threshold = 1024 * 1024
+        downloader.chunk_size = 512 * 1024
+        downloader.download()
+        with open(filepath, 'rb') as data_file:
+            assert data_file.read() == CONTENT
+        assert not os.path.exists(filepath + '.part.chunks')
+    server.shutdown()
+
+
+def test_download_rejects_wrong_md5():
+    """Test a checksum mismatch never leaves a file at the destination"""
+
+    (server, url) = serve()
+    with tempfile.TemporaryDirectory() as directory:
+        filepath = os.path.join(directory, 'data.bin')
+        downloader = FileDownloader(url, filepath, '0' * 32)
+        downloader.attempts = 1
+        with pytest.raises(ValueError):
+            downloader.download()
+        assert not os.path.exists(filepath)
+    server.shutdown()
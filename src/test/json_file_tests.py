@@ -0,0 +1,40 @@
+"""JSON File Tests"""
+
+import gzip
+import json
+import os
+import tempfile
+
+from files import JSONFile
+
+
+SUBMISSION = {'metaData': {'dataProvider': {'crossReference': {'id': 'FB'}},
+                           'release': '3.0.0'},
+              'data': [{'primaryId': 'FB:1',
+                        'symbol': 'café \\"quoted\\"',
+                        'score': 0.1,
+                        'pValue': 1.5e-10,
+                        'start': 12345678901234,
+                        'strand': None,
+                        'obsolete': False,
+                        'synonyms': ['a', 'b'],
+                        'location': {'chromosome': '2L', 'end': 20.0}},
+                       {'primaryId': 'FB:2', 'synonyms': []}]}
+
+
+def test_stream_matches_json_load():
+    """Test get_stream and items return what json.load does, numbers included"""
+
+    with tempfile.TemporaryDirectory() as directory:
+        for (name, opener) in [('submission.json', open), ('submission.json.gz', gzip.open)]:
+            file_path = os.path.join(directory, name)
+            with opener(file_path, 'wt', encoding='utf-8') as json_file:
+                json.dump(SUBMISSION, json_file)
+
+            data = JSONFile().get_data(file_path)
+            stream = JSONFile().get_stream(file_path)
+
+            assert stream['metaData'] == data['metaData']
+            streamed_items = list(stream['data'])
+            assert streamed_items == data['data']
+            assert [repr(item) for item in streamed_items] == [repr(item) for item in data['data']]
@@ -0,0 +1,22 @@
+"""Loader Common Tests"""
+
+import yaml
+
+from loader_common import ContextInfo, Singleton
+
+
+def test_context_info_with_no_env_variables_set(monkeypatch):
+    """Test every variable with a default can be left unset, the "none" sentinel
+       marks the variables that have to be set"""
+
+    with open('src/default_env_vars.yml') as config_file:
+        defaults = yaml.load(config_file, Loader=yaml.FullLoader)
+    for (key, value) in defaults.items():
+        assert value != "none", key
+        monkeypatch.delenv(key, raising=False)
+    monkeypatch.setattr(Singleton, '_instances', {})
+
+    context_info = ContextInfo()
+
+    assert context_info.env == defaults
+    assert context_info.env["CSV_COMPRESSION"] == "off"
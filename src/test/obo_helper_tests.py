@@ -0,0 +1,115 @@
+"""OBO Helper Tests"""
+
+import json
+import os
+import tempfile
+
+from ontobio import OntologyFactory
+
+from etl.helpers import OBOHelper
+
+
+RELATIONS = ['subClassOf', 'BFO:0000050', 'RO:0002211', 'RO:0002212', 'RO:0002213']
+
+
+def test_closure_of_a_dag():
+    """Test every ancestor is found once, through any mix of paths"""
+
+    edges = [('a', 'b'), ('a', 'c'), ('b', 'd'), ('c', 'd'), ('d', 'e'), ('a', 'b')]
+
+    closure = list(OBOHelper.get_closure(edges))
+
+    assert len(closure) == len(set(closure))
+    assert set(closure) == {('a', 'b'), ('a', 'c'), ('a', 'd'), ('a', 'e'),
+                            ('b', 'd'), ('b', 'e'),
+                            ('c', 'd'), ('c', 'e'),
+                            ('d', 'e')}
+
+
+def test_closure_with_a_cycle():
+    """Test terms on a cycle are their own ancestors, as the Cypher closure has it"""
+
+    edges = [('a', 'b'), ('b', 'c'), ('c', 'b'), ('c', 'd')]
+
+    assert set(OBOHelper.get_closure(edges)) == {('a', 'b'), ('a', 'c'), ('a', 'd'),
+                                                 ('b', 'b'), ('b', 'c'), ('b', 'd'),
+                                                 ('c', 'b'), ('c', 'c'), ('c', 'd')}
+
+
+def test_parse_obo_terms():
+    """Test [Term] stanzas are parsed and other stanzas skipped, with comments stripped"""
+
+    lines = ['format-version: 1.2',
+             '',
+             '[Term]',
+             'id: X:1',
+             'name: first ! a comment',
+             'def: "Hello! \\"world\\"" [X:ref] ! a comment',
+             'synonym: "one" EXACT []',
+             'synonym: "two" RELATED []',
+             'is_a: X:0 {gci_filler="X:2"} ! zero',
+             '',
+             '[Typedef]',
+             'id: part_of',
+             'name: part of',
+             '[Term]',
+             'id: X:2',
+             'name: escaped \\! bang',
+             '[Instance]',
+             'id: X:3']
+
+    terms = list(OBOHelper.parse_obo(lines))
+
+    assert terms == [{'id': 'X:1',
+                      'name': 'first',
+                      'def': '"Hello! \\"world\\"" [X:ref]',
+                      'synonym': ['"one" EXACT []', '"two" RELATED []'],
+                      'is_a': 'X:0 {gci_filler="X:2"}'},
+                     {'id': 'X:2',
+                      'name': 'escaped \\! bang'}]
+
+
+def write_obograph(file_path):
+    """Write a small ontology as the obographs JSON that owltools converts OBO files
+       to, with is_a, part_of and the three regulates relations. GO:6 has several
+       parents over one relation, and one parent over two."""
+
+    def uri(number):
+        return "http://purl.obolibrary.org/obo/GO_%07d" % number
+
+    edges = [(2, 'is_a', 1),
+             (3, 'is_a', 1),
+             (3, 'http://purl.obolibrary.org/obo/BFO_0000050', 2),
+             (4, 'http://purl.obolibrary.org/obo/RO_0002211', 2),
+             (5, 'http://purl.obolibrary.org/obo/RO_0002212', 3),
+             (5, 'http://purl.obolibrary.org/obo/RO_0002213', 4),
+             (6, 'is_a', 3),
+             (6, 'is_a', 2),
+             (6, 'is_a', 5),
+             (6, 'http://purl.obolibrary.org/obo/BFO_0000050', 5),
+             (6, 'http://purl.obolibrary.org/obo/RO_0002211', 4),
+             (6, 'http://purl.obolibrary.org/obo/RO_0002213', 3)]
+    graph = {'nodes': [{'id': uri(number), 'lbl': 'term %d' % number, 'type': 'CLASS'}
+                       for number in range(1, 7)],
+             'edges': [{'sub': uri(sub), 'pred': pred, 'obj': uri(obj)} for (sub, pred, obj) in edges]}
+
+    with open(file_path, 'w') as graph_file:
+        json.dump({'graphs': [graph]}, graph_file)
+
+
+def test_parents_by_relation_match_subontology_parents():
+    """Test the parents found in one pass are the ones the per-term subontology gave, in order"""
+
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, 'go.json')
+        write_obograph(file_path)
+        ont = OntologyFactory().create(file_path)
+
+    parents = OBOHelper.get_parents_by_relation(ont, RELATIONS)
+
+    assert all(len(parents[relation]) > 0 for relation in RELATIONS)
+    assert parents['subClassOf']['GO:0000006'] == ['GO:0000003', 'GO:0000002', 'GO:0000005']
+    for key in ont.nodes():
+        all_parents_subont = ont.subontology(ont.parents(key) + [key])
+        for relation in RELATIONS:
+            assert parents[relation].get(key, []) == all_parents_subont.parents(key, relations=[relation])
@@ -0,0 +1,149 @@
+"""OBO Parser Benchmark
+
+Times reading the terms of synthetic OBO files the way GenericOntologyETL does,
+with the parser OBOHelper.parse_obo replaced, with OBOHelper.parse_obo alone and
+through OntologyCache.get_obo_terms, and measures the peak memory of each. Run from the repository root:
+
+    python src/test/obo_parser_benchmark.py
+
+Not collected by pytest."""
+
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from etl.helpers import OBOHelper, OntologyCache  # pylint: disable=wrong-import-position
+
+
+ONTOLOGY_SIZES = [('UBERON', 25000), ('GO', 50000), ('CHEBI', 180000)]
+
+
+def write_obo(file_path, term_count):
+    """Write an OBO file of term_count terms shaped like the ones the loader reads"""
+
+    rand = random.Random(1)
+    with open(file_path, 'w') as obo_file:
+        obo_file.write('format-version: 1.2\n\n')
+        for number in range(term_count):
+            obo_file.write('[Term]\nid: X:%07d\nname: term number %d\nnamespace: test\n'
+                           % (number, number))
+            obo_file.write('def: "A definition of term %d, a few words long." [PMID:%d]\n'
+                           % (number, number))
+            for synonym in range(rand.randint(0, 5)):
+                obo_file.write('synonym: "synonym %d %d" EXACT []\n' % (number, synonym))
+            for _ in range(rand.randint(0, 4)):
+                obo_file.write('xref: DB:%d\n' % rand.randint(0, 10 ** 6))
+            for _ in range(rand.randint(1, 3)):
+                obo_file.write('is_a: X:%07d ! parent\n' % rand.randint(0, max(number - 1, 0)))
+            obo_file.write('\n')
+        obo_file.write('[Typedef]\nid: part_of\nname: part of\n')
+
+
+def parse_obo_replaced(data):
+    """The parser OBOHelper.parse_obo replaced, condensed: terms end at a blank line"""
+
+    ontology_data = []
+    o_dict = {}
+    within_term = False
+    within_typedef = False
+    for line in data:
+        if '[Term]' in line:
+            within_term = True
+            if o_dict:
+                ontology_data.append(o_dict)
+                o_dict = {}
+        elif '[Typedef]' in line:
+            within_typedef = True
+        elif within_term:
+            if len(line.strip()) == 0:
+                within_term = False
+            elif ':' in line:
+                (key, value) = line.strip().split(':', 1)
+                value = value[1:]
+                if key not in o_dict:
+                    o_dict[key] = value
+                elif isinstance(o_dict[key], str):
+                    o_dict[key] = [o_dict[key], value]
+                else:
+                    o_dict[key].append(value)
+        elif within_typedef and len(line.strip()) == 0:
+            within_typedef = False
+    ontology_data.append(o_dict)
+
+    return ontology_data
+
+
+def read_replaced(file_path):
+    """Read all lines, then parse them all, as TXTFile and the replaced parser did"""
+
+    with open(file_path) as obo_file:
+        return parse_obo_replaced([line for line in obo_file])
+
+
+def read_parse_obo(file_path):
+    """Parse the file with OBOHelper.parse_obo, without the cache"""
+
+    with open(file_path) as obo_file:
+        consume(OBOHelper.parse_obo(obo_file))
+
+
+def consume(terms):
+    """Go through the terms once, as the ETL generators do, keeping none of them"""
+
+    count = 0
+    for _ in terms:
+        count = count + 1
+
+    return count
+
+
+def measure(read):
+    """(seconds, peak MB) of read()"""
+
+    start = time.time()
+    read()
+    seconds = time.time() - start
+
+    tracemalloc.start()
+    read()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return (seconds, peak / 1024 / 1024)
+
+
+def main():
+    """Print the time and peak memory of each way of reading each file"""
+
+    with tempfile.TemporaryDirectory() as directory:
+        OntologyCache.cache_path = os.path.join(directory, 'ontology_cache')
+        print('%-8s %8s  %-22s %-22s %-22s %-22s' % ('', 'terms', 'replaced parser', 'parse_obo',
+                                                     'get_obo_terms, parse', 'get_obo_terms, cached'))
+        for (name, term_count) in ONTOLOGY_SIZES:
+            file_path = os.path.join(directory, name + '.obo')
+            write_obo(file_path, term_count)
+
+            replaced = measure(lambda: consume(read_replaced(file_path)))
+            parse_obo = measure(lambda: read_parse_obo(file_path))
+
+            def parse():
+                for cache_file in os.listdir(OntologyCache.cache_path):
+                    os.remove(os.path.join(OntologyCache.cache_path, cache_file))
+                consume(OntologyCache.get_obo_terms(file_path))
+
+            os.makedirs(OntologyCache.cache_path, exist_ok=True)
+            parsed = measure(parse)
+            cached = measure(lambda: consume(OntologyCache.get_obo_terms(file_path)))
+
+            print('%-8s %8d  %-22s %-22s %-22s %-22s'
+                  % tuple([name, term_count] + ['%6.2fs %6.0f MB' % result
+                                                for result in (replaced, parse_obo, parsed, cached)]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,16 @@
+"""Ontology Cache Tests"""
+
+from etl.helpers import OntologyCache
+
+
+def test_loaded_terms_are_cleared(monkeypatch, tmp_path):
+    """Test what an earlier run saved is not returned once the cache is cleared"""
+
+    monkeypatch.setattr(OntologyCache, 'cache_path', str(tmp_path))
+    OntologyCache.save_loaded('GO', {'GO:1': ('a', 'b', 'false')}, [('GO:1', 'GO:2', 'IS_A')])
+
+    assert OntologyCache.get_loaded('GO')['edges'] == [('GO:1', 'GO:2', 'IS_A')]
+
+    OntologyCache.clear_loaded()
+
+    assert OntologyCache.get_loaded('GO') is None
@@ -0,0 +1,65 @@
+"""TAR File Tests"""
+
+import io
+import os
+import tarfile
+import tempfile
+
+from files import TARFile
+
+
+def make_tarball(directory, members):
+    """Write members ({name: bytes}) to directory/data.tar.gz, returns its bytes"""
+
+    with tarfile.open(os.path.join(directory, 'data.tar.gz'), 'w:gz') as tfile:
+        for (name, content) in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tfile.addfile(info, io.BytesIO(content))
+    with open(os.path.join(directory, 'data.tar.gz'), 'rb') as tar_stream:
+        return tar_stream.read()
+
+
+def test_extract_all_skips_gff_and_existing_files():
+    """Test a single pass extraction honours the GFF rule and leaves existing files alone"""
+
+    with tempfile.TemporaryDirectory() as directory:
+        make_tarball(directory, {'sub/a.json': b'a', 'sub/b.gff3': b'b', 'sub/c.json': b'c'})
+        os.makedirs(os.path.join(directory, 'sub'))
+        with open(os.path.join(directory, 'sub/c.json'), 'wb') as existing_file:
+            existing_file.write(b'existing')
+
+        TARFile(directory, 'data.tar.gz').extract_all()
+
+        with open(os.path.join(directory, 'sub/a.json'), 'rb') as extracted_file:
+            assert extracted_file.read() == b'a'
+        with open(os.path.join(directory, 'sub/c.json'), 'rb') as existing_file:
+            assert existing_file.read() == b'existing'
+        assert not os.path.exists(os.path.join(directory, 'sub/b.gff3'))
+        assert not os.path.exists(os.path.join(directory, 'sub/a.json.part'))
+
+
+def test_extract_while_downloading():
+    """Test members are extracted from the tee, and again from the file if the tee was incomplete"""
+
+    with tempfile.TemporaryDirectory() as directory:
+        tarball = make_tarball(directory, {'a.json': b'a' * 3000000, 'b.json': b'b'})
+
+        def download(tee):
+            tee.write(tarball)
+            return True
+
+        TARFile(directory, 'data.tar.gz').extract_while_downloading(download)
+        with open(os.path.join(directory, 'a.json'), 'rb') as extracted_file:
+            assert extracted_file.read() == b'a' * 3000000
+
+        os.remove(os.path.join(directory, 'a.json'))
+        os.remove(os.path.join(directory, 'b.json'))
+
+        def interrupted_download(tee):
+            tee.write(tarball[:len(tarball) // 2])
+            return False
+
+        TARFile(directory, 'data.tar.gz').extract_while_downloading(interrupted_download)
+        with open(os.path.join(directory, 'b.json'), 'rb') as extracted_file:
+            assert extracted_file.read() == b'b'
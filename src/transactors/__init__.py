@@ -1,4 +1,6 @@
 from .transactor import Transactor
 from .csv_transactor import CSVTransactor
+from .bulk_import_transactor import BulkImportTransactor
+from .query_metrics import QueryMetrics
 from .neo4j_transactor import Neo4jTransactor
 from .file_transactor import FileTransactor
\ No newline at end of file
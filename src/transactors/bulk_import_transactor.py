@@ -0,0 +1,383 @@
+"""Bulk Import Transactor"""
+
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+
+from files import CompressedFile
+from loader_common import ContextInfo
+
+
+class BulkImportTransactor():
+    """Turns the LOAD CSV queries of a full load into `neo4j-admin import` files.
+
+       In the export stage the Neo4jTransactor records every query it is given instead
+       of running it. Once all ETLs have written their CSVs, export() converts the
+       queries that only MERGE nodes by primaryKey, or only MERGE a relationship
+       between two such nodes, into node and relationship files for neo4j-admin.
+       Everything else is written to a replay list that the replay stage runs through
+       Cypher after the import, followed by the ETLs that read the graph.
+
+       Experimental: queries that create a node together with its relationships, such
+       as the Allele, Variant and ontology term loads, are not translated and are
+       replayed, so most of a full load still runs through Cypher."""
+
+    logger = logging.getLogger(__name__)
+
+    directory = os.path.join('tmp', 'bulk_import')
+    manifest_path = os.path.join(directory, 'manifest.jsonl')
+    replay_path = os.path.join(directory, 'replay.jsonl')
+    script_path = os.path.join(directory, 'neo4j-admin-import.sh')
+    manifest_lock = None
+
+    # neo4j-admin writes into the default 3.5 database directory.
+    database_name = "graph.db"
+
+    header_pattern = re.compile(r"^\s*USING\s+PERIODIC\s+COMMIT\s*\d*\s*"
+                                r"LOAD\s+CSV\s+WITH\s+HEADERS\s+FROM\s+'file:///[^']*'\s+AS\s+row\s*",
+                                re.IGNORECASE)
+    comment_pattern = re.compile(r"^\s*//.*$", re.MULTILINE)
+
+    filter_match_pattern = re.compile(r"^MATCH\s*\(\s*(?P<var>\w+)\s*(?::\w+)+\s*"
+                                      r"\{\s*primaryKey\s*:\s*row\.\w+\s*\}\s*\)\s*",
+                                      re.IGNORECASE)
+    node_pattern = re.compile(r"^(?:MERGE|CREATE)\s*\(\s*(?P<var>\w+)\s*(?P<labels>(?::\w+)+)\s*"
+                              r"\{\s*primaryKey\s*:\s*row\.(?P<id>\w+)\s*\}\s*\)(?P<sets>.*)$",
+                              re.IGNORECASE | re.DOTALL)
+    relationship_pattern = re.compile(
+        r"^MATCH\s*\(\s*(?P<var1>\w+)\s*:(?P<label1>\w+)\s*\{\s*primaryKey\s*:\s*row\.(?P<id1>\w+)\s*\}\s*\)\s*"
+        r"MATCH\s*\(\s*(?P<var2>\w+)\s*:(?P<label2>\w+)\s*\{\s*primaryKey\s*:\s*row\.(?P<id2>\w+)\s*\}\s*\)\s*"
+        r"MERGE\s*\(\s*(?P<start>\w+)\s*\)\s*(?P<left><?)-\[\s*(?P<var>\w*)\s*:(?P<type>\w+)\s*\]-(?P<right>>?)"
+        r"\s*\(\s*(?P<end>\w+)\s*\)(?P<sets>.*)$",
+        re.IGNORECASE | re.DOTALL)
+    set_pattern = re.compile(r"\s*(?:ON\s+CREATE\s+)?SET\s+", re.IGNORECASE)
+    assignment_pattern = re.compile(
+        r"\s*(?P<var>\w+)\.(?P<property>\w+)\s*=\s*"
+        r"(?:(?P<function>apoc\.number\.parseInt|toInteger|toInt|toFloat)\(\s*row\.(?P<wrapped>\w+)\s*\)"
+        r"|row\.(?P<column>\w+))\s*(?P<more>,)?",
+        re.IGNORECASE)
+    written_labels_pattern = re.compile(r"\b(?:MERGE|CREATE)\b(?P<clause>.*?)(?=\b(?:MATCH|MERGE|CREATE|WITH|"
+                                        r"SET|ON|WHERE|UNWIND|RETURN|DELETE|DETACH|REMOVE|CALL)\b|$)",
+                                        re.IGNORECASE | re.DOTALL)
+    node_labels_pattern = re.compile(r"\(\s*\w*\s*((?::\w+)+)")
+
+    property_types = {
+        'apoc.number.parseint': 'long',
+        'tointeger': 'long',
+        'toint': 'long',
+        'tofloat': 'double'
+    }
+
+    @staticmethod
+    def is_exporting():
+        """Whether queries should be recorded for the bulk export instead of run"""
+
+        context_info = ContextInfo()
+        return context_info.env["NEO4J_WRITE_MODE"] == "bulk" \
+            and context_info.env["BULK_IMPORT_STAGE"] == "export"
+
+    @staticmethod
+    def start_export():
+        """Start an empty export directory. Must run before any process that records queries is forked."""
+
+        if os.path.exists(BulkImportTransactor.directory):
+            shutil.rmtree(BulkImportTransactor.directory)
+        os.makedirs(BulkImportTransactor.directory)
+        BulkImportTransactor.manifest_lock = multiprocessing.Lock()
+
+    @staticmethod
+    def record_query(owner, batch, neo4j_query, filename):
+        """Append a query to the export manifest, keeping the order queries were run in"""
+
+        entry = json.dumps({'owner': owner, 'batch': batch, 'query': neo4j_query, 'file': filename})
+        with BulkImportTransactor.manifest_lock:
+            with open(BulkImportTransactor.manifest_path, 'a', encoding='utf-8') as manifest:
+                manifest.write(entry + "\n")
+
+    @staticmethod
+    def _read_entries(path):
+        entries = []
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as entry_file:
+                for line in entry_file:
+                    entries.append(json.loads(line))
+        return entries
+
+    @staticmethod
+    def _parse_sets(sets, variable):
+        """Parse a tail of SET / ON CREATE SET clauses that only copy row columns onto
+           variable. Returns [(property, column, type)] or None if anything else is in there."""
+
+        properties = []
+        position = 0
+        sets = sets.rstrip()
+        while position < len(sets):
+            set_match = BulkImportTransactor.set_pattern.match(sets, position)
+            if set_match is None:
+                return None
+            position = set_match.end()
+            while True:
+                assignment = BulkImportTransactor.assignment_pattern.match(sets, position)
+                if assignment is None or assignment.group('var') != variable:
+                    return None
+                position = assignment.end()
+                if assignment.group('function') is not None:
+                    properties.append((assignment.group('property'),
+                                       assignment.group('wrapped'),
+                                       BulkImportTransactor.property_types[assignment.group('function').lower()]))
+                else:
+                    properties.append((assignment.group('property'), assignment.group('column'), None))
+                if assignment.group('more') is None:
+                    break
+
+        return properties
+
+    @staticmethod
+    def _strip_filter_matches(body):
+        """Drop leading MATCHes by primaryKey of nodes the rest of the query does not use,
+           like the MATCH of the Load node in front of BGI's Gene MERGE. These only check
+           that the node exists, and the nodes matched this way are created from the
+           same files before the rows that match them."""
+
+        filter_match = BulkImportTransactor.filter_match_pattern.match(body)
+        while filter_match is not None:
+            rest = body[filter_match.end():]
+            if re.search(r"\b%s\b" % filter_match.group('var'), rest):
+                return body
+            body = rest
+            filter_match = BulkImportTransactor.filter_match_pattern.match(body)
+
+        return body
+
+    @staticmethod
+    def translate_query(neo4j_query):
+        """Describe a LOAD CSV query as a node or relationship import, or None if it
+           has to run through Cypher"""
+
+        header = BulkImportTransactor.header_pattern.match(neo4j_query)
+        if header is None:
+            return None
+        body = BulkImportTransactor.comment_pattern.sub("", neo4j_query[header.end():]).strip()
+
+        node = BulkImportTransactor.node_pattern.match(BulkImportTransactor._strip_filter_matches(body))
+        if node is not None:
+            properties = BulkImportTransactor._parse_sets(node.group('sets'), node.group('var'))
+            if properties is None:
+                return None
+            return {'kind': 'node',
+                    'labels': node.group('labels').strip(':').split(':'),
+                    'id': node.group('id'),
+                    'properties': properties}
+
+        relationship = BulkImportTransactor.relationship_pattern.match(body)
+        if relationship is not None:
+            ends = {relationship.group('var1'): (relationship.group('label1'), relationship.group('id1')),
+                    relationship.group('var2'): (relationship.group('label2'), relationship.group('id2'))}
+            (start, end) = (relationship.group('start'), relationship.group('end'))
+            if len(ends) != 2 or start not in ends or end not in ends or start == end:
+                return None
+            if relationship.group('left') and relationship.group('right'):
+                return None
+            if relationship.group('left'):
+                (start, end) = (end, start)
+            properties = []
+            if relationship.group('sets').strip():
+                if not relationship.group('var'):
+                    return None
+                properties = BulkImportTransactor._parse_sets(relationship.group('sets'),
+                                                              relationship.group('var'))
+                if properties is None:
+                    return None
+            return {'kind': 'relationship',
+                    'type': relationship.group('type'),
+                    'start': ends[start],
+                    'end': ends[end],
+                    'properties': properties}
+
+        return None
+
+    @staticmethod
+    def get_written_labels(neo4j_query):
+        """Labels a Cypher query may create nodes with (node patterns in MERGE and CREATE clauses)"""
+
+        labels = set()
+        body = BulkImportTransactor.comment_pattern.sub("", neo4j_query)
+        for clause in BulkImportTransactor.written_labels_pattern.finditer(body):
+            for node_labels in BulkImportTransactor.node_labels_pattern.findall(clause.group('clause')):
+                labels.update(node_labels.strip(':').split(':'))
+        return labels
+
+    @staticmethod
+    def _plan(entries):
+        """Pick the entries that can be imported. Node labels that Cypher also creates are
+           left to Cypher, so MERGE keeps its meaning, and a relationship is only imported
+           when both of its ends are nodes of a single-label ID space that is imported."""
+
+        specs = [BulkImportTransactor.translate_query(entry['query']) for entry in entries]
+
+        cypher_labels = set()
+        for (entry, spec) in zip(entries, specs):
+            if spec is None:
+                cypher_labels.update(BulkImportTransactor.get_written_labels(entry['query']))
+
+        # Dropping a node query to Cypher adds its labels, which can drop others.
+        changed = True
+        while changed:
+            changed = False
+            for (index, spec) in enumerate(specs):
+                if spec is not None and spec['kind'] == 'node' \
+                        and not cypher_labels.isdisjoint(spec['labels']):
+                    cypher_labels.update(spec['labels'])
+                    specs[index] = None
+                    changed = True
+
+        id_spaces = set()
+        secondary_labels = set()
+        for spec in specs:
+            if spec is not None and spec['kind'] == 'node':
+                id_spaces.add(spec['labels'][0])
+                secondary_labels.update(spec['labels'][1:])
+        id_spaces -= secondary_labels
+
+        for (index, spec) in enumerate(specs):
+            if spec is not None and spec['kind'] == 'relationship' \
+                    and (spec['start'][0] not in id_spaces or spec['end'][0] not in id_spaces):
+                specs[index] = None
+
+        return specs
+
+    @staticmethod
+    def _clean_value(value, property_type):
+        if value is None or value == '':
+            return ''
+        try:
+            if property_type == 'long':
+                return str(int(value))
+            if property_type == 'double':
+                return str(float(value))
+        except ValueError:
+            return ''
+        return value
+
+    @staticmethod
+    def _header_properties(properties):
+        header = []
+        for (name, _, property_type) in properties:
+            header.append(name if property_type is None else "%s:%s" % (name, property_type))
+        return header
+
+    @staticmethod
+    def _write_nodes(spec, source, target, seen_ids):
+        id_space = spec['labels'][0]
+        properties = [prop for prop in spec['properties'] if prop[0] != 'primaryKey']
+        # Later assignments to the same property win, as they would in Cypher.
+        properties = list({prop[0]: prop for prop in properties}.values())
+        labels = ";".join(spec['labels'])
+        seen = seen_ids.setdefault(id_space, set())
+
+        writer = csv.writer(target)
+        writer.writerow(["primaryKey:ID(%s)" % id_space]
+                        + BulkImportTransactor._header_properties(properties)
+                        + [":LABEL"])
+        written = 0
+        for row in csv.DictReader(source):
+            node_id = row.get(spec['id'])
+            if not node_id or node_id in seen:
+                continue
+            seen.add(node_id)
+            writer.writerow([node_id]
+                            + [BulkImportTransactor._clean_value(row.get(column), property_type)
+                               for (name, column, property_type) in properties]
+                            + [labels])
+            written = written + 1
+        return written
+
+    @staticmethod
+    def _write_relationships(spec, source, target, seen_relationships):
+        ((start_space, start_column), (end_space, end_column)) = (spec['start'], spec['end'])
+        properties = list({prop[0]: prop for prop in spec['properties']}.values())
+        seen = seen_relationships.setdefault((spec['type'], start_space, end_space), set())
+
+        writer = csv.writer(target)
+        writer.writerow([":START_ID(%s)" % start_space, ":END_ID(%s)" % end_space, ":TYPE"]
+                        + BulkImportTransactor._header_properties(properties))
+        written = 0
+        for row in csv.DictReader(source):
+            ends = (row.get(start_column), row.get(end_column))
+            if not ends[0] or not ends[1] or ends in seen:
+                continue
+            seen.add(ends)
+            writer.writerow([ends[0], ends[1], spec['type']]
+                            + [BulkImportTransactor._clean_value(row.get(column), property_type)
+                               for (name, column, property_type) in properties])
+            written = written + 1
+        return written
+
+    @staticmethod
+    def export():
+        """Write the neo4j-admin import files, the import script and the replay list"""
+
+        entries = BulkImportTransactor._read_entries(BulkImportTransactor.manifest_path)
+        specs = BulkImportTransactor._plan(entries)
+
+        node_files = []
+        relationship_files = []
+        seen_ids = {}
+        seen_relationships = {}
+        with open(BulkImportTransactor.replay_path, 'w', encoding='utf-8') as replay:
+            for (index, (entry, spec)) in enumerate(zip(entries, specs)):
+                if spec is None:
+                    replay.write(json.dumps(entry) + "\n")
+                    continue
+
+                import_name = "%s_%s_%s" % (spec['kind'], index, entry['file'])
+                with CompressedFile.open(os.path.join('tmp', entry['file']), newline='') as source, \
+                        open(os.path.join(BulkImportTransactor.directory, import_name),
+                             'w', encoding='utf-8', newline='') as target:
+                    if spec['kind'] == 'node':
+                        written = BulkImportTransactor._write_nodes(spec, source, target, seen_ids)
+                        node_files.append(import_name)
+                    else:
+                        written = BulkImportTransactor._write_relationships(spec, source, target,
+                                                                            seen_relationships)
+                        relationship_files.append(import_name)
+                BulkImportTransactor.logger.debug("Bulk import file %s: %s rows", import_name, written)
+
+        with open(BulkImportTransactor.script_path, 'w') as script:
+            script.write("#!/bin/sh\n"
+                         "# Run where neo4j-admin can write the database, with Neo4j stopped and the\n"
+                         "# database empty. Then start Neo4j and run the loader's replay stage.\n"
+                         "cd \"$(dirname \"$0\")\"\n"
+                         "neo4j-admin import --database=%s --id-type=STRING \\\n"
+                         "    --ignore-duplicate-nodes=true --ignore-missing-nodes=true \\\n"
+                         "    --multiline-fields=true"
+                         % BulkImportTransactor.database_name)
+            for node_file in node_files:
+                script.write(" \\\n    --nodes=%s" % node_file)
+            for relationship_file in relationship_files:
+                script.write(" \\\n    --relationships=%s" % relationship_file)
+            script.write("\n")
+        os.chmod(BulkImportTransactor.script_path, 0o755)
+
+        BulkImportTransactor.logger.info("Bulk export: %s node files, %s relationship files, "
+                                         "%s queries left for the replay stage. Import with %s",
+                                         len(node_files),
+                                         len(relationship_files),
+                                         len(entries) - len(node_files) - len(relationship_files),
+                                         BulkImportTransactor.script_path)
+
+    @staticmethod
+    def get_replay_batches():
+        """The queries left to Cypher, as [(owner, batch, [[query, file], ...])] in the
+           order they were originally queued. Owners come in an order that respects the
+           dependencies the ETLs were scheduled with. Queries an ETL ran directly rather
+           than through the LOAD CSV queue have a batch of None."""
+
+        batches = {}
+        for entry in BulkImportTransactor._read_entries(BulkImportTransactor.replay_path):
+            batches.setdefault((entry['owner'], entry['batch']), []).append([entry['query'], entry['file']])
+        return [(owner, batch, queries) for ((owner, batch), queries) in batches.items()]
@@ -2,8 +2,14 @@
 
 from contextlib import ExitStack
 import csv
+import math
 import os
 import logging
+import pickle
+
+from files import CompressedFile
+from loader_common import ContextInfo
+from .csv_writer import CSVWriter, ShardedCSVWriter
 
 
 class CSVTransactor():
@@ -14,46 +20,179 @@ class CSVTransactor():
     def save_file_static(generator, generator_file_list):
         """Save File Static"""
 
+        if ContextInfo().env["NEO4J_WRITE_MODE"] == "unwind":
+            CSVTransactor.save_row_batches(generator, generator_file_list)
+            return
+
         with ExitStack() as stack:
             # Open all necessary CSV files at once.
-            open_files = [stack.enter_context(open(os.path.join('tmp', file_name),'w',encoding='utf-8'))
-                          for [query, file_name] in generator_file_list]
+            csv_writers = [stack.enter_context(CSVTransactor.create_writer(query, file_name))
+                           for [query, file_name] in generator_file_list]
             CSVTransactor.logger.debug(generator_file_list)
-            # Create a list with 'None' placeholder entries.
-            csv_file_writer = [None] * len(open_files)
             for generator_entry in generator:
                 for index, individual_list in enumerate(generator_entry):
-                    CSVTransactor.logger.debug(individual_list)
-                    current_filename = open_files[index].name  # Our current CSV output file.
-
                     # Remove None's from list which cause the write rows to crash
                     individual_list = [x for x in individual_list if x is not None]
 
                     if len(individual_list) == 0:
                         CSVTransactor.logger.debug("No data found when writing to csv! %s: %s",
                                                    'Skipping output file',
-                                                   current_filename)
+                                                   csv_writers[index].file_path)
                         continue
 
-                    if csv_file_writer[index] is None:  # If we haven't yet created a DictWriter
-                        # for this particular file.
-                        CSVTransactor.logger.debug("Saving data to output file: %s",
-                                                   current_filename)
-                        try:
-                            csv_file_writer[index] = csv.DictWriter(
-                                                          open_files[index],
-                                                          fieldnames=list(individual_list[0]),
-                                                          quoting=csv.QUOTE_NONNUMERIC)
-                            csv_file_writer[index].writeheader()
-                        except csv.Error as error:
-                            CSVTransactor.logger.critical("Couldn't write to file: %s ",
-                                                          current_filename)
-                            CSVTransactor.logger.critical(error)
-
-                    # Write the remainder of the list
-                    csv_file_writer[index].writerows(individual_list)
-                    # content for this iteration.
-                    # logger.info("%s: Finished Writting %s entries to file: %s",
-                    #             self._get_name(),
-                    #             len(individual_list),
-                    #             current_filename)
+                    try:
+                        csv_writers[index].write_rows(individual_list)
+                    except csv.Error as error:
+                        CSVTransactor.logger.critical("Couldn't write to file: %s ",
+                                                      csv_writers[index].file_path)
+                        CSVTransactor.logger.critical(error)
+
+    @staticmethod
+    def create_writer(query, file_name):
+        """The CSV writer for a file, split over its shards if the file is sharded"""
+
+        # etl imports transactors, so it is imported when needed rather than with this module.
+        from etl import ETL
+
+        shard_key = ETL.get_query_shard_key(query)
+        if shard_key is None:
+            return CSVWriter.create(os.path.join('tmp', file_name), ETL.csv_fields.get(file_name))
+
+        return ShardedCSVWriter(os.path.join('tmp', file_name),
+                                [CSVWriter.create(os.path.join('tmp', shard_name), ETL.csv_fields.get(file_name))
+                                 for shard_name in CSVTransactor.get_shard_names(file_name)],
+                                shard_key)
+
+    @staticmethod
+    def get_shard_names(file_name):
+        """The names of the files the rows of a sharded file are written to"""
+
+        from etl import ETL
+
+        return ["%s.shard%s" % (file_name, shard) for shard in range(ETL.get_shard_count())]
+
+    @staticmethod
+    def get_row_batch_path(file_name):
+        """Path of the row batch file written in place of a CSV in unwind mode"""
+
+        return os.path.join('tmp', file_name + '.rows')
+
+    @staticmethod
+    def save_row_batches(generator, generator_file_list):
+        """Pickle each generator batch, per output file, for Neo4jTransactor to send
+           as UNWIND parameters. Files are still completed one at a time, in order,
+           because later queries in a list expect earlier files to be fully loaded."""
+
+        from etl import ETL
+
+        with ExitStack() as stack:
+            # One row batch file per shard of a sharded file, one for any other file.
+            shard_keys = [ETL.get_query_shard_key(query) for [query, file_name] in generator_file_list]
+            open_files = [[stack.enter_context(open(CSVTransactor.get_row_batch_path(name), 'wb'))
+                           for name in (CSVTransactor.get_shard_names(file_name)
+                                        if shard_key is not None else [file_name])]
+                          for ([query, file_name], shard_key) in zip(generator_file_list, shard_keys)]
+            fields = [ETL.csv_fields.get(file_name) for [query, file_name] in generator_file_list]
+            for generator_entry in generator:
+                for index, individual_list in enumerate(generator_entry):
+                    # Match what LOAD CSV would hand the query: text values, null for None.
+                    rows = [{key: None if value is None else str(value)
+                             for (key, value) in (zip(fields[index], row) if isinstance(row, tuple)
+                                                  else row.items())}
+                            for row in individual_list if row is not None]
+                    shards = [[] for row_file in open_files[index]]
+                    for row in rows:
+                        if shard_keys[index] is None:
+                            shards[0].append(row)
+                        else:
+                            shards[ShardedCSVWriter.get_shard(row[shard_keys[index]], len(shards))].append(row)
+                    for (row_file, shard_rows) in zip(open_files[index], shards):
+                        if len(shard_rows) > 0:
+                            pickle.dump(shard_rows, row_file, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _raw_records(csv_file):
+        """Yield the raw text of each record, keeping quoted newlines inside their record"""
+
+        record = ""
+        quotes = 0
+        for line in csv_file:
+            record = record + line
+            quotes = quotes + line.count('"')
+            if quotes % 2 == 0:
+                yield record
+                record = ""
+                quotes = 0
+        if record:
+            yield record
+
+    @staticmethod
+    def split_file(file_name, part_count):
+        """Split a file written by save_file_static into up to part_count files of whole
+           rows, named file_name.partN. Returns the new file names, [] if there is
+           nothing to split."""
+
+        if ContextInfo().env["NEO4J_WRITE_MODE"] == "unwind":
+            return CSVTransactor._split_row_batches(file_name, part_count)
+
+        file_path = os.path.join('tmp', file_name)
+        with CompressedFile.open(file_path, newline='') as csv_file:
+            row_count = sum(1 for record in CSVTransactor._raw_records(csv_file)) - 1
+        if row_count < 2:
+            return []
+        rows_per_part = math.ceil(row_count / part_count)
+
+        part_names = []
+        with CompressedFile.open(file_path, newline='') as csv_file:
+            records = CSVTransactor._raw_records(csv_file)
+            header = next(records)
+            part_file = None
+            for (index, record) in enumerate(records):
+                if index % rows_per_part == 0:
+                    if part_file is not None:
+                        CSVTransactor._close_part(part_file, rows_per_part)
+                    part_names.append("%s.part%s" % (file_name, len(part_names)))
+                    part_file = open(os.path.join('tmp', part_names[-1]), 'w', encoding='utf-8', newline='')
+                    part_file.write(header)
+                part_file.write(record)
+            CSVTransactor._close_part(part_file, row_count - rows_per_part * (len(part_names) - 1))
+
+        return part_names
+
+    @staticmethod
+    def _close_part(part_file, rows):
+        CSVWriter.save_stats(part_file.name, rows, part_file.tell())
+        part_file.close()
+
+    @staticmethod
+    def _split_row_batches(file_name, part_count):
+        def read_rows(row_file):
+            while True:
+                try:
+                    yield from pickle.load(row_file)
+                except EOFError:
+                    return
+
+        batch_path = CSVTransactor.get_row_batch_path(file_name)
+        with open(batch_path, 'rb') as row_file:
+            row_count = sum(1 for row in read_rows(row_file))
+        if row_count < 2:
+            return []
+        rows_per_part = math.ceil(row_count / part_count)
+
+        part_names = []
+        with open(batch_path, 'rb') as row_file:
+            part_rows = []
+            for row in read_rows(row_file):
+                part_rows.append(row)
+                if len(part_rows) == rows_per_part:
+                    part_names.append("%s.part%s" % (file_name, len(part_names)))
+                    with open(CSVTransactor.get_row_batch_path(part_names[-1]), 'wb') as part_file:
+                        pickle.dump(part_rows, part_file, pickle.HIGHEST_PROTOCOL)
+                    part_rows = []
+            if len(part_rows) > 0:
+                part_names.append("%s.part%s" % (file_name, len(part_names)))
+                with open(CSVTransactor.get_row_batch_path(part_names[-1]), 'wb') as part_file:
+                    pickle.dump(part_rows, part_file, pickle.HIGHEST_PROTOCOL)
+
+        return part_names
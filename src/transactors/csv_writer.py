@@ -0,0 +1,281 @@
+"""CSV Writer"""
+
+import csv
+import gzip
+import json
+import logging
+import os
+import zlib
+from operator import itemgetter
+
+from loader_common import ContextInfo
+
+# The Arrow CSV encoder is used when pyarrow is installed and CSV_WRITER is "arrow".
+try:
+    import pyarrow
+    import pyarrow.csv as pyarrow_csv
+except ImportError:
+    pyarrow = None
+
+
+class CSVWriter():
+    """Writes the row batches of one LOAD CSV file.
+
+       The columns are the ones declared for the file or, if none are, the keys of the
+       first batch in order of appearance. Dict rows are turned into tuples with an
+       itemgetter; as with csv.DictWriter a row with a key that is not a column is an
+       error and missing keys are written empty. With declared columns rows can be
+       tuples to begin with. The file is written through a large buffer. With
+       CSV_COMPRESSION=gzip the file is gzipped under the same name, which LOAD CSV
+       recognises by its header.
+
+       When it is closed the number of rows and the uncompressed size of the file
+       are saved next to it (get_stats), so they are known without reading it again."""
+
+    logger = logging.getLogger(__name__)
+
+    buffer_size = 1024 * 1024
+    gzip_level = 1
+    stats_suffix = '.stats'
+
+    def __init__(self, file_path, compression=None, fieldnames=None):
+        self.file_path = file_path
+        self.compression = compression
+        self.declared = fieldnames is not None
+        self.fieldnames = None
+        self.get_values = None
+        self.header_written = False
+        self.row_count = 0
+        if fieldnames is not None:
+            self._set_fieldnames(fieldnames)
+        if os.path.exists(file_path + self.stats_suffix):
+            os.remove(file_path + self.stats_suffix)
+        self.file_handle = self._open()
+        self.writer = self._get_writer()
+
+    def _open(self):
+        if self.compression == 'gzip':
+            return gzip.open(self.file_path, 'wt', encoding='utf-8', newline='',
+                             compresslevel=self.gzip_level)
+
+        return open(self.file_path, 'w', encoding='utf-8', newline='', buffering=self.buffer_size)
+
+    def _get_writer(self):
+        return csv.writer(self.file_handle, quoting=csv.QUOTE_NONNUMERIC)
+
+    @staticmethod
+    def create(file_path, fieldnames=None):
+        """The writer selected by CSV_WRITER and CSV_COMPRESSION, for the declared
+           columns fieldnames if given"""
+
+        context_info = ContextInfo()
+        compression = context_info.env["CSV_COMPRESSION"]
+        if compression in ("off", "none", "", False):
+            compression = None
+
+        if context_info.env["CSV_WRITER"] == "arrow":
+            if pyarrow is not None:
+                return ArrowCSVWriter(file_path, compression, fieldnames)
+            CSVWriter.logger.warning("CSV_WRITER is arrow but pyarrow is not installed, using csv")
+
+        return CSVWriter(file_path, compression, fieldnames)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _set_fieldnames(self, fieldnames):
+        self.fieldnames = list(fieldnames)
+        if len(self.fieldnames) == 1:
+            self.get_values = lambda row, field=self.fieldnames[0]: (row[field],)
+        else:
+            self.get_values = itemgetter(*self.fieldnames)
+
+    @staticmethod
+    def save_stats(file_path, rows, size):
+        """Save the number of rows after the header and the uncompressed bytes of file_path"""
+
+        with open(file_path + CSVWriter.stats_suffix, 'w') as stats_file:
+            json.dump({'rows': rows, 'bytes': size}, stats_file)
+
+    @staticmethod
+    def get_stats(file_path):
+        """(rows, uncompressed bytes) of file_path as saved when it was written, None if
+           they weren't"""
+
+        if not os.path.exists(file_path + CSVWriter.stats_suffix):
+            return None
+
+        with open(file_path + CSVWriter.stats_suffix) as stats_file:
+            stats = json.load(stats_file)
+
+        return (stats['rows'], stats['bytes'])
+
+    @staticmethod
+    def get_union_of_keys(rows):
+        """The keys of all rows, in order of first appearance"""
+
+        keys = {}
+        for row in rows:
+            for key in row:
+                keys[key] = None
+
+        return list(keys)
+
+    def _check_batch(self, rows):
+        """Check the first row of a batch against the columns, _get_dict_rows checks
+           the others. Rows that don't fit declared columns or that have keys the
+           header lacks are an error."""
+
+        first_row = rows[0]
+        if isinstance(first_row, tuple):
+            if not self.declared or len(first_row) != len(self.fieldnames):
+                raise ValueError("%s: tuple row %s does not fit the declared columns %s"
+                                 % (self.file_path, first_row, self.fieldnames))
+        elif self.declared and set(first_row) != set(self.fieldnames):
+            raise ValueError("%s: row keys %s do not match the declared columns %s"
+                             % (self.file_path, sorted(first_row), self.fieldnames))
+        else:
+            self._check_keys(first_row)
+
+    def _check_keys(self, row):
+        if not set(row) <= set(self.fieldnames):
+            raise ValueError("%s: row keys %s are not in the header %s"
+                             % (self.file_path,
+                                sorted(set(row) - set(self.fieldnames)),
+                                self.fieldnames))
+
+    def _get_rows(self, rows):
+        """The rows of a batch as tuples in column order"""
+
+        if isinstance(rows[0], tuple):
+            return rows
+
+        return self._get_dict_rows(rows)
+
+    def _get_dict_rows(self, rows):
+        width = len(self.fieldnames)
+        for row in rows:
+            if len(row) > width:
+                self._check_keys(row)
+            try:
+                yield self.get_values(row)
+            except KeyError:
+                # Missing fields are written empty, as csv.DictWriter does.
+                self._check_keys(row)
+                yield tuple(row.get(field, '') for field in self.fieldnames)
+
+    def _start_batch(self, rows):
+        """Settle the columns on the first batch and check every batch"""
+
+        if self.fieldnames is None:
+            self._set_fieldnames(self.get_union_of_keys(rows))
+        self._check_batch(rows)
+
+    def write_rows(self, rows):
+        """Write a batch of rows, the first batch also writes the header"""
+
+        self._start_batch(rows)
+        if not self.header_written:
+            self.writer.writerow(self.fieldnames)
+            self.header_written = True
+
+        self.writer.writerows(self._get_rows(rows))
+        self.row_count = self.row_count + len(rows)
+
+    def close(self):
+        """Flush and close the file, saving its stats"""
+
+        # tell() is the position in the uncompressed text, gzipped or not.
+        self.save_stats(self.file_path, self.row_count, self.file_handle.tell())
+        self.file_handle.close()
+
+
+class ShardedCSVWriter():
+    """Splits the rows of one LOAD CSV file over one writer per shard by a hash of
+       the shard key column, so each key always lands in the same shard."""
+
+    def __init__(self, file_path, writers, shard_key):
+        self.file_path = file_path
+        self.writers = writers
+        self.shard_key = shard_key
+        self.get_key = None
+
+    @staticmethod
+    def get_shard(value, shard_count):
+        """The shard of a key value, the same in every process"""
+
+        return zlib.crc32(str(value).encode('utf-8')) % shard_count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write_rows(self, rows):
+        """Write a batch of rows, each to the writer of its shard"""
+
+        if self.get_key is None:
+            if isinstance(rows[0], tuple):
+                self.get_key = itemgetter(self.writers[0].fieldnames.index(self.shard_key))
+            else:
+                self.get_key = itemgetter(self.shard_key)
+
+        shards = [[] for writer in self.writers]
+        for row in rows:
+            shards[self.get_shard(self.get_key(row), len(shards))].append(row)
+
+        for (writer, shard_rows) in zip(self.writers, shards):
+            if len(shard_rows) > 0:
+                writer.write_rows(shard_rows)
+
+    def close(self):
+        """Flush and close every shard"""
+
+        for writer in self.writers:
+            writer.close()
+
+
+class ArrowCSVWriter(CSVWriter):
+    """Encodes each batch with pyarrow's native CSV writer. Every value is written
+       as text (None as an empty string, as csv.DictWriter does), LOAD CSV hands the
+       queries text either way."""
+
+    def __init__(self, file_path, compression=None, fieldnames=None):
+        super().__init__(file_path, compression, fieldnames)
+        self.schema = None
+
+    def _open(self):
+        return pyarrow.output_stream(self.file_path, compression=self.compression,
+                                     buffer_size=self.buffer_size)
+
+    def _get_writer(self):
+        # Created on the first batch, once the columns are known.
+        return None
+
+    def write_rows(self, rows):
+        """Write a batch of rows, the first batch also writes the header"""
+
+        self._start_batch(rows)
+        if self.writer is None:
+            self.schema = pyarrow.schema([(field, pyarrow.string()) for field in self.fieldnames])
+            self.writer = pyarrow_csv.CSVWriter(self.file_handle, self.schema)
+
+        columns = list(zip(*self._get_rows(rows)))
+        self.writer.write_table(pyarrow.Table.from_arrays(
+            [pyarrow.array(['' if value is None else str(value) for value in column],
+                           type=pyarrow.string())
+             for column in columns],
+            schema=self.schema))
+        self.row_count = self.row_count + len(rows)
+
+    def close(self):
+        """Flush and close the file, saving its stats"""
+
+        if self.writer is not None:
+            self.writer.close()
+        # Arrow's output stream also counts the bytes written to it before compression.
+        super().close()
@@ -2,9 +2,6 @@
 
 import logging
 import multiprocessing
-from time import sleep
-
-from etl import ETL
 
 
 class FileTransactor():
@@ -15,10 +12,16 @@ class FileTransactor():
     count = 0
     queue = None
 
+    # One completion event per file to download, keyed by its URL / S3 path. Only the
+    # loader process queues transactions, so it decides which sub type downloads a file
+    # and which ones wait for it; there is no check-then-append race between workers.
+    manager = None
+    download_events = {}
+
     def __init__(self):
-        manager = multiprocessing.Manager()
-        FileTransactor.queue = manager.Queue()
-        self.filetracking_queue = manager.list()
+        FileTransactor.manager = multiprocessing.Manager()
+        FileTransactor.queue = FileTransactor.manager.Queue()
+        FileTransactor.download_events = {}
 
 
     @staticmethod
@@ -31,8 +34,7 @@ class FileTransactor():
         self.thread_pool = []
         for i in range(0, thread_count):
             process = multiprocessing.Process(target=self.run,
-                                              name=str(i),
-                                              args=(self.filetracking_queue,))
+                                              name=str(i))
             process.start()
             self.thread_pool.append(process)
 
@@ -42,7 +44,16 @@ class FileTransactor():
         """Execture Transaction"""
 
         FileTransactor.count = FileTransactor.count + 1
-        FileTransactor.queue.put((sub_type, FileTransactor.count))
+
+        # The first sub type queued for a file downloads it, later ones wait for its event.
+        # Sub types are queued in order, so a downloader is always picked up before its waiters.
+        file_to_download = sub_type.get_file_to_download()
+        downloads = file_to_download not in FileTransactor.download_events
+        if downloads:
+            FileTransactor.download_events[file_to_download] = FileTransactor.manager.Event()
+        download_event = FileTransactor.download_events[file_to_download]
+
+        FileTransactor.queue.put((sub_type, FileTransactor.count, download_event, downloads))
         FileTransactor.logger.debug("Execute Transaction Batch: %s QueueSize: %s ",
                                     FileTransactor.count,
                                     FileTransactor.queue.qsize())
@@ -50,6 +61,9 @@ class FileTransactor():
     def check_for_thread_errors(self):
         """Check for Thread Errors"""
 
+        # etl imports transactors, so it is imported when needed rather than with this module.
+        from etl import ETL
+
         ETL.wait_for_threads(self.thread_pool, FileTransactor.queue)
 
     def wait_for_queues(self):
@@ -66,13 +80,13 @@ class FileTransactor():
             thread.terminate()
         self.logger.debug("Finished Shutting down FileTransactor threads")
 
-    def run(self, filetracking_queue):
+    def run(self):
         """Run"""
 
         self.logger.debug("%s: Starting FileTransactor Thread Runner.", self._get_name())
         while True:
             try:
-                (sub_type, FileTransactor.count) = FileTransactor.queue.get()
+                (sub_type, FileTransactor.count, download_event, downloads) = FileTransactor.queue.get()
             except EOFError as error:
                 self.logger.debug("Queue Closed exiting: %s", error)
                 return
@@ -81,11 +95,11 @@ class FileTransactor():
                               self._get_name(),
                               FileTransactor.count,
                               FileTransactor.queue.qsize())
-            self.download_file(sub_type, filetracking_queue)
+            self.download_file(sub_type, download_event, downloads)
             FileTransactor.queue.task_done()
         #EOFError
 
-    def download_file(self, sub_type, filetracking_queue):
+    def download_file(self, sub_type, download_event, downloads):
         """Download File"""
 
         filepath = sub_type.get_filepath()
@@ -96,27 +110,24 @@ class FileTransactor():
                           filepath,
                           filepath_to_download)
 
-        self.logger.debug("%s: Checking whether the file is currently downloading: %s",
-                          self._get_name(),
-                          filepath_to_download)
-
-        if filepath_to_download in filetracking_queue:
-            self.logger.debug("%s: The file is already downloading, waiting for it to finish: %s",
+        if downloads:
+            self.logger.debug("%s: Initiating download: %s",
                               self._get_name(),
                               filepath_to_download)
-            while filepath_to_download in filetracking_queue:
-                sleep(1)
-            self.logger.debug("%s: File no longer downloading, proceeding: %s",
+            try:
+                sub_type.get_data()
+            finally:
+                # Release the waiters even if this failed, they will try the download themselves.
+                download_event.set()
+            self.logger.debug("%s: Download complete: %s",
                               self._get_name(),
                               filepath_to_download)
-            sub_type.get_data()
         else:
-            self.logger.debug("%s: File not currently downloading, initiating download: %s",
+            self.logger.debug("%s: The file is already downloading, waiting for it to finish: %s",
                               self._get_name(),
                               filepath_to_download)
-            filetracking_queue.append(filepath_to_download)
-            sub_type.get_data()
-            self.logger.debug("%s: Download complete. Removing item from download queue: %s",
+            download_event.wait()
+            self.logger.debug("%s: File no longer downloading, proceeding: %s",
                               self._get_name(),
                               filepath_to_download)
-            filetracking_queue.remove(filepath_to_download)
+            sub_type.get_data()
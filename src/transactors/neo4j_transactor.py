@@ -1,12 +1,23 @@
 """Neo4j Transacotr"""
 
+import csv
+import io
 import logging
 import multiprocessing
+import os
 import pickle
+import random
+import re
+import sys
 import time
-from neo4j import GraphDatabase
-from etl import ETL
+import uuid
+from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
+from files import CompressedFile
 from loader_common import ContextInfo
+from .csv_transactor import CSVTransactor
+from .csv_writer import CSVWriter
+from .bulk_import_transactor import BulkImportTransactor
+from .query_metrics import QueryMetrics
 
 
 class Neo4jTransactor():
@@ -16,6 +27,44 @@ class Neo4jTransactor():
     count = 0
     queue = None
 
+    # Used to turn LOAD CSV templates into UNWIND queries in unwind write mode.
+    periodic_commit_pattern = re.compile(r"USING\s+PERIODIC\s+COMMIT\s*(\d*)", re.IGNORECASE)
+    load_csv_pattern = re.compile(r"LOAD\s+CSV\s+WITH\s+HEADERS\s+FROM\s+'file:///[^']*'\s+AS\s+row",
+                                  re.IGNORECASE)
+
+    # Outstanding query batches per ETL, so the loader can tell when an ETL's
+    # writes have landed. batch_owner is set in each ETL process before it runs.
+    # The owner's name is sent down batch_done_receiver when its count drops to 0.
+    pending_batches = None
+    pending_lock = None
+    batch_owner = None
+    batch_done_receiver = None
+    batch_done_sender = None
+
+    # Commit size auto-tuning (NEO4J_AUTO_TUNE_COMMIT_SIZE). One entry per query
+    # template, shared by every file loaded with it: {'size', 'rate', 'step'}.
+    commit_size_tuning = None
+    tuning_lock = None
+    file_pattern = re.compile(r"'file:///[^']*'")
+    heap_limit = 0.8
+    min_commit_size = 1000
+    max_commit_size = 1000000
+
+    # Retries of transient errors (deadlocks, lock timeouts, lost connections) back off
+    # exponentially with full jitter. A file that keeps deadlocking is split into parts.
+    retry_backoff_base = 2
+    retry_backoff_cap = 120
+    max_retries = 10
+    split_after_retries = 3
+    split_parts = 4
+
+    # Sharded files (see ETL.shard_key_patterns) are loaded as one batch per shard so idle
+    # threads pick them up concurrently. The rest of the batch they came from waits in
+    # shard_groups until its last shard is done: {'remaining', 'rest', 'count', 'owner',
+    # 'sharded_files'}.
+    shard_groups = None
+    shard_lock = None
+
     def __init__(self):
         self.thread_pool = []
 
@@ -31,6 +80,15 @@ class Neo4jTransactor():
         manager = multiprocessing.Manager()
         queue = manager.Queue()
         Neo4jTransactor.queue = queue
+        Neo4jTransactor.pending_batches = manager.dict()
+        Neo4jTransactor.pending_lock = manager.Lock()
+        Neo4jTransactor.commit_size_tuning = manager.dict()
+        Neo4jTransactor.tuning_lock = manager.Lock()
+        Neo4jTransactor.shard_groups = manager.dict()
+        Neo4jTransactor.shard_lock = manager.Lock()
+        QueryMetrics.start(manager)
+        (Neo4jTransactor.batch_done_receiver,
+         Neo4jTransactor.batch_done_sender) = multiprocessing.Pipe(duplex=False)
 
         for i in range(0, thread_count):
             process = multiprocessing.Process(target=self.run, name=str(i))
@@ -51,16 +109,39 @@ class Neo4jTransactor():
     def execute_query_batch(query_batch):
         """Execture Query Batch"""
 
+        # etl imports transactors, so it is imported when needed rather than with this module.
+        from etl import ETL
+
         Neo4jTransactor.count = Neo4jTransactor.count + 1
         Neo4jTransactor.logger.debug("Adding Query Batch: %s BatchSize: %s QueueSize: %s ",
                                      Neo4jTransactor.count,
                                      len(query_batch),
                                      Neo4jTransactor.queue.qsize())
-        Neo4jTransactor.queue.put((query_batch, Neo4jTransactor.count))
+        sharded_files = [file_name for (query, file_name) in query_batch
+                         if ETL.get_query_shard_key(query) is not None]
+        Neo4jTransactor._update_pending(Neo4jTransactor.batch_owner, 1)
+        Neo4jTransactor.queue.put((query_batch, Neo4jTransactor.count, Neo4jTransactor.batch_owner, 0,
+                                   sharded_files, None))
+
+    @staticmethod
+    def _update_pending(owner, change):
+        with Neo4jTransactor.pending_lock:
+            pending = Neo4jTransactor.pending_batches.get(owner, 0) + change
+            Neo4jTransactor.pending_batches[owner] = pending
+            if pending == 0:
+                Neo4jTransactor.batch_done_sender.send(owner)
+
+    @staticmethod
+    def has_pending_batches(owner):
+        """Whether any query batch queued by owner has not finished yet"""
+
+        return Neo4jTransactor.pending_batches.get(owner, 0) > 0
 
     def check_for_thread_errors(self):
         """Check for Thread Errors"""
 
+        from etl import ETL
+
         ETL.wait_for_threads(self.thread_pool, Neo4jTransactor.queue)
 
     @staticmethod
@@ -69,20 +150,236 @@ class Neo4jTransactor():
 
         Neo4jTransactor.queue.join()
 
+    @staticmethod
+    def run_unwind_query(neo4j_query, filename):
+        """Run a LOAD CSV query as UNWIND $rows over the row batches saved for filename,
+           committing every periodic-commit-size rows. Returns the number of rows sent
+           and the summed update counters."""
+
+        from etl.helpers import Neo4jHelper
+
+        commit_match = Neo4jTransactor.periodic_commit_pattern.search(neo4j_query)
+        commit_size = 1000  # LOAD CSV's own default.
+        if commit_match is not None and commit_match.group(1):
+            commit_size = int(commit_match.group(1))
+
+        unwind_query = Neo4jTransactor.periodic_commit_pattern.sub("", neo4j_query)
+        unwind_query = Neo4jTransactor.load_csv_pattern.sub("UNWIND $rows AS row", unwind_query)
+
+        row_count = 0
+        counters = {name: 0 for name in QueryMetrics.counter_names}
+
+        with open(CSVTransactor.get_row_batch_path(filename), 'rb') as row_file, \
+                Neo4jHelper.session() as session:
+            while True:
+                try:
+                    rows = pickle.load(row_file)
+                except EOFError:
+                    break
+                for start in range(0, len(rows), commit_size):
+                    with session.begin_transaction() as transaction:
+                        summary = transaction.run(unwind_query, rows=rows[start:start + commit_size]).consume()
+                    for (name, value) in QueryMetrics.get_counters(summary).items():
+                        counters[name] = counters[name] + value
+                row_count = row_count + len(rows)
+
+        return (row_count, counters)
+
+    @staticmethod
+    def _tuning_key(neo4j_query):
+        key = Neo4jTransactor.periodic_commit_pattern.sub("USING PERIODIC COMMIT ", neo4j_query)
+        return Neo4jTransactor.file_pattern.sub("''", key)
+
+    @staticmethod
+    def tune_commit_size(neo4j_query):
+        """Swap in the commit size the tuner has settled on for this query's template"""
+
+        commit_match = Neo4jTransactor.periodic_commit_pattern.search(neo4j_query)
+        if commit_match is None:
+            return neo4j_query
+        tuning = Neo4jTransactor.commit_size_tuning.get(Neo4jTransactor._tuning_key(neo4j_query))
+        if tuning is None:
+            return neo4j_query
+
+        return neo4j_query[:commit_match.start()] \
+            + "USING PERIODIC COMMIT %s " % tuning['size'] \
+            + neo4j_query[commit_match.end():]
+
+    @staticmethod
+    def get_csv_size(filename):
+        """(rows after the header, uncompressed bytes) of a CSV in tmp, as CSVWriter saved
+           them. CSVs it did not write are read with the csv module, a quoted field can
+           hold newlines."""
+
+        stats = CSVWriter.get_stats(os.path.join('tmp', filename))
+        if stats is not None:
+            return stats
+
+        with CompressedFile.open(os.path.join('tmp', filename), 'rb') as binary_file:
+            csv_file = io.TextIOWrapper(binary_file, encoding='utf-8', newline='')
+            rows = sum(1 for row in csv.reader(csv_file)) - 1
+            size = binary_file.tell()
+
+        return (max(rows, 0), size)
+
+    @staticmethod
+    def get_heap_usage():
+        """Fraction of the Neo4j heap in use, or None if it can't be read over JMX"""
+
+        from etl.helpers import Neo4jHelper
+
+        try:
+            with Neo4jHelper.session() as session:
+                record = session.run("""
+                    CALL dbms.queryJmx('java.lang:type=Memory') YIELD attributes
+                    RETURN attributes.HeapMemoryUsage.value.properties AS heap""").single()
+        except Exception as error:
+            Neo4jTransactor.logger.debug("Could not read Neo4j heap usage: %s", error)
+            return None
+
+        if record is None or not record['heap'] or record['heap'].get('max', 0) <= 0:
+            return None
+
+        return record['heap']['used'] / record['heap']['max']
+
+    @staticmethod
+    def record_commit_performance(neo4j_query, filename, rows, elapsed_time):
+        """Move the commit size of the query's template towards better rows/sec for the
+           next file loaded with it, and back off while the Neo4j heap is nearly full.
+           Each change keeps going in the same direction while throughput improves and
+           turns around, with a smaller step, when it gets worse."""
+
+        commit_match = Neo4jTransactor.periodic_commit_pattern.search(neo4j_query)
+        if commit_match is None or not commit_match.group(1) or elapsed_time <= 0:
+            return
+        commit_size = int(commit_match.group(1))
+        heap_usage = Neo4jTransactor.get_heap_usage()
+        rate = rows / elapsed_time
+        key = Neo4jTransactor._tuning_key(neo4j_query)
+
+        with Neo4jTransactor.tuning_lock:
+            tuning = Neo4jTransactor.commit_size_tuning.get(key, {'size': commit_size,
+                                                                 'rate': None,
+                                                                 'step': 2.0})
+            if heap_usage is not None and heap_usage > Neo4jTransactor.heap_limit:
+                tuning = {'size': commit_size, 'rate': None, 'step': 0.5}
+            elif rows <= commit_size:
+                # A single commit says nothing about the commit size.
+                return
+            elif tuning['rate'] is not None and rate < tuning['rate']:
+                tuning = {'size': commit_size, 'rate': rate, 'step': 1 / tuning['step'] ** 0.5}
+            else:
+                tuning = {'size': commit_size, 'rate': rate, 'step': tuning['step']}
+
+            tuning['size'] = int(min(max(commit_size * tuning['step'],
+                                         Neo4jTransactor.min_commit_size),
+                                     Neo4jTransactor.max_commit_size))
+            Neo4jTransactor.commit_size_tuning[key] = tuning
+
+        Neo4jTransactor.logger.debug("Commit size after %s: %s -> %s (%.0f rows/s, heap %s)",
+                                     filename,
+                                     commit_size,
+                                     tuning['size'],
+                                     rate,
+                                     heap_usage)
+
+    @staticmethod
+    def is_transient_error(error):
+        """Whether an error is worth retrying: deadlocks, lock timeouts and lost connections.
+           With PERIODIC COMMIT a deadlock can surface as a DatabaseError, so the message
+           is checked too. Syntax errors, constraint violations, bad data etc. are not."""
+
+        if isinstance(error, (TransientError, ServiceUnavailable, SessionExpired)):
+            return True
+
+        return Neo4jTransactor.is_deadlock(error)
+
+    @staticmethod
+    def is_deadlock(error):
+        """Whether an error is a deadlock or a lock that could not be acquired"""
+
+        message = ("%s %s" % (getattr(error, 'code', ''), error)).lower()
+        return 'deadlock' in message or "can't acquire" in message or 'lockclient' in message
+
+    @staticmethod
+    def get_retry_delay(retries):
+        """Seconds to wait before the next attempt, exponential with full jitter"""
+
+        return random.uniform(0, min(Neo4jTransactor.retry_backoff_cap,
+                                     Neo4jTransactor.retry_backoff_base * 2 ** retries))
+
+    @staticmethod
+    def split_query(neo4j_query, filename):
+        """Split the file of a LOAD CSV query into parts, each loaded with half the commit
+           size. Returns [(query, part file name)], [] if the file can't be split."""
+
+        part_names = CSVTransactor.split_file(filename, Neo4jTransactor.split_parts)
+        commit_match = Neo4jTransactor.periodic_commit_pattern.search(neo4j_query)
+
+        part_queries = []
+        for part_name in part_names:
+            part_query = neo4j_query.replace("'file:///%s'" % filename, "'file:///%s'" % part_name)
+            if commit_match is not None and commit_match.group(1):
+                part_query = Neo4jTransactor.periodic_commit_pattern.sub(
+                    "USING PERIODIC COMMIT %s " % max(int(commit_match.group(1)) // 2, 1),
+                    part_query,
+                    count=1)
+            part_queries.append((part_query, part_name))
+
+        return part_queries
+
+    @staticmethod
+    def start_shards(neo4j_query, filename, rest_of_batch, query_counter, batch_owner, sharded_files):
+        """Queue a batch for each shard of filename but the first, which the calling
+           thread loads itself, and park the rest of the batch until all shards are done.
+           Returns the shard group and the batch to go on with."""
+
+        shard_queries = [(neo4j_query.replace("'file:///%s'" % filename, "'file:///%s'" % shard_name),
+                          shard_name)
+                         for shard_name in CSVTransactor.get_shard_names(filename)]
+        shard_group = uuid.uuid4().hex
+        Neo4jTransactor.shard_groups[shard_group] = {'remaining': len(shard_queries),
+                                                     'rest': rest_of_batch,
+                                                     'count': query_counter,
+                                                     'owner': batch_owner,
+                                                     'sharded_files': sharded_files}
+
+        Neo4jTransactor._update_pending(batch_owner, len(shard_queries) - 1)
+        for shard_query in shard_queries[1:]:
+            Neo4jTransactor.queue.put(([shard_query], query_counter, batch_owner, 0, [], shard_group))
+
+        return (shard_group, shard_queries[:1])
+
+    @staticmethod
+    def finish_shard(shard_group):
+        """Queue the rest of the batch a shard came from if it was the last one to finish.
+           Called before the shard's own batch stops being pending."""
+
+        with Neo4jTransactor.shard_lock:
+            group = Neo4jTransactor.shard_groups[shard_group]
+            group['remaining'] = group['remaining'] - 1
+            if group['remaining'] > 0:
+                Neo4jTransactor.shard_groups[shard_group] = group
+                return
+            del Neo4jTransactor.shard_groups[shard_group]
+
+        if len(group['rest']) > 0:
+            Neo4jTransactor._update_pending(group['owner'], 1)
+            Neo4jTransactor.queue.put((group['rest'], group['count'], group['owner'], 0,
+                                       group['sharded_files'], None))
+
     def run(self):
         """Run"""
 
-        context_info = ContextInfo()
+        from etl.helpers import Neo4jHelper
 
-        if context_info.env["USING_PICKLE"] is False:
-            uri = "bolt://" + context_info.env["NEO4J_HOST"] \
-                    + ":" + str(context_info.env["NEO4J_PORT"])
-            graph = GraphDatabase.driver(uri, auth=("neo4j", "neo4j"), max_connection_pool_size=-1)
+        context_info = ContextInfo()
 
         self.logger.info("%s: Starting Neo4jTransactor Thread Runner: ", self._get_name())
         while True:
             try:
-                (query_batch, query_counter) = Neo4jTransactor.queue.get()
+                (query_batch, query_counter, batch_owner, retries, sharded_files, shard_group) \
+                        = Neo4jTransactor.queue.get()
             except EOFError as error:
                 self.logger.info("Queue Closed exiting: %s", error)
                 return
@@ -99,11 +396,33 @@ class Neo4jTransactor():
 
                 (neo4j_query, filename) = query_batch.pop(0)
 
+                if filename in sharded_files and shard_group is None:
+                    (shard_group, query_batch) = self.start_shards(neo4j_query, filename, query_batch,
+                                                                   query_counter, batch_owner,
+                                                                   sharded_files)
+                    self.logger.debug("%s: Loading %s in %s shards",
+                                      self._get_name(),
+                                      filename,
+                                      len(CSVTransactor.get_shard_names(filename)))
+                    retries = 0
+                    continue
+
                 self.logger.debug("%s: Processing query for file: %s QueryNum: %s QueueSize: %s",
                                   self._get_name(),
                                   filename,
                                   query_counter,
                                   Neo4jTransactor.queue.qsize())
+                tune_commit_size = context_info.env["NEO4J_AUTO_TUNE_COMMIT_SIZE"] is True \
+                    and context_info.env["USING_PICKLE"] is not True \
+                    and not BulkImportTransactor.is_exporting() \
+                    and Neo4jTransactor.load_csv_pattern.search(neo4j_query) is not None
+                if tune_commit_size:
+                    neo4j_query = Neo4jTransactor.tune_commit_size(neo4j_query)
+
+                record_metrics = QueryMetrics.get_sink() != "none" \
+                    and context_info.env["USING_PICKLE"] is not True \
+                    and not BulkImportTransactor.is_exporting()
+
                 start = time.time()
                 try:
                     if context_info.env["USING_PICKLE"] is True:
@@ -115,12 +434,31 @@ class Neo4jTransactor():
                                               query_counter,
                                               total_query_counter)
                             pickle.dump(neo4j_query, file)
+                    elif BulkImportTransactor.is_exporting():
+                        BulkImportTransactor.record_query(batch_owner, query_counter, neo4j_query, filename)
+                    elif context_info.env["NEO4J_WRITE_MODE"] == "unwind" \
+                            and Neo4jTransactor.load_csv_pattern.search(neo4j_query):
+                        (rows, counters) = self.run_unwind_query(neo4j_query, filename)
+                        # No CSV is read in unwind mode.
+                        size = 0
                     else:
-                        with graph.session() as session:
-                            session.run(neo4j_query)
+                        with Neo4jHelper.session() as session:
+                            counters = QueryMetrics.get_counters(session.run(neo4j_query).consume())
+                        (rows, size) = (0, 0)
 
                     end = time.time()
                     elapsed_time = end - start
+                    if (tune_commit_size or record_metrics) \
+                            and context_info.env["NEO4J_WRITE_MODE"] != "unwind" \
+                            and Neo4jTransactor.load_csv_pattern.search(neo4j_query):
+                        # Counted after the query so it is not part of its time.
+                        (rows, size) = self.get_csv_size(filename)
+                    if tune_commit_size:
+                        self.record_commit_performance(neo4j_query, filename, rows, elapsed_time)
+                    if record_metrics:
+                        QueryMetrics.record(neo4j_query, filename, rows, size, elapsed_time, retries,
+                                            counters)
+                    retries = 0
                     self.logger.info(\
                             "%s: Processed query for file: %s QueryNum: %s QueueSize: %s Time: %s",
                             self._get_name(),
@@ -129,17 +467,38 @@ class Neo4jTransactor():
                             Neo4jTransactor.queue.qsize(),
                             time.strftime("%H:%M:%S", time.gmtime(elapsed_time)))
                 except Exception as error:
-                    self.logger.error(error)
-                    #self.logger.error("%s: Query Failed: %s", self._get_name(), neo4j_query)
-                    # TODO Extract and print NODE information from error message.
-                    # Would be helpful for troubleshooting.
+                    if not self.is_transient_error(error) or retries >= self.max_retries:
+                        self.logger.critical("%s: Query for file %s failed after %s retries: %s",
+                                             self._get_name(),
+                                             filename,
+                                             retries,
+                                             error)
+                        self.logger.debug("%s: Failed query: %s", self._get_name(), neo4j_query)
+                        sys.exit(-1)
+
+                    query_batch.insert(0, (neo4j_query, filename))
+                    if self.is_deadlock(error) and retries + 1 >= self.split_after_retries \
+                            and Neo4jTransactor.load_csv_pattern.search(neo4j_query):
+                        part_queries = self.split_query(neo4j_query, filename)
+                        if len(part_queries) > 0:
+                            self.logger.warning("%s: Splitting %s into %s parts after %s deadlocks",
+                                                self._get_name(),
+                                                filename,
+                                                len(part_queries),
+                                                retries + 1)
+                            query_batch[0:1] = part_queries
+                            retries = -1
+
+                    delay = self.get_retry_delay(max(retries, 0))
                     self.logger.warning(\
-                            "%s: Query Conflict, putting data back in Queue to run later. %s",
+                            "%s: Query Conflict, putting data back in Queue to run in %.1fs. %s: %s",
                             self._get_name(),
-                            filename)
-                    query_batch.insert(0, (neo4j_query, filename))
-                    time.sleep(12)
-                    Neo4jTransactor.queue.put((query_batch, query_counter))
+                            delay,
+                            filename,
+                            error)
+                    time.sleep(delay)
+                    Neo4jTransactor.queue.put((query_batch, query_counter, batch_owner, retries + 1,
+                                               sharded_files, shard_group))
                     break
 
                 total_query_counter = total_query_counter + 1
@@ -151,4 +510,8 @@ class Neo4jTransactor():
                               query_counter,
                               len(query_batch),
                               time.strftime("%H:%M:%S", time.gmtime(batch_elapsed_time)))
+            if len(query_batch) == 0:
+                if shard_group is not None:
+                    self.finish_shard(shard_group)
+                Neo4jTransactor._update_pending(batch_owner, -1)
             Neo4jTransactor.queue.task_done()
@@ -0,0 +1,157 @@
+"""Query Metrics"""
+
+import json
+import logging
+import os
+import re
+
+from loader_common import ContextInfo
+
+
+class QueryMetrics():
+    """Per-query timing and throughput of the Neo4jTransactor.
+
+       Every query that runs against Neo4j is written as one JSON line (QUERY_METRICS=jsonl)
+       or added to a Prometheus textfile of per-template totals (QUERY_METRICS=prometheus).
+       Totals are kept per template either way and logged as a table when the loader exits."""
+
+    logger = logging.getLogger(__name__)
+
+    counter_names = ['nodes_created', 'nodes_deleted', 'relationships_created',
+                     'relationships_deleted', 'properties_set', 'labels_added']
+    total_names = ['files', 'rows', 'bytes', 'seconds', 'retries'] + counter_names
+
+    totals = None
+    lock = None
+    template_patterns = None
+    template_names = {}
+
+    @staticmethod
+    def get_sink():
+        """jsonl, prometheus or none"""
+
+        return ContextInfo().env["QUERY_METRICS"]
+
+    @staticmethod
+    def start(manager):
+        """Set up the shared totals and start an empty metrics file"""
+
+        QueryMetrics.totals = manager.dict()
+        QueryMetrics.lock = manager.Lock()
+
+        metrics_file = ContextInfo().env["QUERY_METRICS_FILE"]
+        if QueryMetrics.get_sink() != "none" and os.path.exists(metrics_file):
+            os.remove(metrics_file)
+
+    @staticmethod
+    def _get_template_patterns():
+        # etl imports transactors, so it is imported when needed rather than with this module.
+        from etl import ETL
+
+        patterns = []
+        etl_classes = list(ETL.__subclasses__())
+        while len(etl_classes) > 0:
+            etl_class = etl_classes.pop()
+            etl_classes.extend(etl_class.__subclasses__())
+            for (name, value) in vars(etl_class).items():
+                if name.endswith('_template') and isinstance(value, str):
+                    pattern = '(.*?)'.join(re.escape(part) for part in value.split('%s'))
+                    patterns.append(("%s.%s" % (etl_class.__name__, name),
+                                     re.compile(pattern, re.DOTALL)))
+        return patterns
+
+    @staticmethod
+    def get_template_name(neo4j_query, filename):
+        """The ETL query template a query was formatted from, e.g. BGIETL.gene_query_template.
+           Queries that don't come from a template are named after their file."""
+
+        if neo4j_query not in QueryMetrics.template_names:
+            if QueryMetrics.template_patterns is None:
+                QueryMetrics.template_patterns = QueryMetrics._get_template_patterns()
+            template_name = str(filename)
+            for (name, pattern) in QueryMetrics.template_patterns:
+                if pattern.fullmatch(neo4j_query) is not None:
+                    template_name = name
+                    break
+            QueryMetrics.template_names[neo4j_query] = template_name
+
+        return QueryMetrics.template_names[neo4j_query]
+
+    @staticmethod
+    def get_counters(summary):
+        """The update counters of a result summary as a dict"""
+
+        return {name: getattr(summary.counters, name, 0) for name in QueryMetrics.counter_names}
+
+    @staticmethod
+    def record(neo4j_query, filename, rows, size, elapsed_time, retries, counters):
+        """Record one query that ran against Neo4j, size being the uncompressed bytes of
+           its CSV"""
+
+        sink = QueryMetrics.get_sink()
+        metrics = {'template': QueryMetrics.get_template_name(neo4j_query, filename),
+                   'file': filename,
+                   'rows': rows,
+                   'bytes': size,
+                   'seconds': round(elapsed_time, 3),
+                   'retries': retries}
+        metrics.update(counters)
+
+        with QueryMetrics.lock:
+            totals = QueryMetrics.totals.get(metrics['template'],
+                                             {name: 0 for name in QueryMetrics.total_names})
+            totals['files'] = totals['files'] + 1
+            for name in QueryMetrics.total_names[1:]:
+                totals[name] = totals[name] + metrics.get(name, 0)
+            QueryMetrics.totals[metrics['template']] = totals
+
+            if sink == "jsonl":
+                with open(ContextInfo().env["QUERY_METRICS_FILE"], 'a') as metrics_file:
+                    metrics_file.write(json.dumps(metrics) + "\n")
+            elif sink == "prometheus":
+                QueryMetrics.write_prometheus_textfile()
+
+    @staticmethod
+    def write_prometheus_textfile():
+        """Rewrite the Prometheus textfile with the totals so far, atomically"""
+
+        metrics_file = ContextInfo().env["QUERY_METRICS_FILE"]
+        totals = dict(QueryMetrics.totals)
+        lines = []
+        for name in QueryMetrics.total_names:
+            metric = "agr_loader_query_%s_total" % name
+            lines.append("# TYPE %s counter" % metric)
+            for (template, template_totals) in sorted(totals.items()):
+                lines.append('%s{template="%s"} %s' % (metric,
+                                                       template.replace('\\', '\\\\').replace('"', '\\"'),
+                                                       template_totals[name]))
+        with open(metrics_file + '.tmp', 'w') as textfile:
+            textfile.write("\n".join(lines) + "\n")
+        os.replace(metrics_file + '.tmp', metrics_file)
+
+    @staticmethod
+    def log_summary():
+        """Log the per-template totals, slowest template first"""
+
+        if QueryMetrics.totals is None or len(QueryMetrics.totals) == 0:
+            return
+
+        totals = sorted(dict(QueryMetrics.totals).items(),
+                        key=lambda item: item[1]['seconds'],
+                        reverse=True)
+        QueryMetrics.logger.info("%-60s %6s %11s %9s %10s %9s %7s %10s %10s %11s",
+                                 "Template", "Files", "Rows", "MB", "Time", "Rows/s", "Retries",
+                                 "Nodes", "Rels", "Props")
+        for (template, template_totals) in totals:
+            seconds = template_totals['seconds']
+            QueryMetrics.logger.info("%-60s %6d %11d %9.1f %10s %9.0f %7d %10d %10d %11d",
+                                     template,
+                                     template_totals['files'],
+                                     template_totals['rows'],
+                                     template_totals['bytes'] / 1048576,
+                                     "%d:%02d:%02d" % (seconds // 3600, seconds % 3600 // 60, seconds % 60),
+                                     template_totals['rows'] / seconds if seconds > 0 else 0,
+                                     template_totals['retries'],
+                                     template_totals['nodes_created'],
+                                     template_totals['relationships_created'],
+                                     template_totals['properties_set'])